@@ -1,7 +1,17 @@
 """Baidu Netdisk Client - A Python client for Baidu Netdisk API"""
 
 from .client import BaiduNetdiskClient
+from .localcache import LocalContentCache
 
 __version__ = "1.1.1"
-__all__ = ["BaiduNetdiskClient"]
+__all__ = ["BaiduNetdiskClient", "LocalContentCache"]
+
+
+def __getattr__(name):
+    # The async client needs the optional aiohttp dependency, so it is only
+    # imported when asked for
+    if name == "AsyncBaiduNetdiskClient":
+        from .aio import AsyncBaiduNetdiskClient
+        return AsyncBaiduNetdiskClient
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
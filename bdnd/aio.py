@@ -0,0 +1,800 @@
+"""Asyncio client for Baidu Netdisk, built on aiohttp"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from urllib.parse import quote, urlencode, urlsplit
+
+try:
+    import aiohttp
+except ImportError as e:
+    raise ImportError(
+        "aiohttp is required for AsyncBaiduNetdiskClient. Install it with: pip install bdnd[async]"
+    ) from e
+
+from .client import BaiduNetdiskClient
+from .hashing import HashEngine, file_md5, is_content_md5
+from .hosts import UploadHostPool, parse_locate_response
+from .ratelimit import get_bandwidth_limiter, get_api_rate_limiter
+from .retry import RetryPolicy, CircuitBreaker
+from .stats import TransferStats
+
+
+_HEADERS = {'User-Agent': 'pan.baidu.com'}
+# Returned by a segment whose server answered a ranged request with the whole file
+_RANGE_IGNORED = object()
+
+
+async def _read_json(response):
+    try:
+        return json.loads(await response.read())
+    except ValueError:
+        return None
+
+
+def _read_block(path, offset, length, expected_md5=None):
+    """Read one block; returns None if it no longer matches expected_md5"""
+    with open(path, 'rb', buffering=0) as f:
+        if hasattr(os, 'pread'):
+            data = os.pread(f.fileno(), length, offset)
+        else:
+            f.seek(offset)
+            data = f.read(length)
+    if expected_md5 is not None and hashlib.md5(data).hexdigest() != expected_md5:
+        return None
+    return data
+
+
+class _RangeWriter:
+    """Positional writes into one file from executor threads"""
+
+    def __init__(self, path, size):
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+        self._lock = threading.Lock()
+        os.ftruncate(self._fd, size)
+
+    def write_at(self, data, offset):
+        if hasattr(os, 'pwrite'):
+            os.pwrite(self._fd, data, offset)
+            return
+        with self._lock:
+            os.lseek(self._fd, offset, os.SEEK_SET)
+            os.write(self._fd, data)
+
+    def close(self):
+        os.close(self._fd)
+
+
+class AsyncBaiduNetdiskClient:
+    """
+    Asyncio counterpart of BaiduNetdiskClient
+
+    All network calls are coroutines sharing one pooled aiohttp session, so
+    thousands of small operations can run concurrently on a single event
+    loop. Requests go through the same RetryPolicy, circuit breaker and
+    process-wide API rate and bandwidth limiters as the blocking client.
+    Disk reads, writes and hashing run on the loop's default executor.
+
+    Use it as an async context manager, or call close() when done.
+    """
+
+    DEFAULT_SMALL_FILE_THRESHOLD = BaiduNetdiskClient.DEFAULT_SMALL_FILE_THRESHOLD
+    DEFAULT_UPLOAD_HOSTS = BaiduNetdiskClient.DEFAULT_UPLOAD_HOSTS
+    UPLOAD_BLOCK_SIZES = BaiduNetdiskClient.UPLOAD_BLOCK_SIZES
+    # Downloads smaller than this per segment are not split
+    MIN_SEGMENT_SIZE = 8 * 1024 * 1024
+
+    set_base_path = BaiduNetdiskClient.set_base_path
+    _resolve_path = BaiduNetdiskClient._resolve_path
+    _sanitize_url = BaiduNetdiskClient._sanitize_url
+    _is_own_upload = staticmethod(BaiduNetdiskClient._is_own_upload)
+
+    def __init__(self, access_token=None, base_path=None, connection_limit=100, small_file_threshold=None,
+                 upload_block_size=None, part_workers=4, part_retries=5, download_segments=4,
+                 retry_policy=None, api_rate_limiter=None, bandwidth_limiter=None, hash_workers=None):
+        """
+        Initialize the async client
+
+        Args:
+            access_token: Baidu Netdisk access token. If None, will try to get from environment variable 'baidu_netdisk_access_token'
+            base_path: Base path for relative paths, resolved like BaiduNetdiskClient's
+            connection_limit: Maximum open connections in the session's pool
+            small_file_threshold: Largest file size (bytes) uploaded in a single request
+            upload_block_size: Slice size for chunked uploads (default: largest for the account's VIP level)
+            part_workers: Parts of one upload sent concurrently
+            part_retries: Extra attempts per failed part
+            download_segments: Ranged requests a large download is split into
+            retry_policy: RetryPolicy for all requests (default: RetryPolicy())
+            api_rate_limiter: ApiRateLimiter (default: the process-wide one)
+            bandwidth_limiter: BandwidthLimiter (default: the process-wide one)
+            hash_workers: Threads used to hash upload blocks
+        """
+        if access_token is None:
+            access_token = os.environ.get("baidu_netdisk_access_token", None)
+        self.access_token = access_token
+        if base_path is None:
+            try:
+                from .config import get_base_path
+                base_path = get_base_path()
+            except ImportError:
+                base_path = os.environ.get("baidu_netdisk_base_path", "/")
+        self.set_base_path(base_path)
+        if small_file_threshold is None:
+            small_file_threshold = self.DEFAULT_SMALL_FILE_THRESHOLD
+        self.small_file_threshold = small_file_threshold
+        self.upload_block_size = upload_block_size
+        self.connection_limit = connection_limit
+        self.part_workers = max(1, part_workers)
+        self.part_retries = max(0, part_retries)
+        self.download_segments = max(1, download_segments)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.api_limiter = api_rate_limiter or get_api_rate_limiter()
+        self.bandwidth = bandwidth_limiter or get_bandwidth_limiter()
+        self.stats = TransferStats()
+        self._circuit_breaker = CircuitBreaker()
+        self._tls_verify = {}
+        self._hash_engine = HashEngine(workers=hash_workers)
+        self._session = None
+        self._vip_type = None
+        self._upload_hosts = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        """Close the HTTP session and the hashing pool"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        self._hash_engine.close()
+
+    def get_stats(self):
+        """Get a snapshot of transfer statistics (see TransferStats.snapshot)"""
+        return self.stats.snapshot()
+
+    def _get_session(self):
+        # Created on first use so it belongs to the running loop
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connection_limit, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=60),
+                headers=_HEADERS,
+                trust_env=False,
+            )
+        return self._session
+
+    async def _request(self, method, url, max_retries=None, handler=None, data_factory=None, **kwargs):
+        """
+        Send a request with the client's retry policy, rate limits and circuit breaker
+
+        Args:
+            handler: Coroutine function consuming the response; by default the
+                body is parsed as JSON and a transient Baidu errno is retried
+            data_factory: Callable building a fresh request body per attempt,
+                for bodies that can only be sent once (aiohttp.FormData)
+
+        Returns:
+            The handler's result (parsed JSON by default), or None if the host
+            could not be reached or the retries ran out
+
+        Raises:
+            aiohttp.ClientResponseError: For HTTP errors that are not worth retrying (4xx)
+        """
+        policy = self.retry_policy
+        attempts = min(max_retries, policy.max_attempts) if max_retries else policy.max_attempts
+        host = urlsplit(url).netloc
+        deadline = time.monotonic() + policy.deadline
+        session = self._get_session()
+        error = None
+        last_result = None
+
+        for attempt in range(attempts):
+            if not self._circuit_breaker.allow(host):
+                self.stats.incr('http_circuit_open')
+                print(f"Error: {host} is failing repeatedly, request skipped for now")
+                return None
+            wait = self.api_limiter.reserve(url)
+            if wait > 0:
+                self.stats.add_time('api_rate_limit_wait', wait)
+                await asyncio.sleep(wait)
+
+            verify_modes = [self._tls_verify[host]] if host in self._tls_verify else [True, False]
+            retry_after = None
+            error = None
+            for verify in verify_modes:
+                if data_factory is not None:
+                    kwargs['data'] = data_factory()
+                try:
+                    self.stats.incr('http_requests')
+                    async with session.request(method, url, ssl=None if verify else False, **kwargs) as response:
+                        self._tls_verify[host] = verify
+                        if response.status in policy.retry_statuses:
+                            retry_after = policy.retry_after(response)
+                            error = f"HTTP {response.status}"
+                            if response.status >= 500:
+                                self._circuit_breaker.record_failure(host)
+                            break
+                        self._circuit_breaker.record_success(host)
+                        # 4xx is the request's fault: raised without retrying
+                        response.raise_for_status()
+                        if handler is not None:
+                            return await handler(response)
+                        result = await _read_json(response)
+                        errno = result.get('errno', result.get('error_code')) if isinstance(result, dict) else None
+                        if errno not in policy.transient_errnos:
+                            return result
+                        last_result = result
+                        error = f"errno {errno}"
+                        self.stats.incr('http_retries_throttled')
+                        break
+                except aiohttp.ClientSSLError as e:
+                    # Try without certificate verification, then give up on this attempt
+                    error = e
+                except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+                    error = e
+                    self._circuit_breaker.record_failure(host)
+                    break
+
+            delay = policy.backoff(attempt, retry_after)
+            if attempt == attempts - 1 or time.monotonic() + delay > deadline:
+                break
+            self.stats.incr('http_retries')
+            await asyncio.sleep(delay)
+
+        if last_result is not None:
+            return last_result
+        print(f"Error: Request failed: {error or 'unknown error'}")
+        print(f"  URL: {self._sanitize_url(url)}")
+        return None
+
+    async def get_user_info(self):
+        """Get user info"""
+        if not self.access_token:
+            return None
+        url = f"https://pan.baidu.com/rest/2.0/xpan/nas?access_token={self.access_token}&method=uinfo&vip_version=v2"
+        return await self._request("GET", url)
+
+    async def get_quota(self):
+        """Get quota info"""
+        if not self.access_token:
+            return None
+        url = f"https://pan.baidu.com/api/quota?access_token={self.access_token}&checkfree=1&checkexpire=1"
+        return await self._request("GET", url)
+
+    async def get_upload_block_size(self):
+        """Get the chunked upload slice size: the override if set, else the largest allowed for the account"""
+        if self.upload_block_size:
+            return self.upload_block_size
+        if self._vip_type is None:
+            vip_type = 0
+            try:
+                user_info = await self.get_user_info()
+                if user_info and user_info.get('errno', 0) == 0:
+                    vip_type = int(user_info.get('vip_type', 0) or 0)
+            except (aiohttp.ClientError, ValueError, TypeError):
+                pass
+            self._vip_type = vip_type
+        return self.UPLOAD_BLOCK_SIZES.get(self._vip_type, self.UPLOAD_BLOCK_SIZES[0])
+
+    async def list_files(self, directory="/", order="time", start=0, limit=100, folder=0, desc=1):
+        """Get file list"""
+        if not self.access_token:
+            return None
+        directory = self._resolve_path(directory)
+        params = {
+            'method': 'list',
+            'dir': directory,
+            'order': order,
+            'start': start,
+            'limit': limit,
+            'web': 'web',
+            'folder': folder,
+            'access_token': self.access_token,
+            'desc': desc,
+        }
+        result = await self._request("GET", f"https://pan.baidu.com/rest/2.0/xpan/file?{urlencode(params)}")
+        if result is None:
+            return None
+        if result.get('errno') not in (0, None):
+            print(f"Error: List files failed (errno={result.get('errno')}): {result.get('errmsg', 'Unknown error')}")
+            return None
+        return result.get('list', []) or []
+
+    async def iter_all_files_recursive(self, path="/", start=0, limit=1000, web=1, recursion=1):
+        """Recursively list all files in path, yielding entries as each listall page arrives"""
+        if not self.access_token:
+            return
+        path = self._resolve_path(path)
+        current_start = start
+        while True:
+            url = (
+                "https://pan.baidu.com/rest/2.0/xpan/multimedia"
+                f"?method=listall"
+                f"&path={quote(path, safe='/')}"
+                f"&access_token={self.access_token}"
+                f"&web={web}"
+                f"&recursion={recursion}"
+                f"&start={current_start}"
+                f"&limit={limit}"
+            )
+            result = await self._request("GET", url)
+            if not result:
+                break
+            file_list = result.get('list', [])
+            if not file_list:
+                break
+            for item in file_list:
+                yield item
+            if result.get('has_more', 0) == 0:
+                break
+            current_start += len(file_list)
+
+    async def list_all_files_recursive(self, path="/", start=0, limit=1000, web=1, recursion=1):
+        """Recursively get all files in path"""
+        return [item async for item in self.iter_all_files_recursive(path, start, limit, web, recursion)]
+
+    async def get_file_info(self, fsids, dlink=1, thumb=1, extra=1, needmedia=1, detail=1):
+        """Get file info and download link (dlink) via filemetas API"""
+        if not self.access_token:
+            return None
+        if not isinstance(fsids, list):
+            fsids = [fsids]
+        try:
+            fsids_int = [int(fsid) for fsid in fsids]
+        except (ValueError, TypeError):
+            return None
+        params = {
+            'method': 'filemetas',
+            'access_token': self.access_token,
+            'thumb': str(thumb),
+            'dlink': str(dlink),
+            'extra': str(extra),
+            'needmedia': str(needmedia),
+            'detail': str(detail),
+            'fsids': json.dumps(fsids_int, separators=(',', ':')),
+        }
+        result = await self._request("GET", f"https://pan.baidu.com/rest/2.0/xpan/multimedia?{urlencode(params)}")
+        if result and result.get('errno') == 0:
+            return result.get('list', [])
+        return None
+
+    async def get_fsid_by_path(self, file_path):
+        """Get file fsid by file path"""
+        file_path = self._resolve_path(file_path).rstrip('/')
+        if not file_path:
+            return None
+        dir_path, _, file_name = file_path.rpartition('/')
+        start = 0
+        while True:
+            file_list = await self.list_files(directory=dir_path or "/", start=start, limit=1000)
+            if not file_list:
+                return None
+            for file_info in file_list:
+                if file_info.get('server_filename') == file_name:
+                    return file_info.get('fs_id')
+            if len(file_list) < 1000:
+                return None
+            start += len(file_list)
+
+    async def get_download_url(self, file_path=None, fsid=None):
+        """Get download URL (dlink) for file"""
+        if not self.access_token:
+            return None
+        if fsid is None:
+            if file_path is None:
+                return None
+            fsid = await self.get_fsid_by_path(file_path)
+            if fsid is None:
+                return None
+        file_info_list = await self.get_file_info(fsids=[fsid], dlink=1)
+        if not file_info_list or not file_info_list[0].get('dlink'):
+            return None
+        dlink = file_info_list[0]['dlink']
+        separator = '&' if '?' in dlink else '?'
+        return f"{dlink}{separator}access_token={self.access_token}"
+
+    async def create_directory(self, dir_path):
+        """Create directory on Baidu Netdisk"""
+        if not self.access_token:
+            return False
+        url = f"https://pan.baidu.com/rest/2.0/xpan/file?method=create&access_token={self.access_token}"
+        data = {
+            "path": self._resolve_path(dir_path),
+            "size": "0",
+            "isdir": "1",
+            "rtype": "1",
+        }
+        result = await self._request("POST", url, data=data)
+        return bool(result) and result.get('errno') == 0
+
+    async def precreate(self, save_path, size, block_list, isdir=0, rtype=1, autoinit=1):
+        """Precreate upload, return the precreate response"""
+        if not self.access_token:
+            return None
+        url = f"https://pan.baidu.com/rest/2.0/xpan/file?method=precreate&access_token={self.access_token}"
+        data = {
+            'path': self._resolve_path(save_path),
+            'size': str(size),
+            'rtype': str(rtype),
+            'isdir': str(isdir),
+            'autoinit': str(autoinit),
+            'block_list': block_list if isinstance(block_list, str) else json.dumps(block_list),
+        }
+        return await self._request("POST", url, data=data)
+
+    async def _get_upload_host_pool(self, save_path=None, uploadid=None):
+        """Locate upload hosts on first use; kept for the session"""
+        if self._upload_hosts is None:
+            params = {
+                'method': 'locateupload',
+                'appid': '250528',
+                'access_token': self.access_token,
+                'upload_version': '2.0',
+            }
+            if save_path:
+                params['path'] = save_path
+            if uploadid:
+                params['uploadid'] = uploadid
+            hosts = []
+            try:
+                result = await self._request(
+                    "GET", f"https://d.pcs.baidu.com/rest/2.0/pcs/file?{urlencode(params)}", max_retries=1
+                )
+                if result and not result.get('error_code'):
+                    hosts = parse_locate_response(result)
+            except aiohttp.ClientError:
+                pass
+            hosts += [h for h in self.DEFAULT_UPLOAD_HOSTS if h not in hosts]
+            self._upload_hosts = UploadHostPool(hosts)
+        return self._upload_hosts
+
+    async def _upload_request(self, path_and_query, data, file_name, save_path=None, uploadid=None, failover=True):
+        """
+        POST one multipart upload body to the first healthy upload host, failing over to the others
+
+        Requests that are not safe to repeat pass failover=False: they are sent
+        to one host only, and its answer is returned as is, refusals included.
+
+        Returns:
+            The parsed JSON answer, or None if no host gave a usable one
+        """
+        wait = self.bandwidth.up.reserve(len(data))
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        def form():
+            body = aiohttp.FormData()
+            body.add_field('file', data, filename=file_name, content_type='application/octet-stream')
+            return body
+
+        pool = await self._get_upload_host_pool(save_path, uploadid)
+        for host in pool.candidates():
+            try:
+                result = await self._request("POST", host + path_and_query, max_retries=1, data_factory=form)
+            except aiohttp.ClientResponseError as e:
+                if e.status < 500:
+                    return None
+                result = None
+            if result is not None and (not result.get('error_code') or not failover):
+                pool.mark_ok(host)
+                return result
+            pool.mark_failed(host)
+            if not failover:
+                break
+            self.stats.incr('upload_host_failovers')
+        return None
+
+    async def _upload_small_file(self, file_path, save_path, file_size):
+        """
+        Upload a small file with one request (PCS single-step upload)
+
+        As in BaiduNetdiskClient._upload_small_file, the ondup=newcopy request
+        is sent once to one host, since a repeat the server had already carried
+        out would leave a second copy. If no usable answer comes back, the file
+        is looked up before the caller falls back to chunked upload.
+
+        Returns:
+            Result dict with the created file's metadata, or None if the caller
+            should fall back to chunked upload
+        """
+        loop = asyncio.get_event_loop()
+        data = await loop.run_in_executor(None, _read_block, file_path, 0, file_size)
+        query = (
+            "/rest/2.0/pcs/file?method=upload"
+            f"&access_token={self.access_token}"
+            f"&path={quote(save_path, safe='')}"
+            "&ondup=newcopy"
+        )
+        start_time = time.time()
+        result = await self._upload_request(query, data, os.path.basename(file_path), save_path=save_path,
+                                            failover=False)
+        if isinstance(result, dict) and result.get('error_code'):
+            # Refused by the server: nothing was created
+            return None
+        if not isinstance(result, dict) or not result.get('fs_id'):
+            result = await self._find_uploaded_file(file_path, save_path, file_size, start_time)
+            if result is None:
+                return None
+            self.stats.incr('upload_single_recovered')
+        self.stats.incr('upload_single_files')
+        self.stats.incr('upload_single_bytes', file_size)
+        result.setdefault('errno', 0)
+        return result
+
+    async def _find_uploaded_file(self, file_path, save_path, file_size, since):
+        """
+        Look for a file that an upload without a usable answer may have created
+
+        Returns:
+            Result dict like a successful upload's if save_path holds the file
+            this upload created (see BaiduNetdiskClient._is_own_upload), else None
+        """
+        fsid = await self.get_fsid_by_path(save_path)
+        if not fsid:
+            return None
+        infos = await self.get_file_info([fsid], dlink=0)
+        info = infos[0] if infos else None
+        if not info:
+            return None
+        local_md5 = None
+        if is_content_md5((info.get('md5') or '').lower()):
+            try:
+                local_md5 = await asyncio.get_event_loop().run_in_executor(None, file_md5, file_path)
+            except OSError:
+                return None
+        if not self._is_own_upload(info, file_size, since, local_md5):
+            return None
+        return {'errno': 0, 'fs_id': fsid, 'path': info.get('path') or save_path, 'size': file_size,
+                'md5': info.get('md5')}
+
+    async def upload_file(self, file_path, save_path, block_size=None):
+        """
+        Upload a file, choosing single-request or chunked upload by size
+
+        Chunked uploads hash the file on the hashing pool, then send up to
+        part_workers parts concurrently; each part is re-read, checked against
+        its precreate MD5 and retried independently.
+
+        Returns:
+            Result dict with the created file's metadata, or None on failure
+        """
+        if not self.access_token:
+            print("Error: Access token not set")
+            return None
+        loop = asyncio.get_event_loop()
+        save_path = self._resolve_path(save_path)
+        file_name = os.path.basename(file_path)
+        if save_path.endswith('/'):
+            save_path += file_name
+        try:
+            file_size = os.path.getsize(file_path)
+        except OSError as e:
+            print(f"Error: Failed to read file {file_path}: {e}")
+            return None
+
+        if file_size <= self.small_file_threshold:
+            result = await self._upload_small_file(file_path, save_path, file_size)
+            if result is not None:
+                return result
+            self.stats.incr('upload_single_fallbacks')
+
+        if not block_size:
+            block_size = await self.get_upload_block_size()
+        try:
+            digest = await loop.run_in_executor(None, self._hash_engine.hash_blocks, file_path, block_size)
+        except OSError as e:
+            print(f"Error: Failed to read file {file_path}: {e}")
+            return None
+        block_list_str = json.dumps(digest.block_md5s)
+
+        precreate_resp = await self.precreate(save_path, file_size, block_list_str)
+        if not precreate_resp or precreate_resp.get('errno') != 0 or not precreate_resp.get('uploadid'):
+            errno = precreate_resp.get('errno') if precreate_resp else None
+            print(f"Error: Precreate failed for {save_path} (errno={errno})")
+            return None
+        uploadid = precreate_resp['uploadid']
+        semaphore = asyncio.Semaphore(self.part_workers)
+
+        async def send_part(idx):
+            async with semaphore:
+                offset = idx * block_size
+                data = await loop.run_in_executor(
+                    None, _read_block, file_path, offset, min(block_size, file_size - offset), digest.block_md5s[idx]
+                )
+                if data is None:
+                    print(f"Error: {file_path} changed while uploading (block {idx})")
+                    return False
+                query = (
+                    "/rest/2.0/pcs/superfile2?method=upload"
+                    f"&access_token={self.access_token}"
+                    f"&path={quote(save_path, safe='')}"
+                    "&type=tmpfile"
+                    f"&uploadid={uploadid}"
+                    f"&partseq={idx}"
+                )
+                for attempt in range(self.part_retries + 1):
+                    if await self._upload_request(query, data, file_name, save_path, uploadid) is not None:
+                        return True
+                    if attempt < self.part_retries:
+                        self.stats.incr('upload_part_retries')
+                        await asyncio.sleep(min(2 ** attempt, 60))
+                return False
+
+        results = await asyncio.gather(*(send_part(idx) for idx in range(len(digest.block_md5s))))
+        missing = [idx for idx, ok in enumerate(results) if not ok]
+        if missing:
+            print(f"Error: Upload of {save_path} incomplete, {len(missing)}/{len(results)} parts missing")
+            return None
+
+        url = f"https://pan.baidu.com/rest/2.0/xpan/file?method=create&access_token={self.access_token}"
+        data = {
+            "path": save_path,
+            "size": str(file_size),
+            "isdir": "0",
+            "uploadid": uploadid,
+            "block_list": block_list_str,
+            "rtype": "1",
+        }
+        result = await self._request("POST", url, data=data)
+        if not result or result.get('errno') != 0:
+            errno = result.get('errno') if result else None
+            print(f"Error: Create file failed for {save_path} (errno={errno})")
+            return None
+        self.stats.incr('upload_chunked_files')
+        self.stats.incr('upload_chunked_bytes', file_size)
+        self.stats.incr('upload_chunked_parts', len(results))
+        return result
+
+    async def download_file(self, download_url, save_path, segments=None):
+        """
+        Download a URL to save_path, split into concurrent ranged requests when large
+
+        The file is preallocated and every segment writes at its own offset.
+        A server that answers the ranged requests with the whole file (200
+        instead of 206) is not retried as a failure; the file is downloaded
+        again as a single stream. An existing file at save_path is overwritten.
+
+        Returns:
+            True on success, False otherwise
+        """
+        segments = segments or self.download_segments
+        loop = asyncio.get_event_loop()
+
+        async def probe(response):
+            return response.headers.get('Content-Length'), response.headers.get('Accept-Ranges', '')
+
+        try:
+            head = await self._request("HEAD", download_url, handler=probe)
+        except aiohttp.ClientResponseError:
+            head = None
+        size = int(head[0]) if head and head[0] else None
+        if size is None or 'bytes' not in head[1].lower():
+            segments = 1
+        else:
+            segments = max(1, min(segments, size // self.MIN_SEGMENT_SIZE))
+
+        save_dir = os.path.dirname(save_path)
+        if save_dir:
+            os.makedirs(save_dir, exist_ok=True)
+        writer = _RangeWriter(save_path, size or 0)
+
+        async def fetch(start, end):
+            headers = {'Range': f'bytes={start}-{end}'} if segments > 1 else {}
+
+            async def stream(response):
+                if segments > 1 and response.status != 206:
+                    return _RANGE_IGNORED
+                position = start
+                async for chunk in response.content.iter_chunked(1024 * 1024):
+                    wait = self.bandwidth.down.reserve(len(chunk))
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    await loop.run_in_executor(None, writer.write_at, chunk, position)
+                    position += len(chunk)
+                if size is not None and position != end + 1:
+                    raise aiohttp.ClientPayloadError("response ended early")
+                return position - start
+
+            try:
+                return await self._request("GET", download_url, handler=stream, headers=headers)
+            except aiohttp.ClientResponseError:
+                return None
+
+        try:
+            if segments == 1:
+                results = [await fetch(0, (size or 0) - 1)]
+            else:
+                step = -(-size // segments)
+                results = await asyncio.gather(*(
+                    fetch(start, min(start + step, size) - 1) for start in range(0, size, step)
+                ))
+        finally:
+            writer.close()
+        if any(r is _RANGE_IGNORED for r in results):
+            self.stats.incr('download_range_ignored')
+            return await self.download_file(download_url, save_path, segments=1)
+        if any(r is None for r in results):
+            print(f"Error: Download of {save_path} failed")
+            return False
+        self.stats.incr('download_files')
+        self.stats.incr('download_bytes', sum(results))
+        return True
+
+    async def download_file_by_fsid(self, fsid, save_path, segments=None):
+        """Download file by fsid"""
+        download_url = await self.get_download_url(fsid=fsid)
+        if not download_url:
+            return False
+        return await self.download_file(download_url, save_path, segments=segments)
+
+    async def download_file_by_path(self, file_path, save_path=None, segments=None):
+        """Download file by file path"""
+        download_url = await self.get_download_url(file_path=file_path)
+        if not download_url:
+            return False
+        if save_path is None:
+            save_path = os.path.join(os.getcwd(), os.path.basename(file_path.rstrip('/')))
+        return await self.download_file(download_url, save_path, segments=segments)
+
+    async def filemanager(self, opera, filelist, ondup='fail'):
+        """
+        Run a filemanager operation (delete, rename, move, copy)
+
+        Returns:
+            The API response dict, or None if the request failed
+        """
+        if not self.access_token:
+            return None
+        url = (
+            "https://pan.baidu.com/rest/2.0/xpan/file"
+            f"?method=filemanager&opera={opera}&access_token={self.access_token}"
+        )
+        data = {
+            'async': '2',
+            'ondup': ondup,
+            'filelist': json.dumps(filelist, separators=(',', ':')),
+        }
+        result = await self._request("POST", url, data=data)
+        if result and result.get('errno') != 0:
+            print(f"Error: {opera} failed (errno={result.get('errno')}): {result.get('errmsg', 'Unknown error')}")
+        return result
+
+    async def delete_files(self, file_paths):
+        """Delete files or directories by paths"""
+        if not isinstance(file_paths, list):
+            file_paths = [file_paths]
+        paths = [self._resolve_path(p).rstrip('/') for p in file_paths]
+        paths = [p for p in paths if p and p != "/"]
+        if not paths:
+            return False
+        result = await self.filemanager('delete', [quote(p, safe='') for p in paths])
+        return bool(result) and result.get('errno') == 0
+
+    async def rename_file(self, file_path, new_name):
+        """Rename file or directory"""
+        if '/' in new_name or '\\' in new_name:
+            print("Error: New name should not contain path separators")
+            return False
+        file_path = self._resolve_path(file_path).rstrip('/')
+        result = await self.filemanager('rename', [{"path": file_path, "newname": new_name}])
+        return bool(result) and result.get('errno') == 0
+
+    async def move_file(self, file_path, dest_dir, new_name=None, ondup='fail'):
+        """Move file or directory into dest_dir"""
+        file_path = self._resolve_path(file_path).rstrip('/')
+        item = {"path": file_path, "dest": self._resolve_path(dest_dir), "newname": new_name or os.path.basename(file_path)}
+        result = await self.filemanager('move', [item], ondup=ondup)
+        return bool(result) and result.get('errno') == 0
+
+    async def copy_file(self, file_path, dest_dir, new_name=None, ondup='fail'):
+        """Copy file or directory into dest_dir"""
+        file_path = self._resolve_path(file_path).rstrip('/')
+        item = {"path": file_path, "dest": self._resolve_path(dest_dir), "newname": new_name or os.path.basename(file_path)}
+        result = await self.filemanager('copy', [item], ondup=ondup)
+        return bool(result) and result.get('errno') == 0
@@ -0,0 +1,62 @@
+"""Run many client operations concurrently and collect their outcomes"""
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+TransferResult = namedtuple('TransferResult', ['source', 'target', 'ok', 'result', 'error'])
+TransferResult.__doc__ = """Outcome of one transfer in a batch.
+
+ok tells whether the transfer succeeded; result is what the single-file
+method returned, and error the exception it raised, if any."""
+
+
+def run_batch(fn, items, max_workers=8, executor=None, window=None):
+    """
+    Call fn(*item) for every item and yield outcomes in completion order
+
+    Items are submitted lazily, keeping at most window calls queued or
+    running, so an endless or very long iterable never fills memory with
+    futures. Closing the generator early cancels calls that have not
+    started.
+
+    Args:
+        fn: Callable run for each item
+        items: Iterable of argument tuples
+        max_workers: Size of the thread pool created when no executor is given
+        executor: Optional concurrent.futures executor to run the calls on
+        window: Maximum calls in flight (default: twice max_workers)
+
+    Yields:
+        (item, result, error) with error None on success
+    """
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='bdnd-batch')
+    window = window or max(1, max_workers) * 2
+    items = iter(items)
+    pending = {}
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < window:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending[executor.submit(fn, *item)] = item
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                try:
+                    yield item, future.result(), None
+                except Exception as e:
+                    yield item, None, e
+    finally:
+        for future in pending:
+            future.cancel()
+        if own_executor:
+            executor.shutdown(wait=True)
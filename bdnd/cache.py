@@ -0,0 +1,89 @@
+"""Bounded in-memory caches with expiry for API results"""
+
+import time
+import threading
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    A thread-safe LRU cache whose entries expire after ttl seconds
+
+    Once maxsize entries are held, the least recently used one is dropped.
+    A ttl or maxsize of 0 disables the cache: nothing is stored.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300.0, name=None, stats=None):
+        """
+        Args:
+            maxsize: Largest number of entries kept
+            ttl: Seconds an entry stays valid
+            name: Optional stats prefix; hits and misses are counted as
+                '<name>_hits' / '<name>_misses'
+            stats: Optional TransferStats the counters go to
+        """
+        self.maxsize = max(0, maxsize)
+        self.ttl = ttl
+        self.name = name
+        self.stats = stats
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0 and bool(self.ttl)
+
+    def _count(self, what):
+        if self.stats is not None and self.name:
+            self.stats.incr(f"{self.name}_{what}")
+
+    def get(self, key, default=None):
+        """Get the value of key, or default if it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    hit = True
+                else:
+                    del self._entries[key]
+                    hit = False
+            else:
+                hit = False
+        self._count('hits' if hit else 'misses')
+        return entry[0] if hit else default
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        """Drop key; returns whether it was cached"""
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def discard_where(self, predicate):
+        """
+        Drop every entry for which predicate(key, value) is true
+
+        Returns:
+            Number of entries dropped
+        """
+        with self._lock:
+            keys = [key for key, (value, _) in self._entries.items() if predicate(key, value)]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
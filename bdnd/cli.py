@@ -5,6 +5,19 @@ import os
 import sys
 from .client import BaiduNetdiskClient
 from .shell import BaiduNetdiskShell
+from .filters import TransferRules
+from .localcache import LocalContentCache
+from .ratelimit import get_bandwidth_limiter
+from .utils import parse_size
+
+
+class _RuleAction(argparse.Action):
+    """Collect --include/--exclude patterns in command-line order"""
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        rules = list(getattr(namespace, self.dest, None) or [])
+        rules.append((self.const, values))
+        setattr(namespace, self.dest, rules)
 
 
 def main():
@@ -27,12 +40,83 @@ def main():
         dest="show_home",
         help="Show current default base path setting"
     )
+    parser.add_argument(
+        "--include", dest="rules", action=_RuleAction, const="+", metavar="PATTERN",
+        help="Only transfer matching files in directory transfers (glob, 'dir/' or 're:REGEX'; repeatable, first match wins)"
+    )
+    parser.add_argument(
+        "--exclude", dest="rules", action=_RuleAction, const="-", metavar="PATTERN",
+        help="Skip matching files in directory transfers; 'dir/' patterns prune whole directories (repeatable)"
+    )
+    parser.add_argument(
+        "--min-size", type=str, default=None, metavar="SIZE",
+        help="Skip files smaller than SIZE in directory transfers (e.g. 10K, 5M)"
+    )
+    parser.add_argument(
+        "--max-size", type=str, default=None, metavar="SIZE",
+        help="Skip files larger than SIZE in directory transfers (e.g. 2G)"
+    )
+    parser.add_argument(
+        "--newer-than", type=str, default=None, metavar="TIME",
+        help="Only transfer files modified after TIME (age like 7d/12h or date like 2024-01-31)"
+    )
+    parser.add_argument(
+        "--older-than", type=str, default=None, metavar="TIME",
+        help="Only transfer files modified before TIME (age like 7d/12h or date like 2024-01-31)"
+    )
+    parser.add_argument(
+        "--limit-up", type=str, default=None, metavar="RATE",
+        help="Limit upload bandwidth to RATE per second across all transfers (e.g. 20M)"
+    )
+    parser.add_argument(
+        "--limit-down", type=str, default=None, metavar="RATE",
+        help="Limit download bandwidth to RATE per second across all transfers (e.g. 50M)"
+    )
+    parser.add_argument(
+        "--verify", action="store_true",
+        help="Check downloaded files against the server's MD5 and download mismatching files again"
+    )
+    parser.add_argument(
+        "--cache-dir", type=str, default=None, metavar="DIR",
+        help="Keep downloaded files in a local content cache in DIR and serve repeated downloads from it"
+    )
+    parser.add_argument(
+        "--cache-size", type=str, default="50G", metavar="SIZE",
+        help="Size budget of the local content cache; least recently used files are dropped (default: 50G)"
+    )
+    parser.add_argument(
+        "--cache-hardlink", action="store_true",
+        help="Serve cache hits on the cache's filesystem as read-only hardlinks instead of copies"
+    )
     parser.add_argument(
         'paths', nargs='*',
         help='Two paths: upload <local> <remote> or download <remote> <local>. If not provided, enter interactive mode.'
     )
 
     args = parser.parse_args()
+
+    if args.limit_up or args.limit_down:
+        try:
+            get_bandwidth_limiter().set_limits(
+                up=parse_size(args.limit_up) if args.limit_up else None,
+                down=parse_size(args.limit_down) if args.limit_down else None
+            )
+        except ValueError as e:
+            print(f"Error: Invalid bandwidth limit: {e}")
+            sys.exit(1)
+    
+    client_options = {'verify_downloads': args.verify}
+    if args.cache_dir:
+        try:
+            client_options['content_cache'] = LocalContentCache(
+                args.cache_dir, max_bytes=parse_size(args.cache_size), hardlink=args.cache_hardlink
+            )
+        except ValueError as e:
+            print(f"Error: Invalid cache size: {e}")
+            sys.exit(1)
+        except OSError as e:
+            print(f"Error: Cannot use cache directory {args.cache_dir}: {e}")
+            sys.exit(1)
     
     # Handle --set-home option
     if args.set_home is not None:
@@ -69,9 +153,9 @@ def main():
             print("Error: access token must be provided by --access-token or environment variable 'baidu_netdisk_access_token'.")
             sys.exit(1)
         
-        client = BaiduNetdiskClient(access_token=access_token)
-        shell = BaiduNetdiskShell(client)
-        shell.run()
+        with BaiduNetdiskClient(access_token=access_token, **client_options) as client:
+            shell = BaiduNetdiskShell(client)
+            shell.run()
         return
     
     # Check if script file is provided
@@ -88,9 +172,9 @@ def main():
                 print("Error: access token must be provided by --access-token or environment variable 'baidu_netdisk_access_token'.")
                 sys.exit(1)
             
-            client = BaiduNetdiskClient(access_token=access_token)
-            shell = BaiduNetdiskShell(client)
-            shell.run_script(script_path)
+            with BaiduNetdiskClient(access_token=access_token, **client_options) as client:
+                shell = BaiduNetdiskShell(client)
+                shell.run_script(script_path)
             return
     
     # Original command-line mode requires 2 paths
@@ -104,9 +188,27 @@ def main():
         print("Error: access token must be provided by --access-token or environment variable 'baidu_netdisk_access_token'.")
         sys.exit(1)
 
-    client = BaiduNetdiskClient(access_token)
-    
-    path1, path2 = args.paths
+    rules = None
+    if args.rules or args.min_size or args.max_size or args.newer_than or args.older_than:
+        try:
+            rules = TransferRules(
+                args.rules,
+                min_size=args.min_size,
+                max_size=args.max_size,
+                newer_than=args.newer_than,
+                older_than=args.older_than
+            )
+        except Exception as e:
+            print(f"Error: Invalid transfer rule: {e}")
+            sys.exit(1)
+
+    with BaiduNetdiskClient(access_token, **client_options) as client:
+        _transfer(client, args.paths, args.mode, rules)
+
+
+def _transfer(client, paths, mode, rules):
+    """Run a command-line transfer between a local and a remote path"""
+    path1, path2 = paths
     
     def is_remote_path(path):
         return path.startswith('/') and not os.path.exists(path)
@@ -131,9 +233,9 @@ def main():
         return os.path.isdir(path) if os.path.exists(path) else path.endswith(os.sep) or path.endswith('/')
     
     # Determine operation mode
-    if args.mode:
+    if mode:
         # Use explicit mode if provided
-        if args.mode == "upload":
+        if mode == "upload":
             local = path1
             remote = path2
             
@@ -141,7 +243,7 @@ def main():
                 # Source is directory
                 if remote.endswith('/') or is_remote_dir(remote, client):
                     # Target is directory: copy directory contents to target
-                    client.upload_directory(local, remote, recursive=True)
+                    client.upload_directory(local, remote, recursive=True, rules=rules)
                 else:
                     # Target is file path: error (cannot copy directory to file)
                     print(f"Error: Cannot copy directory '{local}' to file path '{remote}'")
@@ -157,7 +259,7 @@ def main():
                     # Target is file path: copy and rename
                     client.upload_file_auto(local, remote)
                     
-        elif args.mode == "download":
+        elif mode == "download":
             remote = path1
             local = path2
             
@@ -175,7 +277,7 @@ def main():
                 # Source is directory
                 if os.path.isdir(local) if os.path.exists(local) else local.endswith(os.sep) or local.endswith('/'):
                     # Target is directory: copy directory contents to target
-                    client.download_directory(remote, local, recursive=True)
+                    client.download_directory(remote, local, recursive=True, rules=rules)
                 else:
                     # Target is file path: error (cannot copy directory to file)
                     print(f"Error: Cannot copy directory '{remote}' to file path '{local}'")
@@ -200,7 +302,7 @@ def main():
                 # Source is directory
                 if remote.endswith('/') or is_remote_dir(remote, client):
                     # Target is directory: copy directory contents to target
-                    client.upload_directory(local, remote, recursive=True)
+                    client.upload_directory(local, remote, recursive=True, rules=rules)
                 else:
                     # Target is file path: error
                     print(f"Error: Cannot copy directory '{local}' to file path '{remote}'")
@@ -234,7 +336,7 @@ def main():
                 # Source is directory
                 if os.path.isdir(local) if os.path.exists(local) else local.endswith(os.sep) or local.endswith('/'):
                     # Target is directory: copy directory contents to target
-                    client.download_directory(remote, local, recursive=True)
+                    client.download_directory(remote, local, recursive=True, rules=rules)
                 else:
                     # Target is file path: error
                     print(f"Error: Cannot copy directory '{remote}' to file path '{local}'")
@@ -6,9 +6,27 @@ import urllib3
 import ssl
 from tqdm import tqdm
 import json
-import hashlib
 import os
-from urllib.parse import quote, urlencode
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlencode, urlsplit, urljoin
+from .scanner import scan_local_tree
+from .stats import TransferStats
+from .hosts import UploadHostPool, probe_hosts, parse_locate_response
+from .multipart import MultipartFileBody
+from .hashing import HashEngine, StreamHasher, file_md5, is_content_md5
+from .reader import ReadAheadReader
+from .writer import DiskWriter
+from .ratelimit import get_bandwidth_limiter, get_api_rate_limiter
+from .concurrency import AIMDController, is_local_error
+from .executors import PriorityExecutor, PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+from .retry import RetryPolicy, CircuitBreaker
+from .batch import TransferResult, run_batch
+from .scheduler import schedule_by_size
+from .cache import TTLCache
+from .manifest import TransferManifest, DownloadState, job_manifest_path, PART_SUFFIX, STATE_SUFFIX
+from .utils import parse_size
 try:
     from env_key_manager import APIKeyManager
 except ImportError:
@@ -27,15 +45,91 @@ key_manager.setup_api_key(["baidu_netdisk_access_token"])
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# Returned by _download_file when the downloaded data fails MD5 verification
+_MD5_MISMATCH = object()
+# Returned by _download_segments when the server answers ranged requests with the whole file
+_RANGE_IGNORED = object()
+
 
 class BaiduNetdiskClient:
-    def __init__(self, access_token=None, base_path=None):
+    # Files up to this size are sent with one single-step upload request
+    # instead of precreate + superfile2 + create
+    DEFAULT_SMALL_FILE_THRESHOLD = 4 * 1024 * 1024
+    # Used when the locate endpoint is unavailable, and appended after its answer
+    DEFAULT_UPLOAD_HOSTS = ["https://c3.pcs.baidu.com", "https://d.pcs.baidu.com"]
+    # Largest upload slice allowed per account tier (uinfo vip_type: 0 normal, 1 VIP, 2 SVIP)
+    UPLOAD_BLOCK_SIZES = {
+        0: 4 * 1024 * 1024,
+        1: 16 * 1024 * 1024,
+        2: 32 * 1024 * 1024,
+    }
+    # Downloads are only split into ranged segments of at least this size
+    MIN_DOWNLOAD_SEGMENT = 16 * 1024 * 1024
+    # Granularity at which segmented downloads record progress for resume
+    DOWNLOAD_BLOCK_SIZE = 4 * 1024 * 1024
+    # Seconds between saves of a segmented download's state
+    STATE_SAVE_INTERVAL = 2.0
+    # Largest read of a download stream, and the buffers handed to the disk writer
+    DOWNLOAD_READ_SIZE = 1024 * 1024
+    # Buffers a download may have queued for the disk writer
+    DOWNLOAD_WRITE_DEPTH = 8
+    # Seconds between progress bar refreshes of a download
+    PROGRESS_INTERVAL = 0.25
+    # Seconds a resolved dlink redirect is reused, and how many are kept
+    REDIRECT_TTL = 300
+    REDIRECT_CACHE_SIZE = 1024
+    # Entries per list call when a directory is scanned for names
+    LIST_PAGE_SIZE = 1000
+    MAX_REDIRECTS = 5
+
+    def __init__(self, access_token=None, base_path=None, small_file_threshold=None, upload_block_size=None,
+                 hash_workers=None, hash_processes=0, part_workers=4, read_ahead=4, read_ahead_bytes=64 * 1024 * 1024,
+                 part_retries=5, bandwidth_limiter=None, max_part_workers=8, file_workers=4, max_file_workers=16,
+                 max_chunked_files=2, control_workers=4, retry_policy=None, api_rate_limiter=None,
+                 download_segments=4, verify_downloads=False, meta_cache_ttl=3600, meta_cache_size=4096,
+                 path_cache_ttl=300, content_cache=None):
         """
         Initialize Baidu Netdisk Client
         
         Args:
             access_token: Baidu Netdisk access token. If None, will try to get from environment variable 'baidu_netdisk_access_token'
             base_path: Base path for relative paths. If None, will try to get from config file, then environment variable 'baidu_netdisk_base_path', or default to "/"
+            small_file_threshold: Largest file size (bytes) uploaded in a single request; 0 disables the fast path
+            upload_block_size: Slice size (bytes) for chunked uploads. If None, the largest size
+                allowed for the account's VIP level is used
+            hash_workers: Threads used to hash upload blocks and files (default: number of CPUs)
+            hash_processes: If > 0, whole files queued for hashing during directory uploads
+                are hashed on a process pool of this size
+            part_workers: Initial number of upload parts in flight; adjusted automatically
+                between 1 and max_part_workers (see AIMDController)
+            read_ahead: Blocks read from disk ahead of the part senders of each file
+            read_ahead_bytes: Cap on the bytes a file's read-ahead may hold; with large
+                (SVIP) slices this allows fewer than read_ahead blocks, but always one
+            part_retries: Extra attempts each failed part gets, with exponential backoff,
+                before the upload gives up
+            bandwidth_limiter: BandwidthLimiter throttling this client's transfers
+                (default: the process-wide limiter shared by all clients)
+            max_part_workers: Upper bound for upload parts in flight across all files
+            file_workers: Initial number of files transferred concurrently by directory
+                uploads and downloads; adjusted between 1 and max_file_workers
+            max_file_workers: Upper bound for concurrently transferred files
+            max_chunked_files: Chunked uploads sending parts at the same time. Memory for
+                block buffers is at most max_chunked_files * min(read_ahead * block size,
+                max(read_ahead_bytes, block size)) + max_part_workers * block size
+            control_workers: Threads (and connections) serving metadata requests, kept
+                apart from the data transfer connection pool
+            retry_policy: RetryPolicy deciding retries, backoff and deadlines for all
+                requests (default: RetryPolicy())
+            api_rate_limiter: ApiRateLimiter pacing API calls per endpoint family
+                (default: the process-wide limiter, since Baidu counts QPS per app)
+            download_segments: Concurrent ranged requests a large download is split into
+                (files smaller than MIN_DOWNLOAD_SEGMENT per segment are not split)
+            verify_downloads: Check downloads against the server's content MD5 by default
+            meta_cache_ttl: Seconds file metadata (including dlinks) from filemetas is reused (0: no cache)
+            meta_cache_size: Largest number of fsids (and of paths) kept in the metadata caches
+            path_cache_ttl: Seconds a path -> fsid lookup is reused (0: no cache)
+            content_cache: Optional LocalContentCache; downloads by path or fsid are
+                served from it when the same content was downloaded before
         """
         # Get access_token from parameter or environment variable
         if access_token is None:
@@ -57,6 +151,109 @@ class BaiduNetdiskClient:
         if base_path != "/" and not base_path.endswith("/"):
             base_path = base_path + "/"
         self.base_path = base_path
+        if small_file_threshold is None:
+            small_file_threshold = self.DEFAULT_SMALL_FILE_THRESHOLD
+        self.small_file_threshold = small_file_threshold
+        self.upload_block_size = upload_block_size
+        self.read_ahead = max(1, read_ahead)
+        self.read_ahead_bytes = read_ahead_bytes
+        self.part_retries = max(0, part_retries)
+        self.download_segments = max(1, download_segments)
+        self.verify_downloads = verify_downloads
+        # Unfinished chunked uploads by local path, so a later attempt can resume them
+        self._upload_reports = {}
+        self._upload_reports_lock = threading.Lock()
+        self._vip_type = None
+        self._vip_type_lock = threading.Lock()
+        self._hash_engine = HashEngine(workers=hash_workers, processes=hash_processes)
+        self.stats = TransferStats()
+        self.bandwidth = bandwidth_limiter or get_bandwidth_limiter()
+        self.api_limiter = api_rate_limiter or get_api_rate_limiter()
+        # Concurrency limits, published as stats gauges
+        self.part_concurrency = AIMDController(
+            initial=part_workers, maximum=max_part_workers, name='concurrency_upload_parts', stats=self.stats
+        )
+        self.upload_file_concurrency = AIMDController(
+            initial=file_workers, maximum=max_file_workers, name='concurrency_upload_files', stats=self.stats
+        )
+        self.download_file_concurrency = AIMDController(
+            initial=file_workers, maximum=max_file_workers, name='concurrency_download_files', stats=self.stats
+        )
+        self._chunked_upload_slots = threading.BoundedSemaphore(max(1, max_chunked_files))
+        # Per worker thread: whether its current file failed locally (see _note_local_error)
+        self._local_errors = threading.local()
+        # Metadata calls and bulk transfers use separate connection pools, and
+        # metadata calls run on their own prioritized workers, so neither can
+        # starve the other
+        self._session = self._create_session(pool_size=max(1, control_workers))
+        self._data_session = self._create_session(pool_size=32)
+        self._control_executor = PriorityExecutor(workers=control_workers, name='bdnd-control')
+        self.retry_policy = retry_policy or RetryPolicy()
+        self._circuit_breaker = CircuitBreaker()
+        # Host -> whether certificate verification works for it
+        self._tls_verify = {}
+        # Download URL -> (final URL after redirects, expiry)
+        self._redirects = {}
+        self._redirects_lock = threading.Lock()
+        # filemetas results (dlinks stay valid for hours) and path -> fsid lookups,
+        # shared by every command and download; our own changes invalidate them
+        self._meta_cache = TTLCache(maxsize=meta_cache_size, ttl=meta_cache_ttl, name='meta_cache', stats=self.stats)
+        self._path_cache = TTLCache(maxsize=meta_cache_size, ttl=path_cache_ttl, name='path_cache', stats=self.stats)
+        # Download URLs the server refused (expired dlinks), reported to the retry in _download_with_dlink
+        self._rejected_dlinks = set()
+        self.content_cache = content_cache
+        self._upload_hosts = None
+        self._upload_hosts_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """
+        Stop the control-plane workers and hashing pools and close the HTTP sessions
+
+        Queued metadata calls still run before their workers exit. The client
+        cannot be used afterwards.
+        """
+        self._control_executor.shutdown(wait=True)
+        self._hash_engine.close()
+        self._session.close()
+        self._data_session.close()
+
+    @staticmethod
+    def _create_session(pool_size=16):
+        """Create a pooled HTTP session with its own connection pool"""
+        session = requests.Session()
+        session.trust_env = False
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def get_stats(self):
+        """Get a snapshot of transfer statistics (see TransferStats.snapshot)"""
+        return self.stats.snapshot()
+
+    def set_bandwidth_limit(self, up=None, down=None):
+        """
+        Limit upload and/or download throughput; applies to transfers already running
+
+        Args:
+            up: Upload limit in bytes per second, or a size string like '20M'; 0 removes the limit
+            down: Download limit, same format
+
+        Returns:
+            (up, down) limits now in effect, 0 meaning unlimited
+        """
+        if up is not None:
+            up = parse_size(up)
+        if down is not None:
+            down = parse_size(down)
+        self.bandwidth.set_limits(up=up, down=down)
+        return self.bandwidth.get_limits()
 
     def set_access_token(self, access_token):
         self.access_token = access_token
@@ -122,82 +319,125 @@ class BaiduNetdiskClient:
         else:
             return base + "/" + path
 
-    def _safe_request(self, method, url, max_retries=3, **kwargs):
-        """Safe request with SSL error handling and retry"""
-        ssl_configs = [{"verify": True}, {"verify": False}]
-        
-        # Disable proxy to avoid connection issues
-        # Also disable system environment proxy settings
+    def _safe_request(self, method, url, max_retries=None, data_plane=False, priority=PRIORITY_NORMAL,
+                      retry_policy=None, **kwargs):
+        """
+        Safe request with SSL error handling and retry
+
+        Attempts, delays and the overall deadline come from the retry policy
+        (the client's retry_policy unless one is passed; max_retries caps the
+        attempts). Connection errors, timeouts, retryable statuses (429/5xx)
+        and transient Baidu errnos in JSON bodies are retried; other HTTP
+        errors are raised at once. Whether a host needs certificate checks
+        disabled is worked out once and remembered. A host that keeps failing
+        is cut off by the circuit breaker for a while, during which requests
+        to it return None straight away. Every attempt first waits for the API
+        rate limiter of its endpoint family.
+
+        Bulk transfers (data_plane=True) are sent from the calling thread on the
+        data session. Everything else is a metadata call: each attempt runs on
+        the control executor, by priority, over the control session.
+
+        Returns:
+            Response, or None if the host could not be reached
+        """
+        policy = retry_policy or self.retry_policy
+        attempts = min(max_retries, policy.max_attempts) if max_retries else policy.max_attempts
+        host = urlsplit(url).netloc
+        streamed = kwargs.get('stream', False)
+        deadline = time.monotonic() + policy.deadline
+        
+        # Disable proxy to avoid connection issues. System proxy environment
+        # variables are ignored by the session itself (trust_env=False), which
+        # unlike editing os.environ is safe when requests run in several threads
         proxies = {'http': None, 'https': None}
         
-        # Remove any proxy-related environment variables for this request
-        original_env = {}
-        proxy_env_vars = ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy', 
-                         'ALL_PROXY', 'all_proxy', 'NO_PROXY', 'no_proxy']
-        for var in proxy_env_vars:
-            if var in os.environ:
-                original_env[var] = os.environ[var]
-                del os.environ[var]
-        
-        try:
-        for retry in range(max_retries):
-            for ssl_config in ssl_configs:
+        def send(verify):
+            waited = self.api_limiter.acquire(url)
+            if waited:
+                self.stats.add_time('api_rate_limit_wait', waited)
+            self.stats.incr('http_requests')
+            if data_plane:
+                return self._data_session.request(
+                    method, url, timeout=(10, 60), proxies=proxies, verify=verify, **kwargs
+                )
+            return self._control_executor.submit(
+                self._session.request, method, url, priority=priority,
+                timeout=(10, 60), proxies=proxies, verify=verify, **kwargs
+            ).result()
+        
+        for attempt in range(attempts):
+            if not self._circuit_breaker.allow(host):
+                self.stats.incr('http_circuit_open')
+                print(f"Error: {host} is failing repeatedly, request skipped for now")
+                return None
+            
+            verify_modes = [self._tls_verify[host]] if host in self._tls_verify else [True, False]
+            response = None
+            error = None
+            for verify in verify_modes:
                 try:
-                    response = requests.request(
-                        method,
-                        url,
-                        timeout=(10, 60),
-                            proxies=proxies,
-                        **ssl_config,
-                        **kwargs
-                    )
+                    response = send(verify)
+                    self._tls_verify[host] = verify
+                    break
+                except requests.exceptions.SSLError as e:
+                    # Try without certificate verification, then give up on this attempt
+                    error = e
+                except requests.exceptions.RequestException as e:
+                    error = e
+                    break
+            
+            retry_after = None
+            if response is not None:
+                if not policy.should_retry(response, streamed):
+                    if response.status_code < 500:
+                        self._circuit_breaker.record_success(host)
+                    # 4xx is the request's fault: raised without retrying
                     response.raise_for_status()
                     return response
-                    except requests.exceptions.SSLError as e:
-                    if ssl_config == ssl_configs[-1] and retry < max_retries - 1:
-                        time.sleep(2 ** retry)
-                        continue
-                        # Last attempt failed
-                        if retry == max_retries - 1:
-                            print(f"Error: SSL connection failed: {e}")
-                            print(f"  URL: {self._sanitize_url(url)}")
-                            print("  Note: Tried with both SSL verification enabled and disabled")
-                    except requests.exceptions.ProxyError as e:
-                        print(f"Error: Proxy connection failed: {e}")
-                        print(f"  URL: {self._sanitize_url(url)}")
-                        print("  Note: Proxy has been disabled, but system may still be using proxy settings")
-                        if retry < max_retries - 1:
-                            time.sleep(2 ** retry)
-                            continue
-                    except requests.exceptions.ConnectionError as e:
-                        print(f"Error: Connection failed: {e}")
-                        print(f"  URL: {self._sanitize_url(url)}")
-                        print("  Possible causes:")
-                        print("    - Network connectivity issue")
-                        print("    - Firewall blocking connection")
-                        print("    - DNS resolution failure")
-                        print("    - Proxy settings interfering")
-                        if retry < max_retries - 1:
-                            time.sleep(2 ** retry)
-                            continue
-                    except requests.exceptions.Timeout as e:
-                        print(f"Error: Request timeout: {e}")
-                        print(f"  URL: {self._sanitize_url(url)}")
-                        if retry < max_retries - 1:
-                            time.sleep(2 ** retry)
-                            continue
-                    except requests.exceptions.RequestException as e:
-                        print(f"Error: Request failed: {e}")
-                        print(f"  URL: {self._sanitize_url(url)}")
-                    if retry < max_retries - 1:
-                        time.sleep(2 ** retry)
-                        continue
-                    raise
-        finally:
-            # Restore original environment variables
-            for var, value in original_env.items():
-                os.environ[var] = value
-        
+                retry_after = policy.retry_after(response)
+                if response.status_code >= 500:
+                    self._circuit_breaker.record_failure(host)
+                self.stats.incr('http_retries_throttled' if response.status_code < 500 else 'http_retries_5xx')
+            elif isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+                self._circuit_breaker.record_failure(host)
+            
+            delay = policy.backoff(attempt, retry_after)
+            if attempt == attempts - 1 or time.monotonic() + delay > deadline:
+                break
+            if response is not None:
+                response.close()
+            self.stats.incr('http_retries')
+            time.sleep(delay)
+        
+        if response is not None:
+            # Out of retries: hand over the last answer (an HTTPError for a
+            # retryable status; the JSON errno is the caller's to report)
+            response.raise_for_status()
+            return response
+        if isinstance(error, requests.exceptions.SSLError):
+            print(f"Error: SSL connection failed: {error}")
+            print(f"  URL: {self._sanitize_url(url)}")
+            print("  Note: Tried with both SSL verification enabled and disabled")
+        elif isinstance(error, requests.exceptions.ProxyError):
+            print(f"Error: Proxy connection failed: {error}")
+            print(f"  URL: {self._sanitize_url(url)}")
+            print("  Note: Proxy has been disabled, but system may still be using proxy settings")
+        elif isinstance(error, requests.exceptions.ConnectionError):
+            print(f"Error: Connection failed: {error}")
+            print(f"  URL: {self._sanitize_url(url)}")
+            print("  Possible causes:")
+            print("    - Network connectivity issue")
+            print("    - Firewall blocking connection")
+            print("    - DNS resolution failure")
+            print("    - Proxy settings interfering")
+        elif isinstance(error, requests.exceptions.Timeout):
+            print(f"Error: Request timeout: {error}")
+            print(f"  URL: {self._sanitize_url(url)}")
+        elif error is not None:
+            print(f"Error: Request failed: {error}")
+            print(f"  URL: {self._sanitize_url(url)}")
+            raise error
         return None
 
     def get_user_info(self):
@@ -211,6 +451,32 @@ class BaiduNetdiskClient:
             return response.json()
             return None
 
+    def get_vip_type(self):
+        """
+        Get the account's VIP level (0 normal, 1 VIP, 2 SVIP)
+
+        Looked up once with get_user_info and cached for the session. If the
+        lookup fails the account is treated as a normal user.
+        """
+        with self._vip_type_lock:
+            if self._vip_type is None:
+                vip_type = 0
+                try:
+                    user_info = self.get_user_info()
+                    if user_info and user_info.get('errno', 0) == 0:
+                        vip_type = int(user_info.get('vip_type', 0) or 0)
+                except (requests.exceptions.RequestException, ValueError, TypeError):
+                    pass
+                self._vip_type = vip_type
+            return self._vip_type
+
+    def get_upload_block_size(self):
+        """Get the chunked upload slice size: the override if set, else the largest allowed for the account"""
+        if self.upload_block_size:
+            return self.upload_block_size
+        vip_type = self.get_vip_type()
+        return self.UPLOAD_BLOCK_SIZES.get(vip_type, self.UPLOAD_BLOCK_SIZES[0])
+
     def get_quota(self):
         """Get quota info"""
         if not self.access_token:
@@ -276,11 +542,22 @@ class BaiduNetdiskClient:
         """Recursively get all files in path"""
         if not self.access_token:
             return None
+        return list(self.iter_all_files_recursive(path=path, start=start, limit=limit, web=web, recursion=recursion))
+
+    def iter_all_files_recursive(self, path="/", start=0, limit=1000, web=1, recursion=1):
+        """
+        Recursively list all files in path, yielding entries page by page
+
+        Unlike list_all_files_recursive, entries are yielded as each listall page
+        arrives, so callers can filter and act on them without holding the whole
+        listing in memory.
+        """
+        if not self.access_token:
+            return
         
         # Resolve relative path
         path = self._resolve_path(path)
         encoded_path = quote(path, safe='/')
-        all_files = []
         current_start = start
         
         while True:
@@ -303,36 +580,32 @@ class BaiduNetdiskClient:
 
             try:
                 result = response.json()
-                file_list = result.get('list', [])
-                if not file_list:
-                    break
-
-                for item in file_list:
-                    entry = {
-                        "category": item.get("category"),
-                        "fs_id": item.get("fs_id"),
-                        "isdir": item.get("isdir"),
-                        "local_ctime": item.get("local_ctime"),
-                        "local_mtime": item.get("local_mtime"),
-                        "md5": item.get("md5"),
-                        "path": item.get("path"),
-                        "server_ctime": item.get("server_ctime"),
-                        "server_filename": item.get("server_filename"),
-                        "server_mtime": item.get("server_mtime"),
-                        "size": item.get("size"),
-                    }
-                    all_files.append(entry)
-
-                has_more = result.get('has_more', 0)
-                if has_more == 0:
-                    break
+            except (json.JSONDecodeError, Exception):
+                break
+            file_list = result.get('list', [])
+            if not file_list:
+                break
 
-                current_start += len(file_list)
+            for item in file_list:
+                yield {
+                    "category": item.get("category"),
+                    "fs_id": item.get("fs_id"),
+                    "isdir": item.get("isdir"),
+                    "local_ctime": item.get("local_ctime"),
+                    "local_mtime": item.get("local_mtime"),
+                    "md5": item.get("md5"),
+                    "path": item.get("path"),
+                    "server_ctime": item.get("server_ctime"),
+                    "server_filename": item.get("server_filename"),
+                    "server_mtime": item.get("server_mtime"),
+                    "size": item.get("size"),
+                }
 
-            except (json.JSONDecodeError, Exception):
+            has_more = result.get('has_more', 0)
+            if has_more == 0:
                 break
 
-        return all_files
+            current_start += len(file_list)
 
     @staticmethod
     def build_authorize_url(client_id, redirect_uri="oob"):
@@ -362,13 +635,280 @@ class BaiduNetdiskClient:
             'block_list': block_list if isinstance(block_list, str) else json.dumps(block_list)
         }
         headers = {'User-Agent': 'pan.baidu.com'}
-        response = self._safe_request("POST", url, headers=headers, data=payload, files=[])
+        # Starts new work, so it yields to calls that finish work in progress
+        response = self._safe_request("POST", url, headers=headers, data=payload, files=[], priority=PRIORITY_LOW)
         if response:
             return response.json()
         return None
 
-    def upload_file_auto(self, file_path, save_path, show_progress=True, file_pbar=None):
-        """Upload file using chunked upload method: precreate -> upload chunks -> create file"""
+    def locate_upload_hosts(self, save_path=None, uploadid=None):
+        """
+        Ask the upload-server locate endpoint which hosts accept uploads
+
+        Returns:
+            List of host base URLs (e.g. 'https://xafj-ct11.pcs.baidu.com'), empty on failure
+        """
+        if not self.access_token:
+            return []
+        params = {
+            'method': 'locateupload',
+            'appid': '250528',
+            'access_token': self.access_token,
+            'upload_version': '2.0',
+        }
+        if save_path:
+            params['path'] = save_path
+        if uploadid:
+            params['uploadid'] = uploadid
+        url = f"https://d.pcs.baidu.com/rest/2.0/pcs/file?{urlencode(params)}"
+        headers = {'User-Agent': 'pan.baidu.com'}
+        try:
+            response = self._safe_request("GET", url, headers=headers, max_retries=1)
+            if not response:
+                return []
+            result = response.json()
+        except (requests.exceptions.RequestException, ValueError):
+            return []
+        if result.get('error_code'):
+            return []
+        return parse_locate_response(result)
+
+    def _get_upload_host_pool(self, save_path=None, uploadid=None):
+        """Locate and rank upload hosts on first use; the ranking is kept for the session"""
+        with self._upload_hosts_lock:
+            if self._upload_hosts is None:
+                start_time = time.time()
+                hosts = self.locate_upload_hosts(save_path, uploadid)
+                hosts += [h for h in self.DEFAULT_UPLOAD_HOSTS if h not in hosts]
+                reachable, unreachable = probe_hosts(self._data_session, hosts)
+                ranked = [h for h, _ in reachable] + unreachable
+                self._upload_hosts = UploadHostPool(ranked)
+                self.stats.add_time('upload_host_discovery', time.time() - start_time)
+                self.stats.set('upload_host', ranked[0])
+                self.stats.set('upload_hosts_known', len(ranked))
+            return self._upload_hosts
+
+    def _upload_request(self, method, path_and_query, save_path=None, uploadid=None, failover=True, **kwargs):
+        """
+        Send a request to the fastest healthy upload host
+
+        Connection errors, timeouts and 5xx responses put the host on cooldown
+        and the request moves to the next host. Other HTTP errors are not the
+        host's fault and are returned as a failure right away. Requests that
+        are not safe to repeat pass failover=False and get only one attempt.
+
+        Returns:
+            Response, or None if every host failed
+        """
+        pool = self._get_upload_host_pool(save_path, uploadid)
+        for host in pool.candidates():
+            try:
+                resp = self._safe_request(method, host + path_and_query, max_retries=1, data_plane=True, **kwargs)
+            except requests.exceptions.HTTPError as e:
+                if e.response is not None and e.response.status_code < 500:
+                    return None
+                resp = None
+            except requests.exceptions.RequestException:
+                resp = None
+            if resp is not None:
+                pool.mark_ok(host)
+                self.stats.set('upload_host', host)
+                return resp
+            pool.mark_failed(host)
+            if not failover:
+                break
+            self.stats.incr('upload_host_failovers')
+        return None
+
+    def _note_local_error(self):
+        """
+        Record that the current thread's file failed because of a local error
+
+        Directory transfers check this with _take_local_error before releasing
+        their concurrency slot: a file that could not be read or written locally
+        (permissions, full disk) must not cut the network concurrency limit.
+        """
+        self._local_errors.failed = True
+
+    def _take_local_error(self):
+        """Whether _note_local_error was called on this thread since the last call; resets it"""
+        failed = getattr(self._local_errors, 'failed', False)
+        self._local_errors.failed = False
+        return failed
+
+    def get_hash_engine(self):
+        """Get the HashEngine used for upload digests"""
+        return self._hash_engine
+
+    def get_upload_report(self, file_path):
+        """
+        Get what is left of an unfinished chunked upload of file_path
+
+        Returns:
+            Dict with save_path, uploadid, block_size, block_md5s and
+            missing_partseqs, or None if the last upload of the file did not
+            fail part-way
+        """
+        with self._upload_reports_lock:
+            return self._upload_reports.get(file_path)
+
+    @staticmethod
+    def _format_partseqs(partseqs, limit=10):
+        """Format partseqs as compact ranges, e.g. '3-5, 9'"""
+        ranges = []
+        for seq in partseqs:
+            if ranges and ranges[-1][1] == seq - 1:
+                ranges[-1][1] = seq
+            else:
+                ranges.append([seq, seq])
+        text = ", ".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges[:limit])
+        if len(ranges) > limit:
+            text += ", ..."
+        return text
+
+    def _upload_parts(self, file_path, save_path, uploadid, block_size, block_md5s, pbar=None, show_chunks=True,
+                      partseqs=None):
+        """
+        Send the parts of a precreated chunked upload
+
+        A ReadAheadReader reads and verifies blocks on its own thread while
+        senders upload the blocks it has queued, so disk reads, MD5
+        verification and network sends overlap. It reads up to read_ahead
+        blocks ahead, but no more than read_ahead_bytes (and at least one
+        block). Each send holds a slot of part_concurrency, which is shared by
+        all uploads of this client and adapts to the throughput and failures
+        it observes. A part that fails
+        is retried by its sender, up to part_retries times with exponential
+        backoff and without holding a slot while waiting, while the other
+        senders carry on; only when one part runs out of retries does the
+        transfer stop.
+
+        Args:
+            partseqs: Parts to send (default: all)
+
+        Returns:
+            Sorted list of partseqs that were not uploaded (empty on success)
+        """
+        total_blocks = len(block_md5s)
+        wanted = set(range(total_blocks)) if partseqs is None else set(partseqs)
+        file_name = os.path.basename(file_path)
+        headers = {'User-Agent': 'pan.baidu.com'}
+        done = set()
+        lock = threading.Lock()
+        failed = threading.Event()
+        read_failed = threading.Event()
+        progress = {'bytes': 0}
+        start_time = time.time()
+        depth = max(1, min(self.read_ahead, self.read_ahead_bytes // block_size))
+        reader = ReadAheadReader(file_path, block_size, depth=depth, block_md5s=block_md5s, partseqs=wanted)
+
+        controller = self.part_concurrency
+
+        def send_parts():
+            while not failed.is_set():
+                slot = controller.acquire()
+                try:
+                    item = None if failed.is_set() else reader.get()
+                except Exception as e:
+                    controller.release(slot, sample=False)
+                    print(f"Error: Failed to read {file_path}: {e}")
+                    read_failed.set()
+                    failed.set()
+                    return
+                if item is None:
+                    controller.release(slot, sample=False)
+                    return
+                idx, offset, data = item
+                query = (
+                    "/rest/2.0/pcs/superfile2"
+                    f"?method=upload"
+                    f"&access_token={self.access_token}"
+                    f"&path={save_path}"
+                    f"&type=tmpfile"
+                    f"&uploadid={uploadid}"
+                    f"&partseq={idx}"
+                )
+                body = MultipartFileBody(data, file_name=file_name, throttle=self.bandwidth.up.consume)
+                attempt = 0
+                while True:
+                    if slot is None:
+                        slot = controller.acquire()
+                    try:
+                        resp = self._upload_request(
+                            "POST", query, save_path=save_path, uploadid=uploadid,
+                            headers=body.headers(headers), data=body
+                        )
+                    except BaseException:
+                        controller.release(slot, sample=False)
+                        raise
+                    controller.release(slot, len(data) if resp else 0, ok=bool(resp))
+                    slot = None
+                    if resp:
+                        break
+                    if attempt >= self.part_retries:
+                        print(f"Error: Chunk {idx+1}/{total_blocks} of {save_path} failed after {attempt+1} attempts")
+                        failed.set()
+                        return
+                    self.stats.incr('upload_part_retries')
+                    # Another part giving up ends the wait early
+                    if failed.wait(min(2 ** attempt, 60)):
+                        return
+                    attempt += 1
+                with lock:
+                    done.add(idx)
+                    progress['bytes'] += len(data)
+                    if pbar:
+                        pbar.update(len(data))
+                        elapsed_time = time.time() - start_time
+                        if elapsed_time > 0:
+                            avg_speed = progress['bytes'] / elapsed_time
+                            if show_chunks:
+                                pbar.set_postfix({
+                                    'Chunk': f"{len(done)}/{total_blocks}",
+                                    'Speed': f"{self._format_size(avg_speed)}/s"
+                                })
+                            else:
+                                pbar.set_postfix({'Speed': f"{self._format_size(avg_speed)}/s"})
+
+        workers = min(controller.maximum, len(wanted)) or 1
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bdnd-part')
+        try:
+            futures = [pool.submit(send_parts) for _ in range(workers)]
+            for future in futures:
+                future.result()
+        except BaseException:
+            failed.set()
+            raise
+        finally:
+            reader.close()
+            pool.shutdown(wait=True)
+        if read_failed.is_set():
+            # Reported here, on the thread that uploads the file
+            self._note_local_error()
+        return sorted(wanted - done)
+
+    def upload_file_auto(self, file_path, save_path, show_progress=True, file_pbar=None, block_size=None,
+                         digest=None):
+        """
+        Upload file, choosing the upload method by size
+
+        Files up to small_file_threshold are sent with a single request; larger
+        files (or small files whose single request fails) use chunked upload:
+        precreate -> upload chunks -> create file. The path taken is counted in
+        stats ('upload_single_files' / 'upload_chunked_files').
+
+        block_size overrides the slice size for this upload; by default it is
+        the largest size allowed for the account's VIP level. Blocks are hashed
+        in parallel on the client's HashEngine unless a FileDigest computed
+        ahead of time (for the same block size) is passed as digest; a digest
+        that no longer matches the file's size or mtime is ignored. Parts are
+        read ahead and sent by part_workers concurrent senders (see _upload_parts).
+
+        An upload that failed part-way is resumed from its upload report
+        (see get_upload_report). If the resumed session fails, e.g. because
+        its uploadid has expired, the report is dropped and the file is
+        uploaded once more with a new precreate.
+        """
         if not self.access_token:
             print("Error: Access token not set")
             return None
@@ -380,59 +920,87 @@ class BaiduNetdiskClient:
             if save_path.endswith('/'):
                 save_path = save_path + file_name
 
-            def calc_md5(parts):
-                md5s = []
-                for part in parts:
-                    m = hashlib.md5()
-                    m.update(part)
-                    md5s.append(m.hexdigest())
-                return md5s
-
-            block_size = 4 * 1024 * 1024
-            blocks = []
             try:
                 file_size = os.path.getsize(file_path)
-                with open(file_path, "rb") as f:
-                    while True:
-                        part = f.read(block_size)
-                        if not part:
-                            break
-                        blocks.append(part)
             except FileNotFoundError:
+                self._note_local_error()
+                print(f"Error: File not found: {file_path}")
+                return None
+            except OSError as e:
+                if is_local_error(e):
+                    self._note_local_error()
+                print(f"Error: Failed to read file {file_path}: {e}")
+                return None
+
+            if file_size <= self.small_file_threshold:
+                result = self._upload_small_file(file_path, save_path, file_size)
+                if result is not None:
+                    self.invalidate_paths([save_path])
+                    if file_pbar is not None:
+                        file_pbar.update(file_size)
+                    return result
+                self.stats.incr('upload_single_fallbacks')
+
+            if not block_size:
+                block_size = self.get_upload_block_size()
+            self.stats.set('upload_block_size', block_size)
+            expected_blocks = (file_size + block_size - 1) // block_size
+            try:
+                if digest is not None:
+                    st = os.stat(file_path)
+                    if (digest.size != st.st_size or digest.mtime != st.st_mtime
+                            or len(digest.block_md5s) != expected_blocks):
+                        digest = None
+                if digest is None:
+                    # Only the digests are kept; parts are streamed from disk again
+                    # when they are sent, so the file is never held in memory
+                    hash_start = time.time()
+                    digest = self._hash_engine.hash_blocks(file_path, block_size)
+                    self.stats.add_time('hash_file', time.time() - hash_start)
+                    self.stats.incr('hash_bytes', digest.size)
+                block_md5s = digest.block_md5s
+            except FileNotFoundError:
+                self._note_local_error()
                 print(f"Error: File not found: {file_path}")
                 return None
             except PermissionError:
+                self._note_local_error()
                 print(f"Error: Permission denied: {file_path}")
                 return None
             except Exception as e:
+                # Reading or hashing the file failed
+                self._note_local_error()
                 print(f"Error: Failed to read file {file_path}: {e}")
                 return None
 
-            block_md5s = calc_md5(blocks)
             block_list_str = json.dumps(block_md5s)
 
-            precreate_resp = self.precreate(save_path, file_size, block_list_str)
-            if not precreate_resp:
-                print(f"Error: Precreate request failed for {save_path}")
-                return None
-            if precreate_resp.get("errno") != 0:
-                errno = precreate_resp.get("errno")
-                errmsg = precreate_resp.get("errmsg", "Unknown error")
-                print(f"Error: Precreate failed (errno={errno}): {errmsg}")
-                return None
-            uploadid = precreate_resp.get("uploadid")
-            if not uploadid:
-                print(f"Error: No uploadid returned from precreate")
-                return None
+            report = self.get_upload_report(file_path)
+            resumed = bool(report and report['save_path'] == save_path and report['block_size'] == block_size
+                           and report['block_md5s'] == block_md5s)
+            if resumed:
+                # Same file, same destination: only send the parts the last attempt missed
+                uploadid = report['uploadid']
+                partseqs = report['missing_partseqs']
+                self.stats.incr('upload_resumed_files')
+            else:
+                partseqs = None
+                uploadid = self._precreate_upload(save_path, file_size, block_list_str)
+                if not uploadid:
+                    return None
         except Exception as e:
+            if is_local_error(e):
+                self._note_local_error()
             print(f"Error: Unexpected error during upload preparation: {e}")
             import traceback
             traceback.print_exc()
             return None
 
-        headers = {'User-Agent': 'pan.baidu.com'}
-        total_blocks = len(blocks)
+        total_blocks = len(block_md5s)
         file_name = os.path.basename(file_path)
+
+        def part_bytes(seqs):
+            return sum(min(block_size, file_size - idx * block_size) for idx in seqs)
         
         if file_pbar is not None:
             pbar = file_pbar
@@ -449,84 +1017,223 @@ class BaiduNetdiskClient:
         else:
             pbar = None
         
-        total_uploaded = 0
-        start_time = time.time()
-        
         try:
-            for idx, part in enumerate(blocks):
-                url = (
-                    "https://c3.pcs.baidu.com/rest/2.0/pcs/superfile2"
-                    f"?method=upload"
-                    f"&access_token={self.access_token}"
-                    f"&path={save_path}"
-                    f"&type=tmpfile"
-                    f"&uploadid={uploadid}"
-                    f"&partseq={idx}"
-                )
-                files = [('file', (file_name, part))]
-                
-                # Use _safe_request for chunk upload
-                resp = self._safe_request("POST", url, headers=headers, data={}, files=files)
-                
-                if not resp:
-                    if pbar:
+            while True:
+                if partseqs is not None and pbar:
+                    # Parts sent by the earlier attempt count as done
+                    pbar.update(file_size - part_bytes(partseqs))
+                with self._chunked_upload_slots:
+                    missing = self._upload_parts(
+                        file_path, save_path, uploadid, block_size, block_md5s,
+                        pbar=pbar, show_chunks=file_pbar is None, partseqs=partseqs
+                    )
+                result = None if missing else self._create_uploaded_file(save_path, file_size, uploadid,
+                                                                          block_list_str)
+                if result is not None or not resumed:
+                    break
+                # The saved upload session may have expired or been rejected:
+                # start over once with a new one
+                resumed = False
+                with self._upload_reports_lock:
+                    self._upload_reports.pop(file_path, None)
+                self.stats.incr('upload_resume_restarts')
+                print(f"Warning: Resuming the upload of {save_path} failed, starting a new upload")
+                if pbar:
+                    pbar.update(-(file_size - part_bytes(missing)))
+                partseqs = None
+                uploadid = self._precreate_upload(save_path, file_size, block_list_str)
+                if not uploadid:
+                    if pbar and file_pbar is None:
                         pbar.close()
-                    print(f"Error: Failed to upload chunk {idx+1}/{total_blocks}")
                     return None
-                
-                part_size = len(part)
-                total_uploaded += part_size
-                if pbar:
-                    pbar.update(part_size)
-                    elapsed_time = time.time() - start_time
-                    if elapsed_time > 0:
-                        avg_speed = total_uploaded / elapsed_time
-                        if file_pbar is None:
-                            pbar.set_postfix({
-                                'Chunk': f"{idx+1}/{total_blocks}",
-                                'Speed': f"{self._format_size(avg_speed)}/s"
-                            })
-                        else:
-                            pbar.set_postfix({'Speed': f"{self._format_size(avg_speed)}/s"})
-        
+
             if pbar and file_pbar is None:
                 pbar.close()
-
-            url_create = "https://pan.baidu.com/rest/2.0/xpan/file?method=create"
-            data = {
-                "path": save_path,
-                "size": str(file_size),
-                "isdir": "0",
-                "uploadid": uploadid,
-                "block_list": block_list_str,
-                "rtype": "1",
-                "access_token": self.access_token
-            }
-            resp = self._safe_request("POST", url_create, data=data, headers=headers)
-            if resp:
-                result = resp.json()
-                if result.get("errno") != 0:
-                    errno = result.get("errno")
-                    errmsg = result.get("errmsg", "Unknown error")
-                    print(f"Error: Create file failed (errno={errno}): {errmsg}")
-                    return None
-                return result
-            else:
-                print(f"Error: Create file request failed for {save_path}")
+            if missing:
+                with self._upload_reports_lock:
+                    self._upload_reports[file_path] = {
+                        'save_path': save_path,
+                        'uploadid': uploadid,
+                        'block_size': block_size,
+                        'block_md5s': block_md5s,
+                        'missing_partseqs': missing,
+                    }
+                print(f"Error: Upload of {save_path} incomplete, {len(missing)}/{total_blocks} parts missing "
+                      f"(partseq {self._format_partseqs(missing)}); upload the file again to resume")
+                return None
+            with self._upload_reports_lock:
+                self._upload_reports.pop(file_path, None)
+            if result is None:
                 return None
+
+            self.stats.incr('upload_chunked_files')
+            self.stats.incr('upload_chunked_bytes', file_size)
+            self.stats.incr('upload_chunked_parts', total_blocks)
+            self.invalidate_paths([save_path])
+            return result
         except KeyboardInterrupt:
-            if pbar:
+            if pbar and file_pbar is None:
                 pbar.close()
             print("\nError: Upload interrupted by user")
             return None
         except Exception as e:
-            if pbar:
+            if pbar and file_pbar is None:
                 pbar.close()
             print(f"Error: Unexpected error during upload: {e}")
             import traceback
             traceback.print_exc()
             return None
 
+    def _precreate_upload(self, save_path, file_size, block_list_str):
+        """
+        Start a chunked upload session
+
+        Returns:
+            The uploadid, or None if precreate failed
+        """
+        precreate_resp = self.precreate(save_path, file_size, block_list_str)
+        if not precreate_resp:
+            print(f"Error: Precreate request failed for {save_path}")
+            return None
+        if precreate_resp.get("errno") != 0:
+            errno = precreate_resp.get("errno")
+            errmsg = precreate_resp.get("errmsg", "Unknown error")
+            print(f"Error: Precreate failed (errno={errno}): {errmsg}")
+            return None
+        uploadid = precreate_resp.get("uploadid")
+        if not uploadid:
+            print(f"Error: No uploadid returned from precreate")
+            return None
+        return uploadid
+
+    def _create_uploaded_file(self, save_path, file_size, uploadid, block_list_str):
+        """
+        Finish a chunked upload whose parts have all been sent
+
+        Returns:
+            The create result dict, or None if the request failed
+        """
+        url_create = "https://pan.baidu.com/rest/2.0/xpan/file?method=create"
+        data = {
+            "path": save_path,
+            "size": str(file_size),
+            "isdir": "0",
+            "uploadid": uploadid,
+            "block_list": block_list_str,
+            "rtype": "1",
+            "access_token": self.access_token
+        }
+        headers = {'User-Agent': 'pan.baidu.com'}
+        resp = self._safe_request("POST", url_create, data=data, headers=headers, priority=PRIORITY_HIGH)
+        if not resp:
+            print(f"Error: Create file request failed for {save_path}")
+            return None
+        result = resp.json()
+        if result.get("errno") != 0:
+            errno = result.get("errno")
+            errmsg = result.get("errmsg", "Unknown error")
+            print(f"Error: Create file failed (errno={errno}): {errmsg}")
+            return None
+        return result
+
+    def _upload_small_file(self, file_path, save_path, file_size):
+        """
+        Upload a small file with one request (PCS single-step upload)
+
+        The request is sent once, without failover to other hosts: with
+        ondup=newcopy, a repeated request that the server had already carried
+        out would leave a second copy. If no usable answer comes back, the
+        request may still have gone through, so the file is looked up before
+        the caller falls back to chunked upload.
+
+        Returns:
+            Result dict with the created file's metadata, or None if the request
+            failed and the caller should fall back to chunked upload
+        """
+        query = (
+            "/rest/2.0/pcs/file"
+            "?method=upload"
+            f"&access_token={self.access_token}"
+            f"&path={quote(save_path, safe='')}"
+            "&ondup=newcopy"
+        )
+        headers = {'User-Agent': 'pan.baidu.com'}
+        body = MultipartFileBody(file_path, 0, file_size, file_name=os.path.basename(file_path),
+                                 throttle=self.bandwidth.up.consume)
+
+        start_time = time.time()
+        resp = self._upload_request("POST", query, save_path=save_path, failover=False,
+                                    headers=body.headers(headers), data=body)
+        result = None
+        if resp:
+            try:
+                result = resp.json()
+            except ValueError:
+                result = None
+            if isinstance(result, dict) and result.get('error_code'):
+                # Refused by the server: nothing was created
+                return None
+        if not isinstance(result, dict) or not result.get('fs_id'):
+            result = self._find_uploaded_file(file_path, save_path, file_size, start_time)
+            if result is None:
+                return None
+            self.stats.incr('upload_single_recovered')
+
+        self.stats.add_time('upload_single_request', time.time() - start_time)
+        self.stats.incr('upload_single_files')
+        self.stats.incr('upload_single_bytes', file_size)
+        result.setdefault('errno', 0)
+        return result
+
+    def _find_uploaded_file(self, file_path, save_path, file_size, since):
+        """
+        Look for a file that an upload without a usable answer may have created
+
+        Args:
+            since: Time the upload was sent; see _is_own_upload
+
+        Returns:
+            Result dict like a successful upload's if save_path holds the file
+            this upload created, else None
+        """
+        fsid = self.get_fsid_by_path(save_path, use_cache=False)
+        if not fsid:
+            return None
+        infos = self.get_file_info([fsid], dlink=0, refresh=True)
+        info = infos[0] if infos else None
+        if not info:
+            return None
+        local_md5 = None
+        if is_content_md5((info.get('md5') or '').lower()):
+            try:
+                local_md5 = file_md5(file_path)
+            except OSError:
+                return None
+        if not self._is_own_upload(info, file_size, since, local_md5):
+            return None
+        return {'errno': 0, 'fs_id': fsid, 'path': info.get('path') or save_path, 'size': file_size,
+                'md5': info.get('md5')}
+
+    @staticmethod
+    def _is_own_upload(info, file_size, since, local_md5=None):
+        """
+        Whether the remote file described by info was created by an upload sent at since
+
+        Where the server reports a plain content MD5 it must equal local_md5
+        (the uploaded file's). Baidu obfuscates the MD5 of some files; then the
+        file must have been created after the upload was sent, so a file that
+        was already at the path is never taken for the upload.
+        """
+        if not info or info.get('size') != file_size:
+            return False
+        remote_md5 = (info.get('md5') or '').lower()
+        if is_content_md5(remote_md5):
+            return remote_md5 == local_md5
+        try:
+            return int(info.get('server_ctime') or 0) >= int(since)
+        except (TypeError, ValueError):
+            return False
+
     def create_directory(self, dir_path):
         """Create directory on Baidu Netdisk"""
         if not self.access_token:
@@ -547,11 +1254,52 @@ class BaiduNetdiskClient:
         response = self._safe_request("POST", url, headers=headers, data=data)
         if response:
             result = response.json()
-            return result.get('errno') == 0
+            if result.get('errno') == 0:
+                self.invalidate_paths([dir_path])
+                return True
         return False
 
-    def upload_directory(self, local_dir, remote_dir, recursive=True, file_filter=None):
-        """Upload entire directory to Baidu Netdisk"""
+    def upload_directory(self, local_dir, remote_dir, recursive=True, file_filter=None,
+                         dir_filter=None, scan_workers=8, rules=None, mkdir_workers=4, hash_ahead=4,
+                         schedule_window=512, checkpoint=True):
+        """
+        Upload entire directory to Baidu Netdisk
+
+        The local tree is scanned in parallel and streamed, so uploading starts
+        as soon as the first files are found instead of after a full walk.
+        Creating a file also creates its missing parent directories, so only
+        directories that end up without files are created explicitly. Those
+        requests run on a small thread pool alongside the file uploads. Files
+        that need chunked upload are hashed a few files ahead of the one being
+        uploaded, so hashing overlaps with the network. Files are uploaded
+        concurrently; how many at a time is decided by upload_file_concurrency
+        from the throughput and failures it sees. Within each schedule_window
+        scanned files the largest go first with small files packed in between
+        (see schedule_by_size), so the run does not end on one big file.
+
+        With checkpoint, every finished file is recorded in a job manifest on
+        disk (see TransferManifest), as are the parts still missing from files
+        that failed part-way. Rerunning the same upload skips files recorded
+        with an unchanged size and mtime, and resumes the unfinished ones. A
+        run in which every file succeeds deletes the manifest.
+
+        Args:
+            local_dir: Local directory to upload
+            remote_dir: Remote target directory
+            recursive: Whether to upload subdirectories
+            file_filter: Optional callable(file_name) -> bool selecting files to upload
+            dir_filter: Optional callable(rel_dir) -> bool; directories it rejects are
+                pruned during the scan and never descended into
+            scan_workers: Number of threads used to scan the local tree
+            rules: Optional TransferRules; excluded directories are pruned during the scan
+            mkdir_workers: Number of concurrent requests for creating empty directories
+            hash_ahead: Number of upcoming files hashed in the background while uploading
+            schedule_window: Number of scanned files reordered by size at a time (0: scan order)
+            checkpoint: Record progress in a job manifest and skip what a previous run finished
+
+        Returns:
+            Number of files uploaded successfully (including files skipped by the checkpoint)
+        """
         if not self.access_token:
             return 0
         
@@ -566,133 +1314,203 @@ class BaiduNetdiskClient:
             remote_dir += '/'
         
         remote_base_dir = remote_dir.rstrip('/')
-        if remote_base_dir:
-            self.create_directory(remote_base_dir)
         
-        files_to_upload = []
-        dirs_to_create = []
+        def entry_filter(entry):
+            if rules is not None and not rules.match_local_entry(entry):
+                return False
+            return file_filter is None or file_filter(os.path.basename(entry.path))
         
-        if recursive:
-            for root, dirs, files in os.walk(local_dir):
-                rel_root = os.path.relpath(root, local_dir)
-                if rel_root == '.':
-                    rel_root = ''
-                
-                for d in dirs:
-                    dir_path = os.path.join(root, d)
-                    rel_dir = os.path.join(rel_root, d).replace('\\', '/') if rel_root else d
-                    remote_dir_path = remote_dir + rel_dir + '/'
-                    dirs_to_create.append(remote_dir_path)
-                
-                for f in files:
-                    file_path = os.path.join(root, f)
-                    rel_file = os.path.join(rel_root, f).replace('\\', '/') if rel_root else f
-                    remote_file_path = remote_dir + rel_file
-                    files_to_upload.append((file_path, remote_file_path))
-        else:
-            for item in os.listdir(local_dir):
-                item_path = os.path.join(local_dir, item)
-                if os.path.isdir(item_path):
-                    dirs_to_create.append(remote_dir + item + '/')
-                elif os.path.isfile(item_path):
-                    if file_filter is None or file_filter(item):
-                        files_to_upload.append((item_path, remote_dir + item))
+        def rel_dir_filter(rel_dir):
+            if rules is not None and not rules.match_dir(rel_dir):
+                return False
+            return dir_filter is None or dir_filter(rel_dir)
+        
+        entries = scan_local_tree(
+            local_dir,
+            recursive=recursive,
+            dir_filter=rel_dir_filter,
+            file_filter=entry_filter,
+            workers=scan_workers
+        )
         
-        created_dirs = set()
-        unique_dirs = set(dirs_to_create)
-        sorted_dirs = sorted(unique_dirs, key=lambda x: x.count('/'))
-        
-        if sorted_dirs:
-            all_dirs_to_create = []
-            for dir_path in sorted_dirs:
-                parts = dir_path.rstrip('/').split('/')
-                for i in range(1, len(parts) + 1):
-                    parent_dir = '/'.join(parts[:i])
-                    if i > 1:
-                        parent_dir += '/'
-                    if parent_dir not in created_dirs and parent_dir and parent_dir != '/':
-                        clean_path = parent_dir.rstrip('/')
-                        if clean_path and clean_path not in all_dirs_to_create:
-                            all_dirs_to_create.append(clean_path)
-                            created_dirs.add(parent_dir)
-            
-            if all_dirs_to_create:
-                dir_pbar = tqdm(
-                    total=len(all_dirs_to_create),
-                    desc="Creating directories",
-                    unit="dir",
-                    ncols=120,
-                    bar_format='{desc}: {percentage:3.0f}%|{bar}| {n}/{total} [{elapsed}<{remaining}]'
-                )
-                
-                for dir_path in all_dirs_to_create:
-                    self.create_directory(dir_path)
-                    dir_pbar.update(1)
-                
-                dir_pbar.close()
-        
-        if file_filter:
-            files_to_upload = [(f, r) for f, r in files_to_upload if file_filter(os.path.basename(f))]
-        
-        total_files = len(files_to_upload)
-        if total_files == 0:
-            return 0
+        manifest = TransferManifest(job_manifest_path('upload', local_dir, remote_dir)) if checkpoint else None
+        skipped = {'files': 0}
+        
+        def unfinished(entries):
+            for entry in entries:
+                if (manifest is not None and not entry.is_dir
+                        and manifest.is_done(entry.rel_path, entry.size, mtime=entry.mtime)):
+                    skipped['files'] += 1
+                    continue
+                yield entry
+        
+        # Finished files are dropped before scheduling, so they take no room in its window
+        entries = unfinished(entries)
+        if schedule_window > 0:
+            entries = schedule_by_size(
+                entries,
+                lambda entry: entry.size,
+                passthrough=lambda entry: entry.is_dir,
+                window=schedule_window,
+                small_size=self.small_file_threshold
+            )
         
-        success_count = 0
+        def prehashed(entries):
+            # Start hashing large files as they come out of the scan and hand
+            # them on hash_ahead entries later, together with their digest future
+            window = deque()
+            block_size = None
+            for entry in entries:
+                future = None
+                if hash_ahead > 0 and not entry.is_dir and entry.size > self.small_file_threshold:
+                    if block_size is None:
+                        block_size = self.get_upload_block_size()
+                    future = self._hash_engine.submit(entry.path, block_size)
+                window.append((entry, future))
+                if len(window) > hash_ahead:
+                    yield window.popleft()
+            while window:
+                yield window.popleft()
+        
+        mkdir_futures = {}
+        found_entries = False
+        
+        controller = self.upload_file_concurrency
+        lock = threading.Lock()
+        progress = {'ok': 0, 'bytes': 0}
+        total_files = 0
         pbar = tqdm(
-            total=total_files, 
+            total=0, 
             desc="Uploading", 
             unit="file", 
             ncols=120,
-            bar_format='{desc}: {percentage:3.0f}%|{bar}| {n} [{elapsed}<{remaining}{postfix}]'
+            bar_format='{desc}: {percentage:3.0f}%|{bar}| {n}/{total} [{elapsed}<{remaining}{postfix}]'
+        )
+        # One byte-level bar shared by all files in flight
+        bytes_pbar = tqdm(
+            total=0,
+            unit='B',
+            unit_scale=True,
+            unit_divisor=1024,
+            desc="Data:",
+            ncols=120,
+            position=1,
+            leave=False,
+            bar_format='{desc} {percentage:3.0f}%|{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]'
         )
         start_time = time.time()
-        total_uploaded = 0
         
-        for local_file, remote_file in files_to_upload:
-            file_name = os.path.basename(local_file)
-            file_size = os.path.getsize(local_file)
-            
-            pbar.set_description(f"Uploading {file_name[:25]} ({self._format_size(file_size)})")
-            
-            file_pbar = tqdm(
-                total=file_size,
-                unit='B',
-                unit_scale=True,
-                unit_divisor=1024,
-                desc=f"{file_name[:25]}:",
-                ncols=120,
-                position=1,
-                leave=False,
-                bar_format='{desc} {percentage:3.0f}%|{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]'
-            )
-            
+        def upload_one(entry, digest_future, slot):
+            file_name = os.path.basename(entry.path)
+            ok = False
+            self._take_local_error()
             try:
-                result = self.upload_file_auto(local_file, remote_file, show_progress=False, file_pbar=file_pbar)
-                if result:
-                    success_count += 1
-                    total_uploaded += file_size
-                else:
+                if manifest is not None and self.get_upload_report(entry.path) is None:
+                    state = manifest.partial_state(entry.rel_path)
+                    if state:
+                        # Left unfinished by an earlier run: upload_file_auto resumes it
+                        with self._upload_reports_lock:
+                            self._upload_reports[entry.path] = state
+                digest = None
+                if digest_future is not None:
+                    try:
+                        digest = digest_future.result()
+                    except Exception:
+                        # upload_file_auto hashes again and reports the error
+                        digest = None
+                result = self.upload_file_auto(entry.path, remote_dir + entry.rel_path, show_progress=False,
+                                               file_pbar=bytes_pbar, digest=digest)
+                ok = bool(result)
+                if manifest is not None:
+                    if ok:
+                        md5 = result.get('md5') if isinstance(result, dict) else None
+                        manifest.mark_done(entry.rel_path, entry.size, md5=md5, mtime=entry.mtime)
+                    else:
+                        report = self.get_upload_report(entry.path)
+                        if report:
+                            manifest.mark_partial(entry.rel_path, report)
+                        elif manifest.partial_state(entry.rel_path):
+                            # The recorded session failed and upload_file_auto dropped it
+                            manifest.clear_partial(entry.rel_path)
+                if not ok:
                     print(f"Warning: Failed to upload {file_name}")
             except Exception as e:
+                if is_local_error(e):
+                    self._note_local_error()
                 print(f"Error: Exception while uploading {file_name}: {e}")
                 import traceback
                 traceback.print_exc()
-            
-            file_pbar.close()
-            pbar.update(1)
-            
-            elapsed_time = time.time() - start_time
-            if elapsed_time > 0:
-                avg_speed = total_uploaded / elapsed_time
-                pbar.set_postfix({
-                    'OK': success_count,
-                    'Speed': f"{self._format_size(avg_speed)}/s"
-                })
-            else:
-                pbar.set_postfix({'OK': success_count})
+            finally:
+                # Local failures say nothing about the network: they leave the limit alone
+                local = self._take_local_error() and not ok
+                controller.release(slot, entry.size if ok else 0, ok=ok, sample=not local)
+                with lock:
+                    if ok:
+                        progress['ok'] += 1
+                        progress['bytes'] += entry.size
+                    pbar.update(1)
+                    elapsed_time = time.time() - start_time
+                    if elapsed_time > 0:
+                        avg_speed = progress['bytes'] / elapsed_time
+                        pbar.set_postfix({
+                            'OK': progress['ok'],
+                            'Speed': f"{self._format_size(avg_speed)}/s",
+                            'Workers': controller.limit
+                        })
+                    else:
+                        pbar.set_postfix({'OK': progress['ok']})
         
-        pbar.close()
+        mkdir_pool = ThreadPoolExecutor(max_workers=max(1, mkdir_workers), thread_name_prefix='bdnd-mkdir')
+        try:
+            file_pool = ThreadPoolExecutor(max_workers=controller.maximum, thread_name_prefix='bdnd-upload')
+            try:
+                for entry, digest_future in prehashed(entries):
+                    found_entries = True
+                    if entry.is_dir:
+                        if entry.is_empty:
+                            dir_path = remote_dir + entry.rel_path
+                            mkdir_futures[mkdir_pool.submit(self.create_directory, dir_path)] = dir_path
+                        continue
+                
+                    total_files += 1
+                    file_name = os.path.basename(entry.path)
+                    # Blocks while the controller's limit of files is in flight
+                    slot = controller.acquire()
+                    with lock:
+                        pbar.total = total_files
+                        pbar.set_description(f"Uploading {file_name[:25]} ({self._format_size(entry.size)})")
+                        bytes_pbar.total += entry.size
+                        bytes_pbar.refresh()
+                    file_pool.submit(upload_one, entry, digest_future, slot)
+            finally:
+                # Uploads in flight hold concurrency slots: let them finish and release them
+                file_pool.shutdown(wait=True)
+                bytes_pbar.close()
+                pbar.close()
+                if manifest is not None:
+                    manifest.close()
+            if skipped['files']:
+                print(f"Skipped {skipped['files']} files finished by an earlier run")
+                found_entries = True
+            if manifest is not None and progress['ok'] == total_files:
+                # Nothing left to resume: a later upload of the tree starts over
+                manifest.remove()
+            success_count = progress['ok'] + skipped['files']
+        
+            # Nothing to upload at all: the target directory itself is the empty leaf
+            if not found_entries and remote_base_dir:
+                mkdir_futures[mkdir_pool.submit(self.create_directory, remote_base_dir)] = remote_base_dir
+        
+            for future, dir_path in mkdir_futures.items():
+                try:
+                    created = future.result()
+                except Exception as e:
+                    print(f"Error: Exception while creating directory {dir_path}: {e}")
+                    continue
+                if not created:
+                    print(f"Warning: Failed to create directory {dir_path}")
+        finally:
+            mkdir_pool.shutdown(wait=True)
         return success_count
 
     @staticmethod
@@ -706,8 +1524,13 @@ class BaiduNetdiskClient:
             return f"{bytes_num / 1024:.2f} KB"
         return f"{bytes_num} B"
 
-    def get_file_info(self, fsids, dlink=1, thumb=1, extra=1, needmedia=1, detail=1):
-        """Get file info and download link (dlink) via filemetas API"""
+    def get_file_info(self, fsids, dlink=1, thumb=1, extra=1, needmedia=1, detail=1, refresh=False):
+        """
+        Get file info and download link (dlink) via filemetas API
+
+        Results are cached per fsid for meta_cache_ttl seconds, so reading the
+        same file again costs no metadata call; refresh bypasses the cache.
+        """
         if not self.access_token:
             return None
         
@@ -719,6 +1542,31 @@ class BaiduNetdiskClient:
         except (ValueError, TypeError):
             return None
         
+        options = (dlink, thumb, extra, needmedia, detail)
+        cached = {}
+        if not refresh:
+            for fsid in fsids_int:
+                info = self._meta_cache.get((fsid, options))
+                if info is not None:
+                    cached[fsid] = info
+        missing = [fsid for fsid in fsids_int if fsid not in cached]
+        if not missing:
+            return [dict(cached[fsid]) for fsid in fsids_int]
+        
+        fetched = self._fetch_file_info(missing, dlink, thumb, extra, needmedia, detail)
+        if fetched is None:
+            return None
+        for info in fetched:
+            if info.get('fs_id') is not None:
+                self._meta_cache.set((info['fs_id'], options), dict(info))
+        if not cached:
+            return fetched
+        by_fsid = {info.get('fs_id'): info for info in fetched}
+        by_fsid.update((fsid, dict(info)) for fsid, info in cached.items())
+        return [by_fsid[fsid] for fsid in fsids_int if fsid in by_fsid]
+
+    def _fetch_file_info(self, fsids_int, dlink, thumb, extra, needmedia, detail):
+        """Call filemetas for fsids_int; returns the list of file infos, or None"""
         fsids_json = json.dumps(fsids_int, separators=(',', ':'))
         fsids_encoded = quote(fsids_json)
         
@@ -745,8 +1593,16 @@ class BaiduNetdiskClient:
         except Exception:
             return None
 
-    def get_fsid_by_path(self, file_path):
-        """Get file fsid by file path"""
+    def get_fsid_by_path(self, file_path, use_cache=True):
+        """
+        Get file fsid by file path
+
+        The parent directory is listed page by page until the name is found;
+        every entry seen is remembered for path_cache_ttl seconds, so looking
+        up the file or its siblings again costs no list call. With use_cache
+        False the cache is neither read nor filled, e.g. to see whether a
+        change has reached the server yet.
+        """
         if not self.access_token:
             return None
         
@@ -770,71 +1626,317 @@ class BaiduNetdiskClient:
         if not file_name:
             return None
         
-        file_list = self.list_files(directory=dir_path, folder=0)
-        if file_list is None or len(file_list) == 0:
-            return None
+        if use_cache:
+            fsid = self._path_cache.get(file_path)
+            if fsid is not None:
+                return fsid
         
         # Find matching file by name
-        for file_info in file_list:
-            if file_info.get('server_filename') == file_name:
-                return file_info.get('fs_id')
+        for file_info in self._iter_dir_entries(dir_path, remember=use_cache):
+            if file_info.get('server_filename') == file_name and file_info.get('fs_id') is not None:
+                return file_info['fs_id']
+        return None
+
+    def _iter_dir_entries(self, dir_path, remember=True):
+        """
+        List a remote directory page by page, yielding its entries
+
+        With remember, every entry of a page goes into the path cache as the
+        page arrives, so looking up the directory's other files later costs
+        no list call. Listing stops at a short or empty page, or when a list
+        call fails.
+        """
+        start = 0
+        while True:
+            page = self.list_files(directory=dir_path, start=start, limit=self.LIST_PAGE_SIZE, folder=0)
+            if not page:
+                return
+            if remember:
+                for file_info in page:
+                    name = file_info.get('server_filename')
+                    if file_info.get('fs_id') is not None and name:
+                        self._path_cache.set(dir_path.rstrip('/') + '/' + name, file_info['fs_id'])
+            yield from page
+            if len(page) < self.LIST_PAGE_SIZE:
+                return
+            start += len(page)
+
+    def invalidate_paths(self, paths):
+        """
+        Forget cached metadata of remote paths and everything below them
+
+        Called once the server has confirmed a change the client made
+        (upload, mkdir, rename, delete); call it after changing files by
+        other means.
+        """
+        prefixes = [path.rstrip('/') for path in paths if path]
+        if not prefixes:
+            return
         
-            return None
+        def affected(path):
+            return any(path == prefix or path.startswith(prefix + '/') for prefix in prefixes)
+        
+        self._path_cache.discard_where(lambda key, fsid: affected(key))
+        self._meta_cache.discard_where(lambda key, info: affected(info.get('path') or ''))
+
+    def _reject_dlink(self, download_url, error):
+        """
+        Note a download request that failed; a 403 means the dlink expired
+
+        The dlink's cached metadata is dropped so the next lookup fetches a
+        fresh one.
+        """
+        response = getattr(error, 'response', None)
+        if response is None or response.status_code != 403:
+            return
+        self.stats.incr('download_dlink_rejected')
+        self._forget_redirect(download_url)
+        self._meta_cache.discard_where(
+            lambda key, info: bool(info.get('dlink')) and download_url.startswith(info['dlink'])
+        )
+        with self._redirects_lock:
+            self._rejected_dlinks.add(download_url)
 
     def get_download_url(self, file_path=None, fsid=None):
         """Get download URL (dlink) for file"""
+        download_url, _ = self._get_download_meta(file_path=file_path, fsid=fsid)
+        return download_url
+
+    def _get_download_meta(self, file_path=None, fsid=None, refresh=False):
+        """
+        Get the download URL of a file together with its metadata
+
+        The dlink comes from the metadata cache unless refresh is set.
+
+        Returns:
+            (download_url, file_info), or (None, None) on failure
+        """
         if not self.access_token:
-            return None
+            return None, None
         
         if fsid is None:
             if file_path is None:
-                return None
+                return None, None
             # get_fsid_by_path will resolve the path
             fsid = self.get_fsid_by_path(file_path)
             if fsid is None:
-                return None
+                return None, None
         
-        file_info_list = self.get_file_info(fsids=[fsid], dlink=1)
+        file_info_list = self.get_file_info(fsids=[fsid], dlink=1, refresh=refresh)
         if not file_info_list or len(file_info_list) == 0:
-            return None
+            return None, None
         
-        dlink = file_info_list[0].get('dlink')
+        file_info = file_info_list[0]
+        dlink = file_info.get('dlink')
         if not dlink:
-            return None
+            return None, None
         
         separator = '&' if '?' in dlink else '?'
-        return f"{dlink}{separator}access_token={self.access_token}"
+        return f"{dlink}{separator}access_token={self.access_token}", file_info
 
-    def download_file_by_path(self, file_path, save_path=None, chunk_size=8192, resume=True, show_progress=True):
+    def download_file_by_path(self, file_path, save_path=None, chunk_size=8192, resume=True, show_progress=True,
+                              segments=None, verify=None):
         """Download file by file path"""
         if not self.access_token:
             return False
         
         # Resolve relative path
         file_path = self._resolve_path(file_path)
-        download_url = self.get_download_url(file_path=file_path)
-        if not download_url:
-            return False
-        
         if save_path is None:
             file_name = os.path.basename(file_path)
             save_path = os.path.join(os.getcwd(), file_name)
         
-        return self.download_file(download_url, save_path, chunk_size=chunk_size, resume=resume, show_progress=show_progress)
+        return self._download_with_dlink(save_path, chunk_size, resume, show_progress, segments, verify,
+                                         file_path=file_path)
 
-    def download_file_by_fsid(self, fsid, save_path, chunk_size=8192, resume=True, show_progress=True):
+    def download_file_by_fsid(self, fsid, save_path, chunk_size=8192, resume=True, show_progress=True,
+                              segments=None, verify=None):
         """Download file by fsid"""
         if not self.access_token:
             return False
         
-        download_url = self.get_download_url(fsid=fsid)
-        if not download_url:
+        return self._download_with_dlink(save_path, chunk_size, resume, show_progress, segments, verify, fsid=fsid)
+
+    def _download_with_dlink(self, save_path, chunk_size, resume, show_progress, segments, verify,
+                             file_path=None, fsid=None):
+        """
+        Download a file by path or fsid through its (possibly cached) dlink
+
+        If the server refuses the dlink (403: it expired), a fresh one is
+        fetched and the download is tried once more. With a content_cache,
+        content downloaded before is placed from the cache instead, and new
+        downloads are added to it.
+        """
+        for refresh in (False, True):
+            download_url, file_info = self._get_download_meta(file_path=file_path, fsid=fsid, refresh=refresh)
+            if not download_url:
+                return False
+            if not refresh and self._from_content_cache(file_info, save_path):
+                return True
+            
+            ok = self.download_file(download_url, save_path, chunk_size=chunk_size, resume=resume,
+                                    show_progress=show_progress, segments=segments,
+                                    source_md5=file_info.get('md5'), verify=verify)
+            if ok and self.content_cache is not None:
+                if self.content_cache.add(file_info.get('fs_id'), file_info.get('md5'), file_info.get('size'),
+                                          save_path):
+                    self.stats.incr('content_cache_added_files')
+            with self._redirects_lock:
+                rejected = download_url in self._rejected_dlinks
+                self._rejected_dlinks.discard(download_url)
+            if ok or not rejected:
+                return ok
+        return False
+
+    def _from_content_cache(self, file_info, save_path):
+        """
+        Place a file from the content cache, if it holds the same content
+
+        Returns:
+            True on a cache hit
+        """
+        if self.content_cache is None or not file_info:
             return False
-        
-        return self.download_file(download_url, save_path, chunk_size=chunk_size, resume=resume, show_progress=show_progress)
+        method = self.content_cache.materialize(
+            file_info.get('fs_id'), file_info.get('md5'), file_info.get('size'), save_path
+        )
+        if not method:
+            return False
+        self.stats.incr('content_cache_hits')
+        self.stats.incr(f'content_cache_{method}')
+        self.stats.incr('content_cache_bytes', file_info.get('size') or 0)
+        return True
 
-    def download_directory(self, directory_path, save_dir, recursive=True, file_filter=None):
-        """Download all files in directory"""
+    def upload_many(self, pairs, max_workers=4, executor=None):
+        """
+        Upload many files concurrently
+
+        Each pair runs upload_file_auto without progress bars. Uploads share
+        this client's connection pools, limiters and concurrency controllers.
+        Nothing starts until the generator is iterated; pairs are consumed
+        lazily.
+
+        Args:
+            pairs: Iterable of (local_path, remote_path)
+            max_workers: Threads used when no executor is given
+            executor: Optional concurrent.futures executor to run the uploads on
+
+        Yields:
+            TransferResult per pair, in completion order
+        """
+        def upload(local_path, remote_path):
+            return self.upload_file_auto(local_path, remote_path, show_progress=False)
+
+        for (local_path, remote_path), result, error in run_batch(upload, pairs, max_workers, executor):
+            yield TransferResult(local_path, remote_path, error is None and bool(result), result, error)
+
+    def download_many(self, pairs, max_workers=4, executor=None):
+        """
+        Download many files concurrently
+
+        Args:
+            pairs: Iterable of (remote_path, local_path)
+            max_workers: Threads used when no executor is given
+            executor: Optional concurrent.futures executor to run the downloads on
+
+        Yields:
+            TransferResult per pair, in completion order
+        """
+        def download(remote_path, local_path):
+            return self.download_file_by_path(remote_path, local_path, show_progress=False)
+
+        for (remote_path, local_path), result, error in run_batch(download, pairs, max_workers, executor):
+            yield TransferResult(remote_path, local_path, error is None and bool(result), result, error)
+
+    def submit_upload(self, local_path, remote_path, executor):
+        """Upload one file on executor; returns a Future of the upload_file_auto result"""
+        return executor.submit(self.upload_file_auto, local_path, remote_path, show_progress=False)
+
+    def submit_download(self, remote_path, local_path, executor):
+        """Download one file on executor; returns a Future of the download_file_by_path result"""
+        return executor.submit(self.download_file_by_path, remote_path, local_path, show_progress=False)
+
+    def map_metadata(self, paths, max_workers=8, executor=None):
+        """
+        Look up the metadata of many remote paths
+
+        Paths are grouped by parent directory and every directory is listed
+        once, page by page, so many files in one folder cost a few list calls
+        instead of one per file. The listed entries also warm the path cache
+        used by get_fsid_by_path.
+
+        Args:
+            paths: Iterable of remote paths
+            max_workers: Threads used when no executor is given
+            executor: Optional concurrent.futures executor to run the lookups on
+
+        Yields:
+            (path, file_info) per path, grouped by directory in completion order;
+            file_info is None if the path does not exist or could not be listed
+        """
+        groups = {}
+        for path in paths:
+            resolved = self._resolve_path(path).rstrip('/')
+            parent, _, name = resolved.rpartition('/')
+            groups.setdefault(parent or '/', []).append((path, name))
+
+        def lookup(parent, wanted):
+            names = {name for _, name in wanted if name}
+            found = {}
+            if names:
+                for file_info in self._iter_dir_entries(parent):
+                    name = file_info.get('server_filename')
+                    if name in names:
+                        found[name] = file_info
+                        if len(found) == len(names):
+                            break
+            return [(path, found.get(name)) for path, name in wanted]
+
+        for (parent, wanted), found, error in run_batch(lookup, groups.items(), max_workers, executor):
+            if error is not None:
+                print(f"Warning: Failed to list {parent}: {error}")
+                found = [(path, None) for path, _ in wanted]
+            for path, file_info in found:
+                yield path, file_info
+
+    def download_directory(self, directory_path, save_dir, recursive=True, file_filter=None, rules=None,
+                           schedule_window=512, segment_threshold=64 * 1024 * 1024, checkpoint=True, verify=None):
+        """
+        Download all files in directory
+
+        The remote listing is consumed page by page: files start downloading as
+        soon as their page arrives and nothing beyond the current page is kept.
+        Files are downloaded concurrently, as many at a time as
+        download_file_concurrency allows. Rules and file_filter are applied
+        to the listing first; within each schedule_window of the remaining
+        files the largest go first with small files packed in between, and
+        files of at least segment_threshold bytes are split into ranged
+        segments, so idle connections help with the big files at the end.
+        With a content_cache, files downloaded before (same fs_id, md5 and
+        size) are placed from the cache without any request.
+
+        Files are written as .part files and renamed when complete. With
+        checkpoint, every finished file is recorded with its size and md5 in a
+        job manifest on disk (see TransferManifest); rerunning the same
+        download skips recorded files still present locally, and continues
+        partial files from their .part file. A run in which every file
+        succeeds deletes the manifest.
+
+        Args:
+            directory_path: Remote directory to download
+            save_dir: Local target directory
+            recursive: Whether to download subdirectories
+            file_filter: Optional callable(file_info) -> bool selecting files to download
+            rules: Optional TransferRules; entries under excluded directories are
+                dropped from the listing stream before anything is downloaded
+            schedule_window: Number of listed files reordered by size at a time (0: listing order)
+            segment_threshold: Files at least this large are downloaded in segments
+            checkpoint: Record progress in a job manifest and skip what a previous run finished
+            verify: Check every file's MD5 (default: verify_downloads; see download_file)
+
+        Returns:
+            Number of files downloaded successfully (including files skipped by the checkpoint)
+        """
         if not self.access_token:
             return 0
         
@@ -845,125 +1947,262 @@ class BaiduNetdiskClient:
             os.makedirs(save_dir, exist_ok=True)
         
         if recursive:
-            all_files = self.list_all_files_recursive(path=directory_path)
+            entries = self.iter_all_files_recursive(path=directory_path)
         else:
             file_list = self.list_files(directory=directory_path, folder=0)
             if file_list is None or len(file_list) == 0:
                 return 0
-            all_files = file_list
-        
-        if not all_files:
-            return 0
-        
-        files = [f for f in all_files if f.get('isdir', 1) == 0]
-        directories = [f for f in all_files if f.get('isdir', 1) == 1]
-        
-        if directories:
-            created_dirs = set()
-            dir_pbar = tqdm(
-                total=len(directories),
-                desc="Creating directories",
-                unit="dir",
-                ncols=120,
-                bar_format='{desc}: {percentage:3.0f}%|{bar}| {n}/{total} [{elapsed}<{remaining}]'
+            entries = file_list
+        
+        def relative_to_root(info):
+            path = info.get('path') or ''
+            if path.startswith(directory_path):
+                return path[len(directory_path):].lstrip('/')
+            return info.get('server_filename', '')
+        
+        def selected(entries):
+            # Filtered before scheduling, so excluded entries take no room in its window
+            for file_info in entries:
+                relative_path = relative_to_root(file_info)
+                if file_info.get('isdir', 1) == 1:
+                    if relative_path and (rules is None or rules.match_tree(relative_path)):
+                        yield file_info
+                    continue
+                if rules is not None:
+                    if not rules.match_tree(relative_path.rpartition('/')[0]):
+                        continue
+                    if not rules.match_remote_entry(file_info, relative_path):
+                        continue
+                if file_filter and not file_filter(file_info):
+                    continue
+                yield file_info
+        
+        entries = selected(entries)
+        if schedule_window > 0:
+            entries = schedule_by_size(
+                entries,
+                lambda info: info.get('size', 0),
+                passthrough=lambda info: info.get('isdir', 1) == 1,
+                window=schedule_window
             )
-            
-            for dir_info in directories:
-                dir_path = dir_info.get('path')
-                if dir_path.startswith(directory_path):
-                    relative_path = dir_path[len(directory_path):].lstrip('/')
-                else:
-                    relative_path = dir_info.get('server_filename', '')
-                
-                if relative_path:
-                    local_dir_path = os.path.join(save_dir, relative_path)
-                    if local_dir_path not in created_dirs:
-                        if not os.path.exists(local_dir_path):
-                            os.makedirs(local_dir_path, exist_ok=True)
-                        created_dirs.add(local_dir_path)
-                dir_pbar.update(1)
-            
-            dir_pbar.close()
-        else:
-            created_dirs = set()
-        
-        if file_filter:
-            files = [f for f in files if file_filter(f)]
-        
-        total_files = len(files)
-        if total_files == 0:
-            return 0
         
-        success_count = 0
+        created_dirs = set()
+        total_files = 0
+        skipped_files = 0
+        manifest = TransferManifest(job_manifest_path('download', directory_path, save_dir)) if checkpoint else None
+        controller = self.download_file_concurrency
+        lock = threading.Lock()
+        progress = {'ok': 0, 'bytes': 0}
         pbar = tqdm(
-            total=total_files, 
+            total=0, 
             desc="Downloading", 
             unit="file", 
             ncols=120,
-                bar_format='{desc}: {percentage:3.0f}%|{bar}| {n} [{elapsed}<{remaining}{postfix}]'
+            bar_format='{desc}: {percentage:3.0f}%|{bar}| {n}/{total} [{elapsed}<{remaining}{postfix}]'
         )
         start_time = time.time()
-        total_downloaded = 0
         
-        for file_info in files:
-            file_path = file_info.get('path')
-            file_name = file_info.get('server_filename', 'unknown_file')
-            fsid = file_info.get('fs_id')
-            file_size = file_info.get('size', 0)
-            
-            if file_path.startswith(directory_path):
-                relative_path = file_path[len(directory_path):].lstrip('/')
-            else:
-                relative_path = file_name
-            
-            local_save_path = os.path.join(save_dir, relative_path)
-            local_save_dir = os.path.dirname(local_save_path)
-            
-            if local_save_dir and not os.path.exists(local_save_dir):
-                os.makedirs(local_save_dir, exist_ok=True)
-            
-            pbar.set_description(f"Downloading {file_name[:30]}")
-            if self.download_file_by_fsid(fsid, local_save_path, show_progress=False):
-                success_count += 1
-                total_downloaded += file_size
-            pbar.update(1)
-            
-            elapsed_time = time.time() - start_time
-            if elapsed_time > 0:
-                avg_speed = total_downloaded / elapsed_time
-                pbar.set_postfix({
-                    'OK': success_count,
-                    'Speed': f"{self._format_size(avg_speed)}/s"
-                })
-            else:
-                pbar.set_postfix({'OK': success_count})
+        def download_one(fsid, local_save_path, file_size, slot, relative_path=None, md5=None):
+            ok = False
+            self._take_local_error()
+            try:
+                # The listing already has what the content cache is keyed by
+                if self._from_content_cache({'fs_id': fsid, 'md5': md5, 'size': file_size}, local_save_path):
+                    ok = True
+                else:
+                    segments = None if file_size >= segment_threshold else 1
+                    ok = bool(self.download_file_by_fsid(fsid, local_save_path, show_progress=False,
+                                                         segments=segments, verify=verify))
+                if ok and manifest is not None:
+                    manifest.mark_done(relative_path, file_size, md5=md5)
+            except Exception as e:
+                if is_local_error(e):
+                    self._note_local_error()
+                print(f"Error: Exception while downloading {local_save_path}: {e}")
+            finally:
+                # Local failures say nothing about the network: they leave the limit alone
+                local = self._take_local_error() and not ok
+                controller.release(slot, file_size if ok else 0, ok=ok, sample=not local)
+                with lock:
+                    if ok:
+                        progress['ok'] += 1
+                        progress['bytes'] += file_size
+                    pbar.update(1)
+                    elapsed_time = time.time() - start_time
+                    if elapsed_time > 0:
+                        avg_speed = progress['bytes'] / elapsed_time
+                        pbar.set_postfix({
+                            'OK': progress['ok'],
+                            'Speed': f"{self._format_size(avg_speed)}/s",
+                            'Workers': controller.limit
+                        })
+                    else:
+                        pbar.set_postfix({'OK': progress['ok']})
         
-        pbar.close()
-        return success_count
+        file_pool = ThreadPoolExecutor(max_workers=controller.maximum, thread_name_prefix='bdnd-download')
+        try:
+            for file_info in entries:
+                relative_path = relative_to_root(file_info)
+
+                if file_info.get('isdir', 1) == 1:
+                    local_dir_path = os.path.join(save_dir, relative_path)
+                    if local_dir_path not in created_dirs:
+                        os.makedirs(local_dir_path, exist_ok=True)
+                        created_dirs.add(local_dir_path)
+                    continue
+
+                file_name = file_info.get('server_filename', 'unknown_file')
+                fsid = file_info.get('fs_id')
+                file_size = file_info.get('size', 0)
+                if not relative_path:
+                    relative_path = file_name
+
+                local_save_path = os.path.join(save_dir, relative_path)
+                local_save_dir = os.path.dirname(local_save_path)
+
+                if local_save_dir and local_save_dir not in created_dirs:
+                    os.makedirs(local_save_dir, exist_ok=True)
+                    created_dirs.add(local_save_dir)
+
+                md5 = file_info.get('md5')
+                if (manifest is not None and manifest.is_done(relative_path, file_size, md5=md5)
+                        and os.path.isfile(local_save_path) and os.path.getsize(local_save_path) == file_size):
+                    skipped_files += 1
+                    continue
+
+                total_files += 1
+                # Blocks while the controller's limit of files is in flight
+                slot = controller.acquire()
+                with lock:
+                    pbar.total = total_files
+                    pbar.set_description(f"Downloading {file_name[:30]}")
+                file_pool.submit(download_one, fsid, local_save_path, file_size, slot, relative_path, md5)
+        finally:
+            # Downloads in flight hold concurrency slots: let them finish and release them
+            file_pool.shutdown(wait=True)
+            pbar.close()
+            if manifest is not None:
+                manifest.close()
+        if skipped_files:
+            print(f"Skipped {skipped_files} files finished by an earlier run")
+        if manifest is not None and progress['ok'] == total_files:
+            # Nothing left to resume: a later download of the tree starts over
+            manifest.remove()
+        return progress['ok'] + skipped_files
+
+    def download_file(self, download_url, save_path, chunk_size=8192, resume=True, show_progress=True, segments=None,
+                      source_md5=None, verify=None):
+        """
+        Download file from URL
+
+        Data is written to save_path + '.part', which is renamed to save_path
+        once the download is complete, so save_path never holds a partial
+        file. Next to it, a '.part.state' sidecar records the source (size and
+        md5) and, for segmented downloads, which blocks have been written.
+        With resume, a partial download of the same source continues where it
+        stopped: a sequential one from the end of the .part file, a segmented
+        one by fetching only its missing blocks. A partial download whose
+        source has changed is discarded.
+
+        A large file that is not being resumed sequentially is fetched as
+        segments (default: download_segments) concurrent ranged requests, if
+        the server supports ranges. If the server answers them with the whole
+        file anyway, the download starts over as a single stream.
+
+        A sequential download reads the stream with readinto into pooled
+        buffers, starting at chunk_size bytes per read and doubling up to
+        DOWNLOAD_READ_SIZE while reads come back full; a DiskWriter thread
+        writes them, so the receive loop never waits on the disk unless it
+        runs DOWNLOAD_WRITE_DEPTH buffers ahead. The progress bar is refreshed
+        every PROGRESS_INTERVAL seconds rather than per read.
+
+        The redirect from the dlink to its data host is resolved once and
+        cached (see _resolve_download_url), so the HEAD, the GET and every
+        segment go straight to the data host.
 
-    def download_file(self, download_url, save_path, chunk_size=8192, resume=True, show_progress=True):
-        """Download file from URL"""
+        With verify (default: verify_downloads), the .part file is checked
+        against the content MD5 before it is renamed: sequential downloads
+        hash the data on a background thread as it arrives, segmented ones
+        hash the finished file. A mismatching file is downloaded once more
+        from scratch. Files whose server MD5 is not a plain content MD5 are
+        not checked (counted as 'download_verify_skipped').
+
+        Args:
+            source_md5: MD5 of the remote file, if known (identifies the source
+                for resume; otherwise the server's Content-MD5 header is used)
+            verify: Check the file's MD5 (default: verify_downloads)
+
+        Returns:
+            True if the file was downloaded (and verified)
+        """
+        if verify is None:
+            verify = self.verify_downloads
+        result = self._download_file(download_url, save_path, chunk_size, resume, show_progress, segments,
+                                     source_md5, verify)
+        if result is _MD5_MISMATCH:
+            self.stats.incr('download_verify_retries')
+            print(f"Warning: Downloading {os.path.basename(save_path)} again after an MD5 mismatch")
+            result = self._download_file(download_url, save_path, chunk_size, False, show_progress, segments,
+                                         source_md5, verify)
+            if result is _MD5_MISMATCH:
+                print(f"Error: {os.path.basename(save_path)} failed MD5 verification twice")
+        return result is True
+
+    def _download_file(self, download_url, save_path, chunk_size, resume, show_progress, segments, source_md5,
+                       verify):
+        """
+        Download file from URL once (see download_file)
+
+        Returns:
+            True, False, or _MD5_MISMATCH if verification failed
+        """
         headers = {'User-Agent': 'pan.baidu.com'}
+        if segments is None:
+            segments = self.download_segments
+        header_md5 = None
         
         file_size = 0
-        resume_position = 0
-        
-        if resume and os.path.exists(save_path):
-            resume_position = os.path.getsize(save_path)
+        accept_ranges = False
+        part_path = save_path + PART_SUFFIX
+        state_path = part_path + STATE_SUFFIX
         
+        url, cached = self._resolve_download_url(download_url)
         try:
-            head_response = self._safe_request("HEAD", download_url, headers=headers)
+            try:
+                head_response = self._safe_request("HEAD", url, headers=headers, data_plane=True)
+            except requests.exceptions.RequestException as e:
+                if not cached:
+                    self._reject_dlink(download_url, e)
+                head_response = None
+            if cached and not head_response:
+                # The cached location may have expired: resolve the dlink again
+                url, _ = self._resolve_download_url(download_url, refresh=True)
+                head_response = self._safe_request("HEAD", url, headers=headers, data_plane=True)
             if head_response and 'Content-Length' in head_response.headers:
                 file_size = int(head_response.headers['Content-Length'])
             elif head_response and 'content-length' in head_response.headers:
                 file_size = int(head_response.headers['content-length'])
+            if head_response:
+                accept_ranges = 'bytes' in head_response.headers.get('Accept-Ranges', '').lower()
+                header_md5 = head_response.headers.get('Content-MD5')
         except Exception:
             pass
         
-        if resume and resume_position > 0:
-            headers['Range'] = f'bytes={resume_position}-'
-            if file_size > 0:
-                file_size = file_size - resume_position
+        expected_md5 = None
+        if verify:
+            for md5 in (source_md5, header_md5):
+                if md5 and is_content_md5(md5.lower()):
+                    expected_md5 = md5.lower()
+                    break
+            if expected_md5 is None:
+                self.stats.incr('download_verify_skipped')
+        source = {'size': file_size, 'md5': source_md5 or header_md5}
+        state = DownloadState.load(state_path) if resume and os.path.exists(part_path) else None
+        if state is not None and not state.same_source(source):
+            print(f"Warning: Source of {os.path.basename(save_path)} changed since the partial download, starting over")
+            state = None
+        if state is None:
+            DownloadState.discard(part_path)
         
         file_name = os.path.basename(save_path)
         save_dir = os.path.dirname(save_path)
@@ -971,19 +2210,80 @@ class BaiduNetdiskClient:
         if save_dir and not os.path.exists(save_dir):
             os.makedirs(save_dir, exist_ok=True)
         
+        if state is not None and state.segmented and not accept_ranges:
+            DownloadState.discard(part_path)
+            state = None
+        if state is None:
+            segments = min(segments, file_size // self.MIN_DOWNLOAD_SEGMENT) if accept_ranges else 1
+        if (state is not None and state.segmented) or (state is None and segments > 1):
+            pbar = None
+            if show_progress:
+                pbar = tqdm(
+                    total=file_size,
+                    unit='B',
+                    unit_scale=True,
+                    unit_divisor=1024,
+                    desc=file_name[:30],
+                    ncols=120,
+                    bar_format='{desc}: {percentage:3.0f}%|{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}{postfix}]'
+                )
+            try:
+                if state is None:
+                    state = DownloadState(state_path, source, block_size=self.DOWNLOAD_BLOCK_SIZE)
+                result = self._download_segments(download_url, part_path, state, max(1, segments), pbar=pbar)
+                if result is True:
+                    if expected_md5 and not self._check_md5(part_path, expected_md5, file_md5(part_path)):
+                        return _MD5_MISMATCH
+                    os.replace(part_path, save_path)
+                    DownloadState.discard(part_path)
+                    return True
+                if result is not _RANGE_IGNORED:
+                    return False
+            except KeyboardInterrupt:
+                return False
+            finally:
+                if pbar:
+                    pbar.close()
+            # The server answered the ranged requests with the whole file
+            self.stats.incr('download_range_ignored')
+            print(f"Warning: Server ignored ranged requests for {file_name}, downloading it as one stream")
+            DownloadState.discard(part_path)
+            state = None
+        
+        resume_position = os.path.getsize(part_path) if state is not None else 0
+        if file_size > 0 and resume_position >= file_size:
+            if resume_position == file_size:
+                # Finished earlier, but interrupted before the rename
+                if expected_md5 and not self._check_md5(part_path, expected_md5, file_md5(part_path)):
+                    return _MD5_MISMATCH
+                os.replace(part_path, save_path)
+                DownloadState.discard(part_path)
+                return True
+            resume_position = 0
+        if resume_position > 0:
+            headers['Range'] = f'bytes={resume_position}-'
+        else:
+            DownloadState(state_path, source).save()
+        
+        hasher = None
+        response = None
+        pbar = None
         try:
-            response = self._safe_request("GET", download_url, headers=headers, stream=True)
+            response = self._safe_request("GET", url, headers=headers, stream=True, data_plane=True)
             
             if not response or response.status_code not in [200, 206]:
+                self._forget_redirect(download_url)
                 return False
+            if resume_position > 0 and response.status_code == 200:
+                # The server ignored the range: start over
+                resume_position = 0
             
             total_size = file_size if file_size > 0 else None
-            initial = resume_position if resume and resume_position > 0 else 0
             
             if show_progress:
                 pbar = tqdm(
                     total=total_size,
-                    initial=initial,
+                    initial=resume_position,
                     unit='B',
                     unit_scale=True,
                     unit_divisor=1024,
@@ -991,38 +2291,327 @@ class BaiduNetdiskClient:
                     ncols=120,
                     bar_format='{desc}: {percentage:3.0f}%|{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}{postfix}]'
                 )
-            else:
-                pbar = None
             
-            mode = 'ab' if resume and resume_position > 0 else 'wb'
-            with open(save_path, mode) as f:
-                start_time = time.time()
-                downloaded = resume_position
-                
-                for chunk in response.iter_content(chunk_size=chunk_size):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
+            if expected_md5:
+                hasher = StreamHasher(part_path, resume_position)
+            # readinto bypasses content decoding, so encoded bodies go through iter_content
+            raw = response.headers.get('Content-Encoding', 'identity').lower() in ('', 'identity')
+            chunks = None if raw else response.iter_content(chunk_size=self.DOWNLOAD_READ_SIZE)
+            read_size = max(1, min(chunk_size, self.DOWNLOAD_READ_SIZE))
+            mode = 'ab' if resume_position > 0 else 'wb'
+            with open(part_path, mode) as f:
+                writer = DiskWriter(f, buffer_size=self.DOWNLOAD_READ_SIZE, depth=self.DOWNLOAD_WRITE_DEPTH,
+                                    hasher=hasher)
+                try:
+                    start_time = time.monotonic()
+                    last_refresh = start_time
+                    downloaded = resume_position
+                    shown = resume_position
+                    
+                    while True:
+                        buffer = writer.get_buffer()
+                        if raw:
+                            length = response.raw.readinto(memoryview(buffer)[:read_size])
+                            if length == read_size and read_size < len(buffer):
+                                read_size = min(len(buffer), read_size * 2)
+                        else:
+                            chunk = next(chunks, b'')
+                            length = len(chunk)
+                            if length > len(buffer):
+                                buffer = bytearray(chunk)
+                            else:
+                                buffer[:length] = chunk
+                        if not length:
+                            break
+                        self.bandwidth.down.consume(length)
+                        writer.write(buffer, length)
+                        downloaded += length
                         if pbar:
-                            pbar.update(len(chunk))
-                            elapsed_time = time.time() - start_time
-                            if elapsed_time > 0:
-                                avg_speed = downloaded / elapsed_time
+                            now = time.monotonic()
+                            if now - last_refresh >= self.PROGRESS_INTERVAL:
+                                last_refresh = now
+                                pbar.update(downloaded - shown)
+                                shown = downloaded
+                                avg_speed = (downloaded - resume_position) / (now - start_time)
                                 pbar.set_postfix({'Speed': f"{self._format_size(avg_speed)}/s"})
+                finally:
+                    writer.close()
             
             if pbar:
+                pbar.update(downloaded - shown)
                 pbar.close()
+                pbar = None
+            if total_size is not None and downloaded != total_size:
+                print(f"Error: Download of {file_name} ended early ({downloaded}/{total_size} bytes)")
+                return False
+            if hasher and not self._check_md5(part_path, expected_md5, hasher.hexdigest()):
+                return _MD5_MISMATCH
+            os.replace(part_path, save_path)
+            DownloadState.discard(part_path)
             return True
             
         except KeyboardInterrupt:
             return False
-        except Exception:
-            if os.path.exists(save_path) and os.path.getsize(save_path) == 0:
-                try:
-                    os.remove(save_path)
-                except:
-                    pass
+        except Exception as e:
+            if is_local_error(e):
+                # Writing the file failed (e.g. disk full): the redirect and dlink are fine
+                self._note_local_error()
+                print(f"Error: Failed to write {part_path}: {e}")
+            else:
+                self._forget_redirect(download_url)
+                self._reject_dlink(download_url, e)
+            if os.path.exists(part_path) and os.path.getsize(part_path) == 0:
+                DownloadState.discard(part_path)
             return False
+        finally:
+            if pbar:
+                pbar.close()
+            if hasher:
+                hasher.close()
+            if response is not None:
+                response.close()
+
+    def _resolve_download_url(self, download_url, refresh=False):
+        """
+        Follow the redirects of a download URL, reusing earlier resolutions
+
+        A dlink redirects to a data host. Resolving it once per REDIRECT_TTL
+        and sending every request (HEAD, GET, ranged segments) straight to
+        the final location saves a round trip per request. Resolutions are
+        timed in stats ('download_redirect_resolve'), along with the cache
+        hits.
+
+        Args:
+            download_url: URL as returned by get_download_url
+            refresh: Ignore a cached resolution
+
+        Returns:
+            (url, cached): the final URL (download_url itself if it does not
+            redirect or could not be resolved) and whether it came from the cache
+        """
+        if not refresh:
+            with self._redirects_lock:
+                entry = self._redirects.get(download_url)
+            if entry is not None and entry[1] > time.monotonic():
+                self.stats.incr('download_redirect_cache_hits')
+                return entry[0], True
+        
+        url = download_url
+        start_time = time.time()
+        try:
+            for _ in range(self.MAX_REDIRECTS):
+                response = self._safe_request("HEAD", url, headers={'User-Agent': 'pan.baidu.com'},
+                                              allow_redirects=False, data_plane=True)
+                if response is None:
+                    break
+                location = response.headers.get('Location')
+                response.close()
+                if response.status_code not in (301, 302, 303, 307, 308) or not location:
+                    break
+                url = urljoin(url, location)
+        except requests.exceptions.RequestException:
+            # Let the download itself follow the redirects
+            url = download_url
+        self.stats.add_time('download_redirect_resolve', time.time() - start_time)
+        if url == download_url:
+            return download_url, False
+        
+        self.stats.incr('download_redirects_resolved')
+        with self._redirects_lock:
+            self._redirects.pop(download_url, None)
+            while len(self._redirects) >= self.REDIRECT_CACHE_SIZE:
+                self._redirects.pop(next(iter(self._redirects)))
+            self._redirects[download_url] = (url, time.monotonic() + self.REDIRECT_TTL)
+        return url, False
+
+    def _forget_redirect(self, download_url):
+        """Drop the cached resolution of a download URL after a request to its location failed"""
+        with self._redirects_lock:
+            self._redirects.pop(download_url, None)
+
+    def _check_md5(self, part_path, expected_md5, digest):
+        """Compare a downloaded file's MD5 with the server's; a mismatching file is discarded"""
+        if digest == expected_md5:
+            self.stats.incr('download_verified_files')
+            return True
+        self.stats.incr('download_verify_failures')
+        print(f"Warning: MD5 mismatch for {os.path.basename(part_path)[:-len(PART_SUFFIX)]} "
+              f"(expected {expected_md5}, got {digest})")
+        DownloadState.discard(part_path)
+        return False
+
+    def _download_segments(self, download_url, part_path, state, segments, pbar=None):
+        """
+        Download the missing blocks of a file as concurrent ranged requests
+
+        Requests go to the cached redirect target of download_url (see
+        _resolve_download_url); a failed request drops it, so the retry
+        resolves the dlink again.
+
+        A new .part file is preallocated to the full size (posix_fallocate
+        where available) and every request writes at its own offsets with
+        os.pwrite, so requests finish independently. Each block is marked in
+        state once written, and state is saved (after syncing the data) at
+        most every STATE_SAVE_INTERVAL seconds, so an interrupted download
+        loses at most a few seconds of blocks. The missing blocks are split
+        into up to segments runs; a run whose request fails or ends early
+        continues from where it stopped, up to part_retries times. A response
+        other than 206 means the server ignores Range, which no retry fixes:
+        every run stops and _RANGE_IGNORED is returned.
+
+        Args:
+            download_url: URL of the file
+            part_path: File written to
+            state: DownloadState of this download (new or loaded for resume)
+            segments: Number of concurrent requests
+            pbar: Optional progress bar
+
+        Returns:
+            True if every block was written, _RANGE_IGNORED if the server
+            ignored the ranged requests, else False
+        """
+        file_size = state.size
+        block_size = state.block_size
+        if os.path.exists(part_path) and os.path.getsize(part_path) == file_size and state.done_count():
+            fd = os.open(part_path, os.O_WRONLY | getattr(os, 'O_BINARY', 0))
+            self.stats.incr('download_resumed_files')
+        else:
+            state.reset()
+            fd = os.open(part_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+            try:
+                if hasattr(os, 'posix_fallocate'):
+                    os.posix_fallocate(fd, 0, file_size)
+                else:
+                    os.ftruncate(fd, file_size)
+            except OSError:
+                # Filesystems without fallocate support get a sparse file
+                os.ftruncate(fd, file_size)
+
+        missing = state.missing_blocks()
+        if pbar:
+            pbar.update(file_size - sum(min(block_size, file_size - idx * block_size) for idx in missing))
+        # Contiguous runs of missing blocks, split so there are at least segments of them
+        run_blocks = max(1, -(-len(missing) // segments))
+        runs = []
+        for idx in missing:
+            if runs and runs[-1][1] == idx and runs[-1][1] - runs[-1][0] < run_blocks:
+                runs[-1][1] = idx + 1
+            else:
+                runs.append([idx, idx + 1])
+        lock = threading.Lock()
+        saving = threading.Lock()
+        saved = {'at': time.monotonic()}
+        write_failed = threading.Event()
+        range_ignored = threading.Event()
+
+        def save_state(force=False):
+            # One save at a time; a writer never waits for another's save
+            if not saving.acquire(blocking=force):
+                return
+            try:
+                with lock:
+                    if not force and time.monotonic() - saved['at'] < self.STATE_SAVE_INTERVAL:
+                        return
+                    saved['at'] = time.monotonic()
+                    snapshot = state.snapshot()
+                # Blocks may only be recorded once their data is on disk: everything
+                # in the snapshot was written before it was taken
+                os.fsync(fd)
+                snapshot.save()
+            finally:
+                saving.release()
+
+        def write_at(data, offset):
+            view = memoryview(data)
+            while view:
+                if hasattr(os, 'pwrite'):
+                    written = os.pwrite(fd, view, offset)
+                else:
+                    with lock:
+                        os.lseek(fd, offset, os.SEEK_SET)
+                        written = os.write(fd, view)
+                view = view[written:]
+                offset += written
+
+        def fetch(first_block, end_block):
+            start = first_block * block_size
+            end = min(end_block * block_size, file_size)
+            position = start
+            attempt = 0
+            while True:
+                if range_ignored.is_set():
+                    return False
+                headers = {'User-Agent': 'pan.baidu.com', 'Range': f'bytes={position}-{end - 1}'}
+                url, _ = self._resolve_download_url(download_url)
+                try:
+                    response = self._safe_request("GET", url, headers=headers, stream=True, data_plane=True)
+                    if response is not None and response.status_code != 206:
+                        response.close()
+                        range_ignored.set()
+                        return False
+                    if response is not None:
+                        with response:
+                            for chunk in response.iter_content(chunk_size=1024 * 1024):
+                                chunk = chunk[:end - position]
+                                if not chunk:
+                                    continue
+                                self.bandwidth.down.consume(len(chunk))
+                                write_at(chunk, position)
+                                block_before = position // block_size
+                                position += len(chunk)
+                                block_after = position // block_size if position < end else end_block
+                                if block_after > block_before:
+                                    with lock:
+                                        for idx in range(block_before, block_after):
+                                            state.mark_done(idx)
+                                    save_state()
+                                if pbar:
+                                    with lock:
+                                        pbar.update(len(chunk))
+                                if position >= end:
+                                    break
+                except (requests.exceptions.RequestException, OSError) as e:
+                    if is_local_error(e):
+                        # Retrying cannot help when the file cannot be written
+                        print(f"Error: Failed to write {part_path}: {e}")
+                        write_failed.set()
+                        return False
+                    print(f"Warning: Segment {start}-{end - 1} of {os.path.basename(part_path)} interrupted: {e}")
+                    self._reject_dlink(download_url, e)
+                    if download_url in self._rejected_dlinks:
+                        # Retrying an expired dlink cannot succeed
+                        return False
+                if position >= end:
+                    return True
+                self._forget_redirect(download_url)
+                if attempt >= self.part_retries:
+                    print(f"Error: Segment {start}-{end - 1} of {os.path.basename(part_path)} failed")
+                    return False
+                attempt += 1
+                self.stats.incr('download_segment_retries')
+                time.sleep(min(2 ** attempt, 60))
+
+        results = []
+        try:
+            if runs:
+                with ThreadPoolExecutor(max_workers=min(segments, len(runs)),
+                                        thread_name_prefix='bdnd-segment') as pool:
+                    results = list(pool.map(lambda run: fetch(*run), runs))
+        finally:
+            try:
+                save_state(force=True)
+            finally:
+                os.close(fd)
+        if write_failed.is_set():
+            # Reported here, on the thread that downloads the file
+            self._note_local_error()
+        if range_ignored.is_set():
+            return _RANGE_IGNORED
+        if all(results):
+            self.stats.incr('download_segmented_files')
+            self.stats.incr('download_segments', len(runs))
+            return True
+        return False
 
     def delete_file(self, file_path):
         """Delete file or directory by path"""
@@ -1095,71 +2684,76 @@ class BaiduNetdiskClient:
                 errno = result.get('errno')
                 
                 if errno == 0:
-                    # Check if there's a taskid (async operation)
-                    taskid = result.get('taskid')
-                    if taskid:
-                        print(f"Debug - Async deletion task started, taskid: {taskid}")
-                        # For async operations, wait and poll for completion
-                        max_wait_time = 10  # Maximum wait time in seconds
-                        check_interval = 1  # Check every 1 second
-                        waited = 0
+                    try:
+                        # Check if there's a taskid (async operation)
+                        taskid = result.get('taskid')
+                        if taskid:
+                            print(f"Debug - Async deletion task started, taskid: {taskid}")
+                            # For async operations, wait and poll for completion
+                            max_wait_time = 10  # Maximum wait time in seconds
+                            check_interval = 1  # Check every 1 second
+                            waited = 0
                         
-                        while waited < max_wait_time:
-                            time.sleep(check_interval)
-                            waited += check_interval
+                            while waited < max_wait_time:
+                                time.sleep(check_interval)
+                                waited += check_interval
+                            
+                                # Check if files still exist
+                                all_deleted = True
+                                for path in resolved_paths:
+                                    fsid = self.get_fsid_by_path(path, use_cache=False)
+                                    if fsid:
+                                        all_deleted = False
+                                        break
                             
-                            # Check if files still exist
+                                if all_deleted:
+                                    print(f"Debug - Successfully deleted (async, waited {waited}s): {resolved_paths}")
+                                    return True
+                        
+                            # After max wait time, do final check
                             all_deleted = True
                             for path in resolved_paths:
-                                fsid = self.get_fsid_by_path(path)
+                                fsid = self.get_fsid_by_path(path, use_cache=False)
                                 if fsid:
+                                    print(f"Warning: File still exists after {max_wait_time}s wait: {path}")
                                     all_deleted = False
-                                    break
-                            
+                        
                             if all_deleted:
-                                print(f"Debug - Successfully deleted (async, waited {waited}s): {resolved_paths}")
+                                print(f"Debug - Successfully deleted: {resolved_paths}")
                                 return True
-                        
-                        # After max wait time, do final check
-                        all_deleted = True
-                        for path in resolved_paths:
-                            fsid = self.get_fsid_by_path(path)
-                            if fsid:
-                                print(f"Warning: File still exists after {max_wait_time}s wait: {path}")
-                                all_deleted = False
-                        
-                        if all_deleted:
-                            print(f"Debug - Successfully deleted: {resolved_paths}")
-                            return True
+                            else:
+                                # Files still exist after waiting - might be a real issue
+                                print(f"Error: Files still exist after async deletion (waited {max_wait_time}s)")
+                                return False
                         else:
-                            # Files still exist after waiting - might be a real issue
-                            print(f"Error: Files still exist after async deletion (waited {max_wait_time}s)")
-                            return False
-                    else:
-                        # Synchronous deletion, wait a bit and verify
-                        time.sleep(0.5)
-                        
-                        # Verify deletion
-                        all_deleted = True
-                        for path in resolved_paths:
-                            fsid = self.get_fsid_by_path(path)
-                            if fsid:
-                                print(f"Warning: File still exists after deletion: {path}")
-                                all_deleted = False
+                            # Synchronous deletion, wait a bit and verify
+                            time.sleep(0.5)
                         
-                        if all_deleted:
-                            print(f"Debug - Successfully deleted: {resolved_paths}")
-                            return True
-                        else:
-                            # Wait a bit more and check again
-                            time.sleep(1)
+                            # Verify deletion
                             all_deleted = True
                             for path in resolved_paths:
-                                fsid = self.get_fsid_by_path(path)
+                                fsid = self.get_fsid_by_path(path, use_cache=False)
                                 if fsid:
-                                    print(f"Error: File still exists after deletion: {path}")
+                                    print(f"Warning: File still exists after deletion: {path}")
                                     all_deleted = False
-                            return all_deleted
+                        
+                            if all_deleted:
+                                print(f"Debug - Successfully deleted: {resolved_paths}")
+                                return True
+                            else:
+                                # Wait a bit more and check again
+                                time.sleep(1)
+                                all_deleted = True
+                                for path in resolved_paths:
+                                    fsid = self.get_fsid_by_path(path, use_cache=False)
+                                    if fsid:
+                                        print(f"Error: File still exists after deletion: {path}")
+                                        all_deleted = False
+                                return all_deleted
+                    finally:
+                        # The server has taken the deletion: drop what was cached for these
+                        # paths, including entries a concurrent lookup added while it ran
+                        self.invalidate_paths(resolved_paths)
                 else:
                     # Check info array for detailed error messages
                     info = result.get('info', [])
@@ -1265,6 +2859,7 @@ class BaiduNetdiskClient:
             if response:
                 result = response.json()
                 if result.get('errno') == 0:
+                    self.invalidate_paths([file_path, file_path.rpartition('/')[0] + '/' + new_name])
                     return True
                 else:
                     errno = result.get('errno')
@@ -0,0 +1,169 @@
+"""Adaptive (AIMD) concurrency limits for transfers"""
+
+import time
+import errno
+import threading
+
+
+# OS errors raised by the local machine (permissions, full or read-only
+# disks, missing paths, exhausted descriptors) rather than the network
+LOCAL_ERRNOS = frozenset(
+    code for code in (
+        getattr(errno, name, None) for name in (
+            'EACCES', 'EPERM', 'ENOSPC', 'EDQUOT', 'EROFS', 'ENOENT', 'ENOTDIR', 'EISDIR',
+            'EEXIST', 'ENAMETOOLONG', 'EFBIG', 'EMFILE', 'ENFILE', 'EIO',
+        )
+    ) if code is not None
+)
+
+
+def is_local_error(error):
+    """
+    Whether an exception comes from the local filesystem rather than the network
+
+    Such failures say nothing about how much concurrency the network can
+    take, so they should not be fed to an AIMDController.
+    """
+    return isinstance(error, OSError) and error.errno in LOCAL_ERRNOS
+
+
+class AIMDController:
+    """
+    Concurrency limit that adapts to how transfers behave
+
+    Work takes a slot with acquire() and hands it back with release(),
+    reporting how many bytes moved and whether the request failed. The limit
+    follows additive-increase / multiplicative-decrease:
+
+    - a request that failed on the network or server side (timeout, 5xx,
+      throttling) cuts the limit by the backoff factor; only the first
+      failure among requests started before a cut counts, so one burst of
+      errors causes one cut. Local failures (see is_local_error) are
+      released with sample=False and leave the limit alone
+    - after each round of successes (as many as the current limit) the
+      throughput of the round is compared with the previous one: the limit
+      grows by one, unless latency per byte has risen past latency_tolerance
+      times the best seen without throughput improving, in which case it
+      shrinks by one
+
+    Setting minimum == maximum gives a fixed limit.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=16, backoff=0.5, latency_tolerance=2.0,
+                 name=None, stats=None):
+        """
+        Args:
+            initial: Starting limit
+            minimum: Lowest limit
+            maximum: Highest limit
+            backoff: Factor applied to the limit on failure
+            latency_tolerance: Allowed rise of latency per byte over the best seen
+            name: Gauge name used to publish the limit in stats
+            stats: Optional TransferStats receiving the limit as a gauge
+        """
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.name = name
+        self.stats = stats
+        self._cond = threading.Condition()
+        self._limit = min(self.maximum, max(self.minimum, initial))
+        self._in_flight = 0
+        self._epoch = 0
+        self._round_start = time.monotonic()
+        self._round_bytes = 0
+        self._round_busy = 0.0
+        self._round_count = 0
+        self._last_throughput = None
+        self._best_latency = None
+        self._publish()
+
+    @property
+    def limit(self):
+        return self._limit
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def _publish(self):
+        if self.stats is not None and self.name:
+            self.stats.set(self.name, self._limit)
+
+    def _set_limit(self, limit):
+        limit = min(self.maximum, max(self.minimum, limit))
+        if limit != self._limit:
+            self._limit = limit
+            self._publish()
+            self._cond.notify_all()
+
+    def acquire(self):
+        """
+        Wait for a free slot and take it
+
+        Returns:
+            Token to pass to release()
+        """
+        with self._cond:
+            while self._in_flight >= self._limit:
+                self._cond.wait()
+            self._in_flight += 1
+            return time.monotonic(), self._epoch
+
+    def release(self, token, nbytes=0, ok=True, sample=True):
+        """
+        Give a slot back
+
+        Args:
+            token: Value returned by acquire()
+            nbytes: Bytes transferred while the slot was held
+            ok: False if the request failed on the network or server side (timed
+                out, 5xx, throttled)
+            sample: False to release without feeding the controller (e.g. no work
+                was done, or the work failed locally)
+        """
+        start, epoch = token
+        now = time.monotonic()
+        with self._cond:
+            self._in_flight -= 1
+            if sample:
+                if not ok:
+                    self._on_failure(epoch, now)
+                else:
+                    self._on_success(nbytes, now - start, now)
+            self._cond.notify_all()
+
+    def _new_round(self, now):
+        self._round_start = now
+        self._round_bytes = 0
+        self._round_busy = 0.0
+        self._round_count = 0
+
+    def _on_failure(self, epoch, now):
+        if epoch != self._epoch:
+            # Started before the last cut, which already accounted for it
+            return
+        self._epoch += 1
+        self._last_throughput = None
+        self._new_round(now)
+        self._set_limit(int(self._limit * self.backoff))
+
+    def _on_success(self, nbytes, elapsed, now):
+        self._round_bytes += nbytes
+        self._round_busy += elapsed
+        self._round_count += 1
+        if self._round_count < self._limit:
+            return
+        duration = now - self._round_start
+        throughput = self._round_bytes / duration if duration > 0 else 0.0
+        latency = self._round_busy / max(1, self._round_bytes)
+        if self._best_latency is None or latency < self._best_latency:
+            self._best_latency = latency
+        improved = self._last_throughput is None or throughput > self._last_throughput * 1.05
+        if latency > self._best_latency * self.latency_tolerance and not improved:
+            self._set_limit(self._limit - 1)
+        else:
+            self._set_limit(self._limit + 1)
+        self._last_throughput = throughput
+        self._new_round(now)
@@ -0,0 +1,80 @@
+"""Priority thread pool for metadata (control-plane) requests"""
+
+import queue
+import itertools
+import threading
+from concurrent.futures import Future
+
+
+# Lower runs first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+
+class PriorityExecutor:
+    """
+    A small thread pool that runs queued calls by priority, then in submission order
+
+    Used for metadata requests so they neither wait behind bulk transfers nor
+    overwhelm the API: a fixed number of workers serves them, and calls that
+    finish work already in progress (e.g. create) overtake ones that start
+    new work (e.g. precreate). Workers are started on first use.
+    """
+
+    def __init__(self, workers=4, name='bdnd-control'):
+        self.workers = max(1, workers)
+        self.name = name
+        self._queue = queue.PriorityQueue()
+        self._counter = itertools.count()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+    def _start_workers(self):
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot submit after shutdown")
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(
+                    target=self._work, name=f"{self.name}-{len(self._threads)}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            _, _, task = self._queue.get()
+            if task is None:
+                return
+            future, fn, args, kwargs = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    def submit(self, fn, *args, priority=PRIORITY_NORMAL, **kwargs):
+        """Queue fn(*args, **kwargs); returns a Future"""
+        self._start_workers()
+        future = Future()
+        self._queue.put((priority, next(self._counter), (future, fn, args, kwargs)))
+        return future
+
+    def pending(self):
+        """Number of calls waiting for a worker"""
+        return self._queue.qsize()
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            self._shutdown = True
+            threads = list(self._threads)
+        for _ in threads:
+            # Sorts after every real task, so queued work still runs
+            self._queue.put((float('inf'), next(self._counter), None))
+        if wait:
+            for thread in threads:
+                thread.join()
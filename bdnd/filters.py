@@ -0,0 +1,271 @@
+"""Include/exclude rules for directory uploads and downloads"""
+
+import re
+from collections import OrderedDict
+
+from .utils import parse_size, parse_time
+
+
+def _glob_to_regex(pattern):
+    """Translate a glob into a regex body: '*' and '?' stay within one path component, '**' crosses them"""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            if pattern[i:i + 3] == '**/':
+                # 'a/**/b' also matches 'a/b'
+                out.append('(?:.*/)?')
+                i += 3
+                continue
+            if pattern[i:i + 2] == '**':
+                out.append('.*')
+                i += 2
+                continue
+            out.append('[^/]*')
+        elif c == '?':
+            out.append('[^/]')
+        elif c == '[':
+            end = pattern.find(']', i + 2)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                out.append('[' + body.replace('\\', '\\\\') + ']')
+                i = end + 1
+                continue
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return ''.join(out)
+
+
+class _Rule:
+    """One compiled include or exclude pattern"""
+
+    __slots__ = ('include', 'pattern', 'regex', 'subtree', 'is_regex')
+
+    def __init__(self, include, pattern):
+        self.include = include
+        self.pattern = pattern
+        # Directory-only rule (trailing '/'): never matches a file by its own name
+        self.subtree = False
+        self.is_regex = pattern.startswith('re:')
+
+        if self.is_regex:
+            self.regex = re.compile(pattern[3:])
+            return
+
+        body = pattern
+        if body.endswith('/**'):
+            body = body[:-3]
+            self.subtree = True
+        elif body.endswith('/'):
+            body = body.rstrip('/')
+            self.subtree = True
+        if not body:
+            raise ValueError(f"Invalid pattern: {pattern}")
+
+        # A leading '/' anchors the pattern at the transfer root, otherwise it
+        # may match at any depth
+        if body.startswith('/'):
+            prefix = '^'
+            body = body.lstrip('/')
+        else:
+            prefix = '(?:^|.*/)'
+        self.regex = re.compile(prefix + _glob_to_regex(body) + '$')
+
+    def matches_dir(self, rel_dir):
+        if self.is_regex:
+            # Directories are matched with a trailing '/', so 're:^data/' selects the directory
+            return self.regex.search(rel_dir + '/') is not None
+        return self.regex.match(rel_dir) is not None
+
+    def matches_file(self, rel_path):
+        if self.is_regex:
+            return self.regex.search(rel_path) is not None
+        if not self.subtree and self.regex.match(rel_path):
+            return True
+        # A rule matching a directory applies to everything below it
+        parts = rel_path.split('/')[:-1]
+        for i in range(1, len(parts) + 1):
+            if self.regex.match('/'.join(parts[:i])):
+                return True
+        return False
+
+
+class TransferRules:
+    """
+    Compiled include/exclude rules shared by directory uploads and downloads
+
+    Patterns are matched against paths relative to the transfer root, and the
+    first matching rule wins. Supported patterns:
+
+        *.log           glob matched at any depth ('*' and '?' stay within a component)
+        /build/*.o      leading '/' anchors the glob at the transfer root
+        docs/**         '**' crosses directories
+        node_modules/   trailing '/' (or '/**') makes it a directory-only rule
+        re:^data/\\d+    regular expression searched in the relative path
+                        (directories are matched with a trailing '/')
+
+    As in rsync, a pattern without a trailing '/' matches directories as
+    well as files, so 'node_modules' and 'node_modules/' both exclude every
+    directory of that name. A rule that matches a directory applies to its
+    whole subtree, and an excluded directory is pruned: uploads never scan
+    it and downloads drop its listing entries.
+    Files that match no rule are transferred, unless include rules were
+    given, in which case only included files are transferred.
+
+    Size and mtime windows are applied to files before the pattern rules.
+    """
+
+    # Directories whose match_tree result is remembered
+    DIR_MEMO_SIZE = 4096
+
+    def __init__(self, rules=None, min_size=None, max_size=None, newer_than=None, older_than=None):
+        """
+        Args:
+            rules: Iterable of (action, pattern) tuples, or strings in rsync filter
+                syntax ('+ *.py', '- *.pyc'). action is '+'/'include' or '-'/'exclude'
+            min_size: Minimum file size in bytes or as a size string ('10M')
+            max_size: Maximum file size in bytes or as a size string ('2G')
+            newer_than: Only files modified after this timestamp, age ('7d') or date
+            older_than: Only files modified before this timestamp, age ('7d') or date
+        """
+        self._rules = []
+        self._has_includes = False
+        # rel_dir -> match_tree result, least recently used first
+        self._dir_memo = OrderedDict()
+        for rule in rules or []:
+            if isinstance(rule, str):
+                action, _, pattern = rule.strip().partition(' ')
+                rule = (action, pattern.strip())
+            self.add(*rule)
+        self.min_size = parse_size(min_size) if min_size is not None else None
+        self.max_size = parse_size(max_size) if max_size is not None else None
+        self.newer_than = parse_time(newer_than) if newer_than is not None else None
+        self.older_than = parse_time(older_than) if older_than is not None else None
+
+    def add(self, action, pattern):
+        """Append a rule; returns self so calls can be chained"""
+        if action in ('+', 'include'):
+            include = True
+        elif action in ('-', 'exclude'):
+            include = False
+        else:
+            raise ValueError(f"Invalid rule action: {action}")
+        if not pattern:
+            raise ValueError("Empty rule pattern")
+        self._rules.append(_Rule(include, pattern))
+        self._has_includes = self._has_includes or include
+        self._dir_memo.clear()
+        return self
+
+    def include(self, pattern):
+        return self.add('+', pattern)
+
+    def exclude(self, pattern):
+        return self.add('-', pattern)
+
+    def match_dir(self, rel_dir):
+        """
+        Check whether a directory should be descended into
+
+        Only the directory itself is checked; callers walking top-down never
+        reach a directory whose parent was pruned. Use match_tree for paths
+        that arrive in arbitrary order.
+        """
+        rel_dir = rel_dir.strip('/')
+        if not rel_dir:
+            return True
+        for rule in self._rules:
+            if rule.matches_dir(rel_dir):
+                return rule.include
+        return True
+
+    def match_tree(self, rel_dir):
+        """Check a directory and all of its parents; results are memoized per directory"""
+        rel_dir = rel_dir.strip('/')
+        if not rel_dir:
+            return True
+        allowed = self._dir_memo.get(rel_dir)
+        if allowed is None:
+            parent = rel_dir.rpartition('/')[0]
+            allowed = self.match_tree(parent) and self.match_dir(rel_dir)
+            self._dir_memo[rel_dir] = allowed
+            if len(self._dir_memo) > self.DIR_MEMO_SIZE:
+                self._dir_memo.popitem(last=False)
+        else:
+            self._dir_memo.move_to_end(rel_dir)
+        return allowed
+
+    def match_file(self, rel_path, size=None, mtime=None):
+        """Check whether a file should be transferred"""
+        if size is not None:
+            if self.min_size is not None and size < self.min_size:
+                return False
+            if self.max_size is not None and size > self.max_size:
+                return False
+        if mtime is not None:
+            if self.newer_than is not None and mtime < self.newer_than:
+                return False
+            if self.older_than is not None and mtime > self.older_than:
+                return False
+
+        rel_path = rel_path.strip('/')
+        for rule in self._rules:
+            if rule.matches_file(rel_path):
+                return rule.include
+        return not self._has_includes
+
+    def match_local_entry(self, entry):
+        """file_filter adapter for scanner.scan_local_tree"""
+        return self.match_file(entry.rel_path, entry.size, entry.mtime)
+
+    def match_remote_entry(self, file_info, rel_path):
+        """Check a listing entry returned by list_files/listall"""
+        mtime = file_info.get('local_mtime') or file_info.get('server_mtime')
+        return self.match_file(rel_path, file_info.get('size'), mtime)
+
+
+RULE_OPTIONS = ('--include', '--exclude', '--min-size', '--max-size', '--newer-than', '--older-than')
+
+
+def parse_rule_args(args):
+    """
+    Extract transfer rule options from a shell argument list
+
+    Returns:
+        Tuple of (TransferRules or None, remaining args)
+
+    Raises:
+        ValueError: If an option is missing its value or the value is invalid
+    """
+    rules = []
+    options = {}
+    remaining = []
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        name, eq, value = arg.partition('=')
+        if name in RULE_OPTIONS:
+            if not eq:
+                if i + 1 >= len(args):
+                    raise ValueError(f"{name} requires a value")
+                value = args[i + 1]
+                i += 1
+            if name == '--include':
+                rules.append(('+', value))
+            elif name == '--exclude':
+                rules.append(('-', value))
+            else:
+                options[name[2:].replace('-', '_')] = value
+        else:
+            remaining.append(arg)
+        i += 1
+
+    if not rules and not options:
+        return None, remaining
+    return TransferRules(rules, **options), remaining
@@ -0,0 +1,104 @@
+"""Upload host ranking and failover"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def parse_locate_response(result):
+    """
+    Get the upload hosts from a locateupload response
+
+    Returns:
+        List of https host base URLs, servers before backup servers, without duplicates
+    """
+    hosts = []
+    for key in ('servers', 'bak_servers'):
+        for item in result.get(key) or []:
+            server = item.get('server') if isinstance(item, dict) else item
+            if not server:
+                continue
+            server = server.rstrip('/')
+            if server.startswith('http://'):
+                server = 'https://' + server[len('http://'):]
+            elif not server.startswith('https://'):
+                server = 'https://' + server
+            if server not in hosts:
+                hosts.append(server)
+    return hosts
+
+
+def probe_hosts(session, hosts, timeout=3):
+    """
+    Measure the round-trip latency of each host
+
+    Any HTTP response counts as reachable; only the time to get it matters.
+
+    Returns:
+        List of (host, latency_seconds) for reachable hosts, fastest first, and
+        the list of hosts that could not be reached
+    """
+    def probe(host):
+        start = time.time()
+        try:
+            session.head(host + "/", timeout=timeout, allow_redirects=False, verify=False)
+        except Exception:
+            return host, None
+        return host, time.time() - start
+
+    if not hosts:
+        return [], []
+    with ThreadPoolExecutor(max_workers=min(8, len(hosts)), thread_name_prefix='bdnd-probe') as pool:
+        results = list(pool.map(probe, hosts))
+    reachable = sorted([(h, t) for h, t in results if t is not None], key=lambda item: item[1])
+    unreachable = [h for h, t in results if t is None]
+    return reachable, unreachable
+
+
+class UploadHostPool:
+    """
+    Upload hosts in order of preference, with failover
+
+    A host that fails is put on cooldown and skipped until the cooldown ends,
+    so transfers move to the next fastest host. When every host is cooling
+    down they are still returned, soonest-to-recover first, rather than none.
+    """
+
+    def __init__(self, hosts, cooldown=60):
+        """
+        Args:
+            hosts: Host base URLs (e.g. 'https://c3.pcs.baidu.com'), most preferred first
+            cooldown: Seconds a failed host is skipped
+        """
+        self._hosts = list(dict.fromkeys(hosts))
+        self.cooldown = cooldown
+        self._failed_until = {}
+        self._lock = threading.Lock()
+
+    @property
+    def hosts(self):
+        return list(self._hosts)
+
+    def candidates(self):
+        """Get hosts to try in order: healthy ones by preference, then the ones cooling down"""
+        now = time.time()
+        with self._lock:
+            healthy = [h for h in self._hosts if self._failed_until.get(h, 0) <= now]
+            cooling = sorted(
+                (h for h in self._hosts if self._failed_until.get(h, 0) > now),
+                key=lambda h: self._failed_until[h]
+            )
+        return healthy + cooling
+
+    def current(self):
+        """Get the host new requests should go to"""
+        candidates = self.candidates()
+        return candidates[0] if candidates else None
+
+    def mark_failed(self, host):
+        with self._lock:
+            self._failed_until[host] = time.time() + self.cooldown
+
+    def mark_ok(self, host):
+        with self._lock:
+            self._failed_until.pop(host, None)
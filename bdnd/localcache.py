@@ -0,0 +1,295 @@
+"""Content-addressed local cache of downloaded files"""
+
+import os
+import json
+import time
+import errno
+import shutil
+import threading
+
+from .manifest import PART_SUFFIX
+
+
+# ioctl request cloning a whole file on Linux (btrfs, XFS, ...)
+FICLONE = 0x40049409
+
+
+def _reflink(src, dst):
+    import fcntl
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+
+def _copy_range(src, dst):
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        remaining = os.fstat(fsrc.fileno()).st_size
+        while remaining > 0:
+            copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), min(remaining, 1 << 30))
+            if copied == 0:
+                raise OSError(errno.EIO, "copy_file_range stopped early")
+            remaining -= copied
+
+
+def _unlink(path):
+    try:
+        os.remove(path)
+    except PermissionError:
+        # Windows refuses to delete read-only files
+        os.chmod(path, 0o644)
+        os.remove(path)
+
+
+class LocalContentCache:
+    """
+    Downloaded files kept on local disk, keyed by (fs_id, md5, size)
+
+    A download whose key is cached is served from disk instead of the
+    network, by reflink (FICLONE) or copy_file_range where supported, or a
+    plain copy. Objects are the cache's own read-only copies, never linked
+    to the files they were added from. Every object's size and mtime are
+    recorded in an index when it is added; an object that no longer matches
+    them has been modified and is dropped instead of served. The cache is
+    kept under max_bytes by dropping the least recently used objects, both
+    when it is opened and after every add.
+    """
+
+    def __init__(self, root, max_bytes=50 * 1024 ** 3, hardlink=False):
+        """
+        Args:
+            root: Cache directory (created if missing)
+            max_bytes: Size budget of the cache
+            hardlink: Serve hits by hardlink when the target is on the same
+                filesystem. Such targets share the read-only object: they are
+                read-only themselves, and modifying one (after a chmod)
+                invalidates the object
+        """
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.hardlink = hardlink
+        self._objects_dir = os.path.join(self.root, 'objects')
+        self._index_path = os.path.join(self.root, 'index.jsonl')
+        os.makedirs(self._objects_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        # object path -> (size, mtime_ns recorded when it was added)
+        self._objects = {}
+        self._total = 0
+        self._scan()
+        self._index = open(self._index_path, 'a', encoding='utf-8')
+
+    def _load_index(self):
+        recorded = {}
+        try:
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        name, mtime_ns = json.loads(line)
+                    except (ValueError, TypeError):
+                        # A line cut short by an interruption
+                        continue
+                    recorded[name] = mtime_ns
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Warning: Failed to read local cache index {self._index_path}: {e}")
+        return recorded
+
+    def _scan(self):
+        recorded = self._load_index()
+        for dir_path, _, file_names in os.walk(self._objects_dir):
+            for name in file_names:
+                path = os.path.join(dir_path, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                size = st.st_size
+                # Left by an interrupted add, or changed since it was added
+                stale = (name.endswith('.tmp') or recorded.get(name) != st.st_mtime_ns
+                         or not name.endswith(f"-{size}"))
+                if stale:
+                    try:
+                        _unlink(path)
+                    except OSError:
+                        pass
+                    continue
+                self._objects[path] = (size, st.st_mtime_ns)
+                self._total += size
+        # The budget may have been lowered since the last run
+        self.evict()
+        # Rewrite the index with the objects still there
+        tmp_path = self._index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for path, (_, mtime_ns) in self._objects.items():
+                f.write(json.dumps([os.path.basename(path), mtime_ns]) + '\n')
+        os.replace(tmp_path, self._index_path)
+
+    @property
+    def total_bytes(self):
+        with self._lock:
+            return self._total
+
+    def _object_path(self, fs_id, md5, size):
+        name = f"{fs_id}-{md5}-{size}"
+        return os.path.join(self._objects_dir, str(md5)[:2], name)
+
+    def lookup(self, fs_id, md5, size):
+        """Get the cached object of a file, or None"""
+        if not md5 or size is None:
+            return None
+        path = self._object_path(fs_id, md5, size)
+        with self._lock:
+            recorded = self._objects.get(path)
+        if recorded is None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._forget(path)
+            return None
+        if (st.st_size, st.st_mtime_ns) != recorded:
+            print(f"Warning: Dropping modified object {os.path.basename(path)} from the local cache")
+            self._forget(path, remove=True)
+            return None
+        try:
+            # atime records the last use; mtime stays as recorded
+            os.utime(path, ns=(time.time_ns(), st.st_mtime_ns))
+        except OSError:
+            pass
+        return path
+
+    def _forget(self, path, remove=False):
+        with self._lock:
+            recorded = self._objects.pop(path, None)
+            if recorded is not None:
+                self._total -= recorded[0]
+        if remove:
+            try:
+                _unlink(path)
+            except OSError:
+                pass
+
+    def materialize(self, fs_id, md5, size, dest):
+        """
+        Place the cached copy of a file at dest
+
+        Returns:
+            How the file was placed ('hardlink', 'reflink', 'copy_file_range'
+            or 'copy'), or None on a cache miss
+        """
+        path = self.lookup(fs_id, md5, size)
+        if path is None:
+            return None
+        dest_dir = os.path.dirname(dest)
+        if dest_dir:
+            os.makedirs(dest_dir, exist_ok=True)
+        tmp_path = dest + PART_SUFFIX + '.tmp'
+        try:
+            method = self._place(path, tmp_path, self.hardlink)
+            os.replace(tmp_path, dest)
+        except OSError as e:
+            print(f"Warning: Failed to copy {os.path.basename(dest)} from the local cache: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return None
+        return method
+
+    @staticmethod
+    def _place(src, dst, hardlink=False):
+        if os.path.lexists(dst):
+            os.remove(dst)
+        if hardlink:
+            try:
+                os.link(src, dst)
+                return 'hardlink'
+            except OSError:
+                pass
+        try:
+            _reflink(src, dst)
+            return 'reflink'
+        except (ImportError, OSError):
+            pass
+        if hasattr(os, 'copy_file_range'):
+            try:
+                _copy_range(src, dst)
+                return 'copy_file_range'
+            except OSError:
+                pass
+        shutil.copyfile(src, dst)
+        return 'copy'
+
+    def add(self, fs_id, md5, size, src):
+        """
+        Store a downloaded file in the cache
+
+        The cache keeps its own read-only copy (reflinked where possible,
+        which takes no extra space), so src stays writable and later changes
+        to it do not reach the cache.
+
+        Returns:
+            True if the file is cached
+        """
+        if not md5 or size is None or size > self.max_bytes:
+            return False
+        path = self._object_path(fs_id, md5, size)
+        with self._lock:
+            if path in self._objects:
+                return True
+        try:
+            if os.path.getsize(src) != size:
+                return False
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + '.tmp'
+            self._place(src, tmp_path)
+            os.chmod(tmp_path, 0o444)
+            os.replace(tmp_path, path)
+            st = os.stat(path)
+        except OSError as e:
+            print(f"Warning: Failed to add {os.path.basename(src)} to the local cache: {e}")
+            return False
+        if st.st_size != size:
+            # src changed while it was copied
+            self._forget(path, remove=True)
+            return False
+        with self._lock:
+            if path not in self._objects:
+                self._total += size
+            self._objects[path] = (size, st.st_mtime_ns)
+            self._index.write(json.dumps([os.path.basename(path), st.st_mtime_ns]) + '\n')
+            self._index.flush()
+        self.evict()
+        return True
+
+    def evict(self):
+        """
+        Drop least recently used objects until the cache fits max_bytes
+
+        Returns:
+            Number of bytes freed
+        """
+        with self._lock:
+            if self._total <= self.max_bytes:
+                return 0
+            candidates = []
+            for path, (size, _) in self._objects.items():
+                try:
+                    candidates.append((os.path.getatime(path), path, size))
+                except OSError:
+                    candidates.append((0, path, size))
+            candidates.sort()
+            freed = 0
+            for _, path, size in candidates:
+                if self._total <= self.max_bytes:
+                    break
+                try:
+                    _unlink(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"Warning: Failed to evict {path} from the local cache: {e}")
+                    continue
+                del self._objects[path]
+                self._total -= size
+                freed += size
+            return freed
@@ -0,0 +1,294 @@
+"""On-disk checkpoints for resumable transfers"""
+
+import os
+import json
+import hashlib
+import threading
+
+from .config import get_config_dir
+
+
+# Downloads are written under this suffix and renamed once complete
+PART_SUFFIX = '.part'
+# Sidecar next to a .part file holding its DownloadState
+STATE_SUFFIX = '.state'
+
+
+def job_manifest_path(kind, source, target):
+    """
+    Get the manifest file of a directory transfer job
+
+    The same command (same kind, source and target) always maps to the same
+    file, so a rerun picks up the checkpoint of an interrupted run.
+
+    Args:
+        kind: 'upload' or 'download'
+        source: Source directory
+        target: Target directory
+    """
+    key = hashlib.sha1(f"{kind}\n{source}\n{target}".encode('utf-8')).hexdigest()
+    jobs_dir = get_config_dir() / 'jobs'
+    jobs_dir.mkdir(parents=True, exist_ok=True)
+    return str(jobs_dir / f"{kind}-{key[:16]}.jsonl")
+
+
+class TransferManifest:
+    """
+    Record of the files a directory transfer has finished
+
+    Every finished file is appended to the manifest as one JSON line with its
+    size and md5 as soon as it completes, so an interrupted job loses at most
+    the files in flight. Files that stopped part-way can be recorded with the
+    state needed to resume them. The last line for a path wins; superseded
+    lines are dropped when the manifest is reopened. A job that completes
+    removes its manifest, so a later run starts from scratch.
+    """
+
+    def __init__(self, path, sync_every=32):
+        """
+        Args:
+            path: Manifest file (created if missing)
+            sync_every: Records appended between fsync calls
+        """
+        self.path = path
+        self.sync_every = max(1, sync_every)
+        self._lock = threading.Lock()
+        self._records = {}
+        self._unsynced = 0
+        lines = self._load()
+        if lines > len(self._records) * 2 + 64:
+            self._compact()
+        self._file = open(path, 'a', encoding='utf-8')
+        if self._file.tell() > 0 and not self._ends_with_newline():
+            # Terminate a line cut short by the interruption before appending
+            self._file.write('\n')
+
+    def _ends_with_newline(self):
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def _load(self):
+        lines = 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A line cut short by the interruption
+                        continue
+                    rel_path = record.get('path') if isinstance(record, dict) else None
+                    if rel_path is not None:
+                        self._records[rel_path] = record
+        except FileNotFoundError:
+            pass
+        except (IOError, OSError) as e:
+            print(f"Warning: Failed to read transfer manifest {self.path}: {e}")
+        return lines
+
+    def _compact(self):
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for record in self._records.values():
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except (IOError, OSError) as e:
+            print(f"Warning: Failed to compact transfer manifest {self.path}: {e}")
+
+    def _append(self, record):
+        with self._lock:
+            self._records[record['path']] = record
+            if self._file is None:
+                return
+            self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self._file.flush()
+            self._unsynced += 1
+            if self._unsynced >= self.sync_every:
+                os.fsync(self._file.fileno())
+                self._unsynced = 0
+
+    def __len__(self):
+        with self._lock:
+            return sum(1 for record in self._records.values() if record.get('done'))
+
+    def get(self, rel_path):
+        """Get the last record of rel_path, or None"""
+        with self._lock:
+            return self._records.get(rel_path)
+
+    def is_done(self, rel_path, size, md5=None, mtime=None):
+        """
+        Whether rel_path was finished with the same size (and md5/mtime, where both sides know it)
+        """
+        record = self.get(rel_path)
+        if not record or not record.get('done') or record.get('size') != size:
+            return False
+        if md5 and record.get('md5') and record['md5'] != md5:
+            return False
+        if mtime is not None and record.get('mtime') is not None and record['mtime'] != mtime:
+            return False
+        return True
+
+    def mark_done(self, rel_path, size, md5=None, mtime=None):
+        """Record rel_path as finished"""
+        record = {'path': rel_path, 'done': True, 'size': size}
+        if md5:
+            record['md5'] = md5
+        if mtime is not None:
+            record['mtime'] = mtime
+        self._append(record)
+
+    def mark_partial(self, rel_path, state):
+        """Record what is needed to resume rel_path (a JSON-serializable dict)"""
+        self._append({'path': rel_path, 'done': False, 'state': state})
+
+    def clear_partial(self, rel_path):
+        """Forget the resume state of rel_path, e.g. after it turned out to be unusable"""
+        self._append({'path': rel_path, 'done': False})
+
+    def partial_state(self, rel_path):
+        """Get the resume state recorded for rel_path, or None"""
+        record = self.get(rel_path)
+        if not record or record.get('done'):
+            return None
+        return record.get('state')
+
+    def close(self):
+        """Flush the manifest to disk"""
+        with self._lock:
+            if self._file is None:
+                return
+            try:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            finally:
+                self._file.close()
+                self._file = None
+
+    def remove(self):
+        """Close the manifest and delete it, once the job has nothing left to resume"""
+        self.close()
+        for path in (self.path, self.path + '.tmp'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Warning: Failed to remove transfer manifest {path}: {e}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class DownloadState:
+    """
+    Resume state of one download, kept in a JSON sidecar next to its .part file
+
+    The state identifies the source by size and md5, so a partial download
+    is never continued with different content. For segmented downloads it
+    also holds a bitmap of the blocks already written; sequential downloads
+    only need the identity, since they resume from the end of the file.
+    """
+
+    def __init__(self, path, source, block_size=None, done=None):
+        """
+        Args:
+            path: Sidecar file
+            source: Dict with the 'size' and 'md5' (may be None) of the remote file
+            block_size: Block size of a segmented download; None for sequential
+            done: Bitmap of written blocks (bytes), None for none
+        """
+        self.path = path
+        self.source = {'size': source.get('size'), 'md5': source.get('md5')}
+        self.block_size = block_size
+        self._done = bytearray(done) if done else bytearray((self.block_count() + 7) // 8)
+
+    @property
+    def size(self):
+        return self.source['size']
+
+    @property
+    def segmented(self):
+        return self.block_size is not None
+
+    @classmethod
+    def load(cls, path):
+        """Load a sidecar; returns None if it is missing or unreadable"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            done = bytes.fromhex(data['done']) if data.get('done') else None
+            state = cls(path, data['source'], block_size=data.get('block_size'), done=done)
+        except FileNotFoundError:
+            return None
+        except (IOError, OSError, ValueError, KeyError, TypeError, AttributeError):
+            print(f"Warning: Ignoring unreadable download state {path}")
+            return None
+        if len(state._done) != (state.block_count() + 7) // 8:
+            return None
+        return state
+
+    def same_source(self, source):
+        """Whether source (dict with 'size' and 'md5') is the file this state was recorded for"""
+        if self.size != source.get('size'):
+            return False
+        md5 = source.get('md5')
+        if md5 and self.source['md5'] and md5.lower() != self.source['md5'].lower():
+            return False
+        return True
+
+    def block_count(self):
+        if not self.segmented or not self.size:
+            return 0
+        return (self.size + self.block_size - 1) // self.block_size
+
+    def reset(self):
+        """Forget all written blocks"""
+        self._done = bytearray(len(self._done))
+
+    def mark_done(self, idx):
+        self._done[idx >> 3] |= 1 << (idx & 7)
+
+    def is_done(self, idx):
+        return bool(self._done[idx >> 3] & (1 << (idx & 7)))
+
+    def done_count(self):
+        return sum(bin(byte).count('1') for byte in self._done)
+
+    def missing_blocks(self):
+        """Indexes of the blocks not written yet, in order"""
+        return [idx for idx in range(self.block_count()) if not self.is_done(idx)]
+
+    def snapshot(self):
+        """Copy of this state, for saving while the original keeps changing"""
+        return DownloadState(self.path, self.source, block_size=self.block_size, done=bytes(self._done))
+
+    def save(self):
+        """Write the sidecar atomically"""
+        data = {'source': self.source}
+        if self.segmented:
+            data['block_size'] = self.block_size
+            data['done'] = bytes(self._done).hex()
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def discard(part_path):
+        """Remove a .part file (if still there) and its sidecar"""
+        for path in (part_path, part_path + STATE_SUFFIX):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Warning: Failed to remove {path}: {e}")
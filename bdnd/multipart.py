@@ -0,0 +1,101 @@
+"""Streaming multipart/form-data bodies for chunk uploads"""
+
+import os
+import uuid
+
+
+class MultipartFileBody:
+    """
+    A multipart/form-data body holding one file field, streamed on demand
+
+    The body is the multipart preamble, a window of the source and a footer.
+    Nothing is assembled in memory: iterating the object yields the preamble,
+    the window in pieces and the footer, which requests/urllib3 hand straight
+    to the socket. The source is either a path, read with os.preadv into one
+    reusable buffer (one copy per byte, no per-part buffers), or a bytes-like
+    object that is sliced through a memoryview (no copies at all).
+
+    Each iteration starts from the beginning, so a failed request can simply
+    be sent again with the same body.
+    """
+
+    def __init__(self, source, offset=0, length=None, field_name='file', file_name='file',
+                 read_size=1024 * 1024, throttle=None):
+        """
+        Args:
+            source: File path, or a bytes-like object holding the data
+            offset: Start of the window in the source
+            length: Window length; defaults to the rest of the source
+            field_name: Form field name
+            file_name: File name sent in Content-Disposition
+            read_size: Size of the pieces yielded while streaming
+            throttle: Optional callable taking a byte count, called before each piece
+                of the window is yielded (e.g. TokenBucket.consume)
+        """
+        self.source = source
+        self.offset = offset
+        if length is None:
+            if isinstance(source, str):
+                length = os.path.getsize(source) - offset
+            else:
+                length = len(memoryview(source)) - offset
+        self.length = length
+        self.read_size = read_size
+        self.throttle = throttle
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        self._preamble = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{_quote(field_name)}"; filename="{_quote(file_name)}"\r\n'
+            "Content-Type: application/octet-stream\r\n"
+            "\r\n"
+        ).encode('utf-8')
+        self._footer = f"\r\n--{self.boundary}--\r\n".encode('ascii')
+
+    def __len__(self):
+        return len(self._preamble) + self.length + len(self._footer)
+
+    def __iter__(self):
+        yield self._preamble
+        if isinstance(self.source, str):
+            pieces = self._iter_file()
+        else:
+            view = memoryview(self.source)[self.offset:self.offset + self.length]
+            pieces = (view[start:start + self.read_size] for start in range(0, self.length, self.read_size))
+        for piece in pieces:
+            if self.throttle is not None:
+                self.throttle(len(piece))
+            yield piece
+        yield self._footer
+
+    def _iter_file(self):
+        # The buffer is reused: each piece is fully sent before the next read
+        buf = bytearray(min(self.read_size, self.length) or 1)
+        view = memoryview(buf)
+        remaining = self.length
+        position = self.offset
+        with open(self.source, 'rb', buffering=0) as f:
+            use_pread = hasattr(os, 'preadv')
+            if not use_pread:
+                f.seek(position)
+            while remaining > 0:
+                want = min(len(buf), remaining)
+                if use_pread:
+                    n = os.preadv(f.fileno(), [view[:want]], position)
+                else:
+                    n = f.readinto(view[:want])
+                if not n:
+                    raise IOError(f"File {self.source} shrank while uploading")
+                position += n
+                remaining -= n
+                yield view[:n]
+
+    def headers(self, headers=None):
+        """Return a copy of headers with this body's Content-Type added"""
+        merged = dict(headers or {})
+        merged['Content-Type'] = self.content_type
+        return merged
+
+
+def _quote(value):
+    return value.replace('"', '%22').replace('\r', '%0D').replace('\n', '%0A')
@@ -0,0 +1,193 @@
+"""Token-bucket rate limiting shared across transfer threads"""
+
+import time
+import threading
+from urllib.parse import urlsplit, parse_qs
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket
+
+    Callers take tokens before doing work; when the bucket is empty they are
+    given a debt and sleep (outside the lock) until it is paid off. Every
+    caller's request is booked in arrival order under one lock, so the
+    aggregate rate stays accurate however many threads share the bucket.
+
+    A rate of 0 (or None) means unlimited; the rate can be changed at any time.
+    """
+
+    def __init__(self, rate=0, burst=None, full=False):
+        """
+        Args:
+            rate: Tokens per second; 0 or None for unlimited
+            burst: Largest number of tokens saved up while idle (default: half a second's worth)
+            full: Start with a full bucket instead of an empty one
+        """
+        self._lock = threading.Lock()
+        self._tokens = float('inf') if full else 0.0
+        self._last = time.monotonic()
+        self.rate = 0
+        self.burst = 0
+        self.set_rate(rate, burst)
+
+    def set_rate(self, rate, burst=None):
+        """Change the rate (0 or None: unlimited)"""
+        with self._lock:
+            self.rate = max(0, rate or 0)
+            self.burst = burst if burst is not None else self.rate / 2
+            self._tokens = min(self._tokens, self.burst)
+            self._last = time.monotonic()
+
+    def reserve(self, amount):
+        """
+        Take amount tokens without waiting
+
+        Returns:
+            Seconds the caller must wait before using them (for callers that
+            sleep their own way, e.g. asyncio.sleep)
+        """
+        if not self.rate or amount <= 0:
+            return 0.0
+        with self._lock:
+            rate = self.rate
+            if not rate:
+                return 0.0
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * rate)
+            self._last = now
+            self._tokens -= amount
+            return -self._tokens / rate if self._tokens < 0 else 0.0
+
+    def consume(self, amount):
+        """
+        Take amount tokens, sleeping as long as needed to respect the rate
+
+        Returns:
+            Seconds slept
+        """
+        wait = self.reserve(amount)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class BandwidthLimiter:
+    """Separate upload and download byte rates, shared by every transfer in the process"""
+
+    def __init__(self, up=0, down=0):
+        """
+        Args:
+            up: Upload limit in bytes per second (0: unlimited)
+            down: Download limit in bytes per second (0: unlimited)
+        """
+        self.up = TokenBucket(up)
+        self.down = TokenBucket(down)
+
+    def set_limits(self, up=None, down=None):
+        """Change the limits; None leaves a direction unchanged, 0 removes its limit"""
+        if up is not None:
+            self.up.set_rate(up)
+        if down is not None:
+            self.down.set_rate(down)
+
+    def get_limits(self):
+        """Get (up, down) in bytes per second, 0 meaning unlimited"""
+        return self.up.rate, self.down.rate
+
+
+# Requests per second allowed per API family. Baidu counts QPS per app, so
+# these stay below the documented limits with some headroom
+DEFAULT_API_RATES = {
+    'xpan/file': 8,
+    'xpan/multimedia': 8,
+    'xpan/nas': 5,
+    'filemanager': 2,
+}
+
+
+def api_family(url):
+    """
+    Get the rate-limit family of an API URL
+
+    Returns:
+        'filemanager' for file manager operations, the API path after
+        /rest/2.0/ for other xpan calls, or None for URLs that are not
+        rate-limited (uploads to PCS hosts, download links)
+    """
+    parts = urlsplit(url)
+    path = parts.path.rstrip('/')
+    if '/rest/2.0/xpan/' not in path:
+        return None
+    family = path.split('/rest/2.0/', 1)[1]
+    if family == 'xpan/file' and parse_qs(parts.query).get('method') == ['filemanager']:
+        return 'filemanager'
+    return family
+
+
+class ApiRateLimiter:
+    """
+    Requests-per-second limits per API family
+
+    Each family has its own TokenBucket, starting full so short bursts go
+    out at once; a family without a configured rate is not limited.
+    """
+
+    def __init__(self, rates=None):
+        """
+        Args:
+            rates: Dict of family -> requests per second (default: DEFAULT_API_RATES)
+        """
+        self._buckets = {}
+        self._lock = threading.Lock()
+        for family, rate in (DEFAULT_API_RATES if rates is None else rates).items():
+            self.set_rate(family, rate)
+
+    def set_rate(self, family, rate):
+        """Set the requests per second of a family; 0 removes its limit"""
+        with self._lock:
+            bucket = self._buckets.get(family)
+            if bucket is None:
+                self._buckets[family] = TokenBucket(rate, burst=max(1, rate or 0), full=True)
+            else:
+                bucket.set_rate(rate, burst=max(1, rate or 0))
+
+    def get_rates(self):
+        """Get a dict of family -> requests per second"""
+        with self._lock:
+            return {family: bucket.rate for family, bucket in self._buckets.items()}
+
+    def _bucket(self, url):
+        family = api_family(url)
+        if family is None:
+            return None
+        return self._buckets.get(family)
+
+    def acquire(self, url):
+        """
+        Wait until a request to url is allowed
+
+        Returns:
+            Seconds waited
+        """
+        bucket = self._bucket(url)
+        return bucket.consume(1) if bucket is not None else 0.0
+
+    def reserve(self, url):
+        """Book a request to url without waiting; returns the seconds to wait before sending it"""
+        bucket = self._bucket(url)
+        return bucket.reserve(1) if bucket is not None else 0.0
+
+
+_bandwidth_limiter = BandwidthLimiter()
+_api_rate_limiter = ApiRateLimiter()
+
+
+def get_bandwidth_limiter():
+    """Get the process-wide BandwidthLimiter"""
+    return _bandwidth_limiter
+
+
+def get_api_rate_limiter():
+    """Get the process-wide ApiRateLimiter"""
+    return _api_rate_limiter
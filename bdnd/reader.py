@@ -0,0 +1,126 @@
+"""Read-ahead block reader feeding upload workers"""
+
+import os
+import hashlib
+import threading
+from collections import deque
+
+
+class BlockChangedError(IOError):
+    """A block read for upload no longer matches the digest it was precreated with"""
+
+
+class ReadAheadReader:
+    """
+    Read file blocks on a background thread, ahead of the upload workers
+
+    The reader thread reads the requested blocks in file order, with a
+    sequential access hint to the kernel, checks each one against its
+    precreate MD5 and hands it over through a bounded buffer. Disk reads,
+    verification and network sends of earlier blocks therefore overlap,
+    while at most depth blocks wait in the queue; together with one block
+    per worker being sent, memory use is capped at
+    (depth + workers) * block_size.
+
+    Any number of workers may call get() concurrently. Once the reader has
+    stopped, every get() after the queued blocks returns None or raises the
+    error that stopped it; the terminal state is kept, not queued, so it
+    never competes with blocks for buffer space.
+    """
+
+    def __init__(self, path, block_size, depth=4, block_md5s=None, partseqs=None):
+        """
+        Args:
+            path: File to read
+            block_size: Block (upload slice) size
+            depth: Maximum number of blocks read ahead of the consumers
+            block_md5s: Optional expected MD5 per block; a mismatch means the file
+                changed since it was hashed and fails the read
+            partseqs: Block indexes to read (default: all blocks, in order)
+        """
+        self.path = path
+        self.block_size = block_size
+        self.block_md5s = block_md5s
+        size = os.path.getsize(path)
+        if partseqs is None:
+            partseqs = range((size + block_size - 1) // block_size)
+        self.partseqs = sorted(partseqs)
+        self.depth = max(1, depth)
+        self._blocks = deque()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._finished = False
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name='bdnd-readahead', daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        with self._cond:
+            while len(self._blocks) >= self.depth and not self._stopped:
+                self._cond.wait()
+            if self._stopped:
+                return False
+            self._blocks.append(item)
+            self._cond.notify_all()
+            return True
+
+    def _run(self):
+        try:
+            with open(self.path, 'rb', buffering=0) as f:
+                fd = f.fileno()
+                if hasattr(os, 'posix_fadvise'):
+                    try:
+                        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                    except OSError:
+                        pass
+                for partseq in self.partseqs:
+                    if self._stopped:
+                        return
+                    offset = partseq * self.block_size
+                    if hasattr(os, 'pread'):
+                        data = os.pread(fd, self.block_size, offset)
+                    else:
+                        f.seek(offset)
+                        data = f.read(self.block_size)
+                    if self.block_md5s is not None:
+                        if hashlib.md5(data).hexdigest() != self.block_md5s[partseq]:
+                            raise BlockChangedError(
+                                f"{self.path} changed while uploading (block {partseq} differs from its precreate MD5)"
+                            )
+                    if not self._put((partseq, offset, data)):
+                        return
+        except Exception as e:
+            self._error = e
+        finally:
+            with self._cond:
+                self._finished = True
+                self._cond.notify_all()
+
+    def get(self):
+        """
+        Get the next block
+
+        Returns:
+            (partseq, offset, data) tuple, or None when all blocks have been handed out
+
+        Raises:
+            The error that stopped the reader (e.g. BlockChangedError, OSError)
+        """
+        with self._cond:
+            while not self._blocks and not self._finished:
+                self._cond.wait()
+            if self._blocks:
+                item = self._blocks.popleft()
+                self._cond.notify_all()
+                return item
+            if self._error is not None:
+                raise self._error
+            return None
+
+    def close(self):
+        """Stop reading and release queued blocks"""
+        with self._cond:
+            self._stopped = True
+            self._blocks.clear()
+            self._cond.notify_all()
+        self._thread.join()
@@ -0,0 +1,134 @@
+"""Retry policy and per-host circuit breaker for HTTP requests"""
+
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+
+
+# Baidu application errors that mean "try again later" even though the HTTP
+# status is 200 (31034: hit the API frequency limit)
+TRANSIENT_ERRNOS = frozenset({31034})
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class RetryPolicy:
+    """
+    When and how long to wait before retrying a request
+
+    Delays grow exponentially with full jitter (a random delay between 0 and
+    the exponential cap), so concurrent clients do not retry in lockstep. A
+    Retry-After header from the server takes precedence. No retry starts
+    after the overall deadline. Subclass and override the methods to change
+    the behaviour.
+    """
+
+    def __init__(self, max_attempts=3, base_delay=1.0, max_delay=30.0, deadline=120.0, jitter=True,
+                 retry_statuses=RETRY_STATUSES, transient_errnos=TRANSIENT_ERRNOS):
+        """
+        Args:
+            max_attempts: Attempts per request, including the first
+            base_delay: Delay cap before the first retry; doubles for every further retry
+            max_delay: Largest delay between attempts
+            deadline: Seconds after which no further attempt is started
+            jitter: Randomize delays (full jitter)
+            retry_statuses: HTTP statuses worth retrying
+            transient_errnos: Baidu errno values in JSON bodies worth retrying
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+        self.transient_errnos = frozenset(transient_errnos)
+
+    def backoff(self, attempt, retry_after=None):
+        """Seconds to wait after the given (0-based) failed attempt"""
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        cap = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(0, cap) if self.jitter else cap
+
+    def response_errno(self, response, streamed=False):
+        """Get the Baidu errno of a JSON response, or None"""
+        if streamed:
+            # Reading the body would consume the stream
+            return None
+        if 'json' not in response.headers.get('Content-Type', '') and not response.content.startswith(b'{'):
+            return None
+        try:
+            body = response.json()
+        except ValueError:
+            return None
+        if not isinstance(body, dict):
+            return None
+        return body.get('errno', body.get('error_code'))
+
+    def should_retry(self, response, streamed=False):
+        """Whether a response that arrived should be retried"""
+        if response.status_code in self.retry_statuses:
+            return True
+        return self.response_errno(response, streamed) in self.transient_errnos
+
+    @staticmethod
+    def retry_after(response):
+        """Seconds requested by a Retry-After header, or None"""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class CircuitBreaker:
+    """
+    Stop sending requests to a host that keeps failing
+
+    After failure_threshold consecutive failures the host's circuit opens and
+    requests to it fail immediately. Once reset_timeout has passed, one trial
+    request is let through; success closes the circuit, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = {}
+        self._open_until = {}
+        self._lock = threading.Lock()
+
+    def allow(self, host):
+        """Whether a request to host may be sent now"""
+        with self._lock:
+            open_until = self._open_until.get(host)
+            if open_until is None:
+                return True
+            now = time.monotonic()
+            if now < open_until:
+                return False
+            # Half-open: let this request through and hold back others until it reports
+            self._open_until[host] = now + self.reset_timeout
+            return True
+
+    def record_success(self, host):
+        with self._lock:
+            self._failures.pop(host, None)
+            self._open_until.pop(host, None)
+
+    def record_failure(self, host):
+        with self._lock:
+            failures = self._failures.get(host, 0) + 1
+            self._failures[host] = failures
+            if failures >= self.failure_threshold:
+                self._open_until[host] = time.monotonic() + self.reset_timeout
+
+    def is_open(self, host):
+        with self._lock:
+            return self._open_until.get(host, 0) > time.monotonic()
@@ -0,0 +1,146 @@
+"""Parallel local directory scanner used by directory uploads"""
+
+import os
+import stat
+import queue
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+
+LocalEntry = namedtuple('LocalEntry', ['path', 'rel_path', 'is_dir', 'size', 'mtime', 'is_empty'],
+                        defaults=(False,))
+LocalEntry.__doc__ = """A scanned local file or directory.
+
+path is the absolute local path, rel_path is relative to the scan root and
+always uses '/' as separator. size and mtime come from the single stat call
+made during the scan (size is 0 for directories). is_empty is set on
+directories that contain nothing that passed the filters, i.e. directories
+that would not otherwise come into existence on the remote side."""
+
+_DONE = object()
+
+
+def scan_local_tree(local_dir, recursive=True, dir_filter=None, file_filter=None,
+                    workers=8, max_pending=4096):
+    """
+    Walk a local directory tree and yield its entries as they are found.
+
+    Every directory is listed with os.scandir in its own task on a thread
+    pool, so wide or slow trees are scanned in parallel. Each file is stat'ed
+    once and the result travels with the entry. Entries are streamed through
+    a bounded queue, so the consumer can start working before the scan ends.
+    A directory entry is always yielded before anything inside it, and in
+    recursive mode it carries is_empty once its own listing is known.
+
+    Args:
+        local_dir: Root directory to scan
+        recursive: Whether to descend into subdirectories
+        dir_filter: Optional callable(rel_dir) -> bool. Directories for which it
+            returns False are pruned along with everything below them
+        file_filter: Optional callable(LocalEntry) -> bool applied to each file
+        workers: Number of scanning threads
+        max_pending: Maximum number of entries buffered ahead of the consumer
+
+    Yields:
+        LocalEntry objects (the root directory itself is not yielded)
+    """
+    local_dir = os.path.abspath(local_dir)
+    results = queue.Queue(maxsize=max(1, max_pending))
+    stop = threading.Event()
+    lock = threading.Lock()
+    pending = [1]
+    executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='bdnd-scan')
+
+    def emit(item):
+        # Block while the consumer is behind, but give up once it has gone away
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def scan(dir_path, rel_dir):
+        subdirs = []
+        try:
+            if stop.is_set():
+                return
+            try:
+                with os.scandir(dir_path) as it:
+                    children = list(it)
+            except OSError as e:
+                print(f"Warning: Cannot scan directory {dir_path}: {e}")
+                if rel_dir:
+                    emit(LocalEntry(dir_path, rel_dir, True, 0, None, True))
+                return
+
+            kept = []
+            for child in children:
+                rel_path = rel_dir + '/' + child.name if rel_dir else child.name
+                try:
+                    is_dir = child.is_dir()
+                except OSError:
+                    is_dir = False
+
+                if is_dir:
+                    if dir_filter is not None and not dir_filter(rel_path):
+                        continue
+                    # Like os.walk, symlinked directories are listed but not followed.
+                    # Directories that are scanned report themselves with is_empty
+                    # known; the rest are leaves as far as the caller is concerned.
+                    if recursive and not child.is_symlink():
+                        subdirs.append((child.path, rel_path))
+                    else:
+                        kept.append(LocalEntry(child.path, rel_path, True, 0, None, True))
+                    continue
+
+                try:
+                    st = child.stat()
+                except OSError as e:
+                    print(f"Warning: Cannot stat {child.path}: {e}")
+                    continue
+                if not stat.S_ISREG(st.st_mode):
+                    continue
+                entry = LocalEntry(child.path, rel_path, False, st.st_size, st.st_mtime)
+                if file_filter is not None and not file_filter(entry):
+                    continue
+                kept.append(entry)
+
+            if rel_dir:
+                is_empty = not kept and not subdirs
+                if not emit(LocalEntry(dir_path, rel_dir, True, 0, None, is_empty)):
+                    return
+            for entry in kept:
+                if not emit(entry):
+                    return
+        except Exception as e:
+            emit(e)
+        finally:
+            with lock:
+                pending[0] += len(subdirs) - 1
+                finished = pending[0] == 0
+            for sub_path, sub_rel in subdirs:
+                if stop.is_set():
+                    break
+                try:
+                    executor.submit(scan, sub_path, sub_rel)
+                except RuntimeError:
+                    # The consumer closed the generator and the pool is shutting down
+                    break
+            if finished:
+                emit(_DONE)
+
+    executor.submit(scan, local_dir, '')
+    try:
+        while True:
+            item = results.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        executor.shutdown(wait=True)
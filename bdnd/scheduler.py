@@ -0,0 +1,61 @@
+"""Size-aware ordering of directory transfer work"""
+
+import heapq
+import itertools
+from collections import deque
+
+
+def schedule_by_size(items, size_of, passthrough=None, window=512, small_size=4 * 1024 * 1024,
+                     small_per_large=8):
+    """
+    Reorder a stream of transfer items: largest first, small items packed in between
+
+    Items are collected into a look-ahead window. Each step hands out the
+    largest file in the window, followed by up to small_per_large small
+    files, so long transfers start as early as possible while small files
+    keep the remaining workers busy; the run no longer ends with one large
+    file left on a single connection after everything else is done. The
+    window starts at one item and doubles with every step up to window, so
+    the first item is handed out as soon as it arrives and transfers start
+    while the scan or listing is still running. The window bounds memory,
+    so this works on streamed scans and listings.
+
+    Args:
+        items: Iterable of work items
+        size_of: Callable(item) -> size in bytes
+        passthrough: Optional callable(item) -> bool for items (e.g. directories)
+            that are yielded immediately, unordered
+        window: Number of items held back for ordering
+        small_size: Items up to this size count as small
+        small_per_large: Small items handed out after each large one
+
+    Yields:
+        The items, reordered
+    """
+    large = []
+    small = deque()
+    counter = itertools.count()
+    limit = 1
+
+    def step():
+        if large:
+            yield heapq.heappop(large)[2]
+            for _ in range(min(small_per_large, len(small))):
+                yield small.popleft()
+        elif small:
+            yield small.popleft()
+
+    for item in items:
+        if passthrough is not None and passthrough(item):
+            yield item
+            continue
+        size = size_of(item) or 0
+        if size <= small_size:
+            small.append(item)
+        else:
+            heapq.heappush(large, (-size, next(counter), item))
+        if len(large) + len(small) >= limit:
+            yield from step()
+            limit = min(window, limit * 2)
+    while large or small:
+        yield from step()
@@ -6,6 +6,7 @@ import shlex
 import fnmatch
 import re
 from .client import BaiduNetdiskClient
+from .filters import parse_rule_args
 
 # Try to import readline for tab completion
 try:
@@ -408,9 +409,16 @@ class BaiduNetdiskShell:
             print(f"Error: Failed to create directory '{target_path}'")
     
     def cmd_upload(self, args):
-        """Upload file: upload <local_path> [remote_path]"""
+        """Upload file: upload <local_path> [remote_path] [--include P] [--exclude P] ..."""
+        try:
+            rules, args = parse_rule_args(args)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+        
         if len(args) == 0:
-            print("Usage: upload <local_path> [remote_path]")
+            print("Usage: upload <local_path> [remote_path] [--include P] [--exclude P]")
+            print("       [--min-size S] [--max-size S] [--newer-than T] [--older-than T]")
             return
         
         local_path = args[0]
@@ -431,7 +439,7 @@ class BaiduNetdiskShell:
         if os.path.isdir(local_path):
             # Upload directory
             print(f"Uploading directory '{local_path}' to '{remote_path}'...")
-            count = self.client.upload_directory(local_path, remote_path, recursive=True)
+            count = self.client.upload_directory(local_path, remote_path, recursive=True, rules=rules)
             print(f"Uploaded {count} files")
         else:
             # Upload file
@@ -443,9 +451,16 @@ class BaiduNetdiskShell:
                 print("Upload failed")
     
     def cmd_download(self, args):
-        """Download file: download <remote_path> [local_path]"""
+        """Download file: download <remote_path> [local_path] [--include P] [--exclude P] ..."""
+        try:
+            rules, args = parse_rule_args(args)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+        
         if len(args) == 0:
-            print("Usage: download <remote_path> [local_path]")
+            print("Usage: download <remote_path> [local_path] [--include P] [--exclude P]")
+            print("       [--min-size S] [--max-size S] [--newer-than T] [--older-than T]")
             return
         
         remote_path = self._resolve_path(args[0])
@@ -471,7 +486,7 @@ class BaiduNetdiskShell:
         if is_dir:
             # Download directory
             print(f"Downloading directory '{remote_path}' to '{local_path}'...")
-            count = self.client.download_directory(remote_path, local_path, recursive=True)
+            count = self.client.download_directory(remote_path, local_path, recursive=True, rules=rules)
             print(f"Downloaded {count} files")
         else:
             # Download file
@@ -1111,14 +1126,16 @@ class BaiduNetdiskShell:
             "pwd": "Print working directory: pwd",
             "du": "Show disk usage: du [path] [-s] (show directory and file sizes)",
             "mkdir": "Create directory: mkdir <path>",
-            "upload": "Upload file or directory: upload <local_path> [remote_path]",
-            "download": "Download file or directory: download <remote_path> [local_path]",
+            "upload": "Upload file or directory: upload <local_path> [remote_path] [--include P] [--exclude P] [--min-size S] [--max-size S] [--newer-than T] [--older-than T]",
+            "download": "Download file or directory: download <remote_path> [local_path] [--include P] [--exclude P] [--min-size S] [--max-size S] [--newer-than T] [--older-than T]",
             "mv": "Rename file or directory: mv <old_path> <new_name> (supports wildcards: *, ?)",
             "cat": "Show file information and content: cat <path>",
             "head": "Show first N lines: head [-n N] <path> (default: 10 lines)",
             "tail": "Show last N lines: tail [-n N] <path> (default: 10 lines)",
             "rcsv": "Read and display CSV file: rcsv [-n N] [-c] [-s col1,col2,...] <path> (like SQL SELECT)",
             "whoami": "Show user and quota information: whoami",
+            "stats": "Show transfer statistics: stats [reset]",
+            "limit": "Show or set limits: limit [up|down <rate>] | limit api [<family> <qps>] (e.g. 'limit up 20M', 'limit down off', 'limit api xpan/file 5')",
             "clear": "Clear screen: clear",
             "help": "Show help: help [command]",
             "exit": "Exit shell: exit or quit",
@@ -1160,6 +1177,8 @@ class BaiduNetdiskShell:
             print("-" * 60)
             print(f"Username:    {user_info.get('uname', 'N/A')}")
             print(f"User ID:     {user_info.get('uk', 'N/A')}")
+            vip_names = {0: 'Normal', 1: 'VIP', 2: 'SVIP'}
+            print(f"VIP Level:   {vip_names.get(user_info.get('vip_type'), 'N/A')}")
             print(f"Avatar URL:  {user_info.get('avatar_url', 'N/A')}")
             print("-" * 60)
         else:
@@ -1177,11 +1196,74 @@ class BaiduNetdiskShell:
             print(f"Free:        {self._format_size(free)}")
             print("-" * 60)
     
+    def cmd_stats(self, args):
+        """Show transfer statistics: stats [reset]"""
+        if args and args[0] == 'reset':
+            self.client.stats.reset()
+            print("Statistics reset")
+            return
+        
+        snapshot = self.client.get_stats()
+        counters = snapshot['counters']
+        timers = snapshot['timers']
+        gauges = snapshot['gauges']
+        if not counters and not timers and not gauges:
+            print("No statistics collected yet")
+            return
+        
+        print("\nTransfer Statistics:")
+        print("-" * 60)
+        for name in sorted(counters):
+            value = counters[name]
+            if name.endswith('_bytes'):
+                value = self._format_size(value)
+            print(f"{name:<36} {value}")
+        for name in sorted(timers):
+            timer = timers[name]
+            print(f"{name:<36} {timer['count']} calls, avg {timer['avg'] * 1000:.1f} ms")
+        for name in sorted(gauges):
+            print(f"{name:<36} {gauges[name]}")
+        print("-" * 60)
+    
+    def cmd_limit(self, args):
+        """Show or set bandwidth and API rate limits: limit [up|down <rate>] | limit api [<family> <qps>]"""
+        if args and args[0] == 'api':
+            if len(args) == 3:
+                try:
+                    qps = 0 if args[2].lower() in ('off', 'none', 'unlimited') else float(args[2])
+                except ValueError:
+                    print(f"Error: Invalid rate: {args[2]}")
+                    return
+                self.client.api_limiter.set_rate(args[1], qps)
+            elif len(args) != 1:
+                print("Usage: limit api [<family> <qps>] (e.g. 'limit api xpan/file 5')")
+                return
+            for family, qps in sorted(self.client.api_limiter.get_rates().items()):
+                print(f"{family:<16} {f'{qps:g} req/s' if qps else 'unlimited'}")
+            return
+        if len(args) == 0:
+            up, down = self.client.bandwidth.get_limits()
+        elif len(args) == 2 and args[0] in ('up', 'down'):
+            rate = '0' if args[1].lower() in ('off', 'none', 'unlimited') else args[1]
+            try:
+                if args[0] == 'up':
+                    up, down = self.client.set_bandwidth_limit(up=rate)
+                else:
+                    up, down = self.client.set_bandwidth_limit(down=rate)
+            except ValueError as e:
+                print(f"Error: {e}")
+                return
+        else:
+            print("Usage: limit [up|down <rate>] (e.g. 'limit up 20M', 'limit down off')")
+            return
+        print(f"Upload limit:   {self._format_size(up) + '/s' if up else 'unlimited'}")
+        print(f"Download limit: {self._format_size(down) + '/s' if down else 'unlimited'}")
+    
     def _get_commands(self):
         """Get list of available commands"""
         return [
             'cd', 'ls', 'pwd', 'du', 'mkdir', 'upload', 'download',
-            'mv', 'cat', 'head', 'tail', 'rcsv', 'whoami',
+            'mv', 'cat', 'head', 'tail', 'rcsv', 'whoami', 'stats', 'limit',
             'clear', 'help', 'exit', 'quit'
         ]
     
@@ -0,0 +1,66 @@
+"""Runtime statistics collected by the client"""
+
+import threading
+
+
+class TransferStats:
+    """
+    Thread-safe counters, timers and gauges describing what a client has done
+
+    Counters accumulate (requests sent, files uploaded through each path, bytes
+    moved), timers accumulate a call count and total seconds, and gauges hold
+    the latest value of a setting the client picked at runtime.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timers = {}
+        self._gauges = {}
+
+    def incr(self, name, value=1):
+        """Add value to a counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def add_time(self, name, seconds):
+        """Record one timed operation"""
+        with self._lock:
+            count, total = self._timers.get(name, (0, 0.0))
+            self._timers[name] = (count + 1, total + seconds)
+
+    def set(self, name, value):
+        """Set a gauge to its current value"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def get(self, name, default=0):
+        """Get a counter or gauge value"""
+        with self._lock:
+            if name in self._gauges:
+                return self._gauges[name]
+            return self._counters.get(name, default)
+
+    def reset(self):
+        """Clear counters and timers (gauges describe current state and are kept)"""
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+
+    def snapshot(self):
+        """
+        Get a copy of all statistics
+
+        Returns:
+            Dict with 'counters', 'timers' ({name: {'count', 'total', 'avg'}}) and 'gauges'
+        """
+        with self._lock:
+            timers = {
+                name: {'count': count, 'total': total, 'avg': total / count if count else 0.0}
+                for name, (count, total) in self._timers.items()
+            }
+            return {
+                'counters': dict(self._counters),
+                'timers': timers,
+                'gauges': dict(self._gauges),
+            }
@@ -0,0 +1,67 @@
+"""Small parsing helpers shared by the client, shell and CLI"""
+
+import re
+import time
+from datetime import datetime
+
+
+_SIZE_UNITS = {
+    '': 1,
+    'K': 1024,
+    'M': 1024 ** 2,
+    'G': 1024 ** 3,
+    'T': 1024 ** 4,
+}
+
+_DURATION_UNITS = {
+    's': 1,
+    'm': 60,
+    'h': 3600,
+    'd': 86400,
+    'w': 7 * 86400,
+}
+
+
+def parse_size(value):
+    """
+    Parse a human readable size such as '512', '20M', '1.5G' or '4MiB' into bytes
+
+    Units are binary (K = 1024), matching how sizes are displayed elsewhere.
+
+    Raises:
+        ValueError: If the value cannot be parsed
+    """
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:i?B)?\s*', str(value), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid size: {value}")
+    number, unit = match.groups()
+    return int(float(number) * _SIZE_UNITS[unit.upper()])
+
+
+def parse_time(value, now=None):
+    """
+    Parse a point in time into a Unix timestamp
+
+    Accepts an age relative to now ('30m', '12h', '7d', '2w'), a date
+    ('2024-01-31') or a date and time ('2024-01-31 08:00:00').
+
+    Raises:
+        ValueError: If the value cannot be parsed
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([smhdw])', text, re.IGNORECASE)
+    if match:
+        number, unit = match.groups()
+        if now is None:
+            now = time.time()
+        return now - float(number) * _DURATION_UNITS[unit.lower()]
+    for fmt in ('%Y-%m-%d', '%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S'):
+        try:
+            return datetime.strptime(text, fmt).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid time: {value}")
@@ -0,0 +1,85 @@
+"""Background disk writer fed by download streams"""
+
+import queue
+import threading
+
+
+class DiskWriter:
+    """
+    Write a download to disk on a dedicated thread
+
+    The network thread reads into a buffer taken from get_buffer() and hands
+    it to write(); the writer thread writes it to the file (and feeds an
+    optional hasher) and returns the buffer to the pool. Buffers are reused,
+    so the receive loop allocates nothing per read, and it only waits for
+    the disk when depth writes are outstanding, which also caps memory use at
+    depth * buffer_size.
+    """
+
+    def __init__(self, f, buffer_size=1024 * 1024, depth=8, hasher=None):
+        """
+        Args:
+            f: File object opened for writing
+            buffer_size: Size of each pooled buffer
+            depth: Number of buffers (maximum writes outstanding)
+            hasher: Optional object with update(bytes), fed everything written
+        """
+        self._f = f
+        self._hasher = hasher
+        self._free = queue.Queue()
+        for _ in range(max(1, depth)):
+            self._free.put(bytearray(buffer_size))
+        self._pending = queue.Queue()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name='bdnd-diskwriter', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            buffer, length = item
+            if self._error is None:
+                try:
+                    view = memoryview(buffer)[:length]
+                    self._f.write(view)
+                    if self._hasher is not None:
+                        self._hasher.update(bytes(view))
+                except Exception as e:
+                    self._error = e
+            self._free.put(buffer)
+
+    def get_buffer(self):
+        """
+        Take a free buffer, waiting while all of them are queued for writing
+
+        Raises:
+            The error of a failed write
+        """
+        while True:
+            if self._error is not None:
+                raise self._error
+            try:
+                return self._free.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def write(self, buffer, length):
+        """Queue the first length bytes of buffer (from get_buffer) for writing"""
+        if self._error is not None:
+            raise self._error
+        self._pending.put((buffer, length))
+
+    def close(self):
+        """
+        Wait until everything queued is written
+
+        Raises:
+            The error of a failed write
+        """
+        if self._thread.is_alive():
+            self._pending.put(None)
+            self._thread.join()
+        if self._error is not None:
+            raise self._error
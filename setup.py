@@ -35,6 +35,9 @@ setup(
         "Programming Language :: Python :: 3.12",
     ],
     python_requires=">=3.7",
+    extras_require={
+        "async": ["aiohttp>=3.7"],
+    },
     entry_points={
         "console_scripts": [
             "bdnd=bdnd.cli:main",
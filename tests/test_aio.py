@@ -0,0 +1,230 @@
+"""Async client against a local fake of the Baidu endpoints"""
+
+import asyncio
+import hashlib
+import json
+import time
+
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from bdnd.aio import AsyncBaiduNetdiskClient
+from bdnd.hosts import UploadHostPool
+from bdnd.retry import RetryPolicy
+
+
+KB = 1024
+
+
+class FakeBaidu:
+    """The file, multimedia, superfile2 and download endpoints the async client uses"""
+
+    def __init__(self):
+        # path -> (fs_id, content, server_ctime)
+        self.files = {}
+        self.parts = {}
+        self.part_failures = {}
+        self.requests = []
+        self.honor_range = True
+        self.single_upload_answer = True
+        self.download = b''
+
+    def app(self):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_route('*', '/rest/2.0/xpan/file', self.xpan_file)
+        app.router.add_get('/rest/2.0/xpan/multimedia', self.filemetas)
+        app.router.add_post('/rest/2.0/pcs/superfile2', self.superfile2)
+        app.router.add_post('/rest/2.0/pcs/file', self.single_upload)
+        app.router.add_route('*', '/download', self.serve_download)
+        return app
+
+    def add_file(self, path, content, ctime=None):
+        fsid = len(self.files) + 100
+        self.files[path] = (fsid, content, int(time.time()) if ctime is None else ctime)
+        return fsid
+
+    async def xpan_file(self, request):
+        method = request.query['method']
+        self.requests.append(method)
+        if method == 'list':
+            directory = request.query['dir']
+            return web.json_response({'errno': 0, 'list': [
+                {'server_filename': path.rpartition('/')[2], 'fs_id': fsid}
+                for path, (fsid, _, _) in self.files.items() if path.rpartition('/')[0] == directory
+            ]})
+        form = await request.post()
+        if method == 'precreate':
+            return web.json_response({'errno': 0, 'uploadid': 'upload-1', 'return_type': 1})
+        if method == 'create':
+            block_md5s = json.loads(form['block_list'])
+            content = b''.join(self.parts[idx] for idx in range(len(block_md5s)))
+            assert [hashlib.md5(self.parts[idx]).hexdigest() for idx in range(len(block_md5s))] == block_md5s
+            fsid = self.add_file(form['path'], content)
+            return web.json_response({'errno': 0, 'fs_id': fsid, 'path': form['path'], 'size': len(content)})
+        return web.json_response({'errno': 2})
+
+    async def filemetas(self, request):
+        fsids = json.loads(request.query['fsids'])
+        return web.json_response({'errno': 0, 'list': [
+            {'fs_id': fsid, 'path': path, 'size': len(content), 'md5': hashlib.md5(content).hexdigest(),
+             'server_ctime': ctime}
+            for path, (fsid, content, ctime) in self.files.items() if fsid in fsids
+        ]})
+
+    async def superfile2(self, request):
+        idx = int(request.query['partseq'])
+        self.requests.append(f'part{idx}')
+        if self.part_failures.get(idx):
+            self.part_failures[idx] -= 1
+            return web.Response(status=500)
+        form = await request.post()
+        self.parts[idx] = form['file'].file.read()
+        return web.json_response({'md5': hashlib.md5(self.parts[idx]).hexdigest()})
+
+    async def single_upload(self, request):
+        self.requests.append(f'single@{request.host}')
+        form = await request.post()
+        content = form['file'].file.read()
+        fsid = self.add_file(request.query['path'], content)
+        if not self.single_upload_answer:
+            # The file landed, but the answer is lost on the way back
+            return web.Response(text='<html>gateway timeout</html>')
+        return web.json_response({'fs_id': fsid, 'path': request.query['path'], 'size': len(content)})
+
+    async def serve_download(self, request):
+        headers = {'Accept-Ranges': 'bytes'}
+        if request.method == 'HEAD':
+            return web.Response(body=self.download, headers=headers)
+        range_header = request.headers.get('Range')
+        self.requests.append(f'get {range_header}' if range_header else 'get')
+        if range_header and self.honor_range:
+            start, end = (int(x) for x in range_header.split('=')[1].split('-'))
+            headers['Content-Range'] = f'bytes {start}-{end}/{len(self.download)}'
+            return web.Response(status=206, body=self.download[start:end + 1], headers=headers)
+        return web.Response(body=self.download, headers=headers)
+
+
+def run_with_server(fake, test, hosts=1, **client_kwargs):
+    """Run test(client, base_url) with a client whose Baidu calls all go to fake"""
+
+    async def main():
+        server = TestServer(fake.app())
+        await server.start_server()
+        base = str(server.make_url('')).rstrip('/')
+        client = AsyncBaiduNetdiskClient(access_token='token', base_path='/', upload_block_size=16 * KB,
+                                         retry_policy=RetryPolicy(base_delay=0.01), **client_kwargs)
+        upload_hosts = [base, base.replace('127.0.0.1', 'localhost')][:hosts]
+        client._upload_hosts = UploadHostPool(upload_hosts)
+        request = client._request
+
+        async def local_request(method, url, *args, **kwargs):
+            return await request(method, url.replace('https://pan.baidu.com', base), *args, **kwargs)
+
+        client._request = local_request
+        try:
+            return await test(client, base)
+        finally:
+            await client.close()
+            await server.close()
+
+    return asyncio.run(main())
+
+
+@pytest.fixture
+def fake():
+    return FakeBaidu()
+
+
+@pytest.mark.parametrize('honor_range', [True, False])
+def test_ranged_download(fake, tmp_path, honor_range):
+    fake.download = bytes(range(256)) * 256
+    fake.honor_range = honor_range
+    save_path = str(tmp_path / 'out.bin')
+
+    async def test(client, base):
+        client.MIN_SEGMENT_SIZE = 8 * KB
+        ok = await client.download_file(base + '/download', save_path, segments=4)
+        return ok, client.stats
+
+    ok, stats = run_with_server(fake, test)
+    assert ok
+    with open(save_path, 'rb') as f:
+        assert f.read() == fake.download
+    gets = [r for r in fake.requests if r.startswith('get')]
+    if honor_range:
+        ranges = [f'get bytes={start}-{start + 16 * KB - 1}' for start in range(0, 64 * KB, 16 * KB)]
+        assert sorted(gets) == sorted(ranges)
+    else:
+        # One round of ranged requests, then a single plain GET; nothing is retried
+        assert len(gets) == 5
+        assert gets.count('get') == 1
+        assert stats.get('download_range_ignored') == 1
+
+
+def test_chunked_upload_retries_failed_part(fake, tmp_path):
+    content = bytes(range(256)) * 200
+    local_file = tmp_path / 'data.bin'
+    local_file.write_bytes(content)
+    fake.part_failures[1] = 1
+
+    async def test(client, base):
+        return await client.upload_file(str(local_file), '/d/data.bin'), client.stats
+
+    result, stats = run_with_server(fake, test, small_file_threshold=0)
+    assert result['errno'] == 0
+    assert fake.files['/d/data.bin'][1] == content
+    assert fake.requests.count('part1') == 2
+    assert stats.get('upload_part_retries') == 1
+
+
+def test_chunked_upload_stops_when_file_changes(fake, tmp_path):
+    local_file = tmp_path / 'data.bin'
+    local_file.write_bytes(b'a' * 40 * KB)
+
+    async def test(client, base):
+        hash_blocks = client._hash_engine.hash_blocks
+
+        def hash_then_change(path, block_size):
+            digest = hash_blocks(path, block_size)
+            with open(path, 'r+b') as f:
+                f.seek(20 * KB)
+                f.write(b'b')
+            return digest
+
+        client._hash_engine.hash_blocks = hash_then_change
+        return await client.upload_file(str(local_file), '/d/data.bin')
+
+    assert run_with_server(fake, test, small_file_threshold=0) is None
+    # The changed block is never sent, and nothing is created
+    assert 'part1' not in fake.requests
+    assert 'create' not in fake.requests
+    assert '/d/data.bin' not in fake.files
+
+
+def test_small_upload_is_sent_to_one_host_and_found_when_the_answer_is_lost(fake, tmp_path):
+    local_file = tmp_path / 'a.txt'
+    local_file.write_bytes(b'small file')
+    fake.single_upload_answer = False
+
+    async def test(client, base):
+        return await client.upload_file(str(local_file), '/d/a.txt'), client.stats
+
+    result, stats = run_with_server(fake, test, hosts=2)
+    assert result['fs_id'] == fake.files['/d/a.txt'][0]
+    assert len([r for r in fake.requests if r.startswith('single@')]) == 1
+    assert 'precreate' not in fake.requests
+    assert stats.get('upload_single_recovered') == 1
+
+
+def test_small_upload_does_not_take_an_older_file_for_its_own(fake, tmp_path):
+    local_file = tmp_path / 'a.txt'
+    local_file.write_bytes(b'small file')
+    fake.add_file('/d/a.txt', b'other file', ctime=int(time.time()) - 3600)
+
+    async def test(client, base):
+        return await client._find_uploaded_file(str(local_file), '/d/a.txt', len(b'small file'), time.time())
+
+    assert run_with_server(fake, test) is None
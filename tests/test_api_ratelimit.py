@@ -0,0 +1,23 @@
+"""Per-endpoint-family API rate limits"""
+
+from bdnd.ratelimit import ApiRateLimiter, api_family
+
+
+def test_api_family():
+    assert api_family('https://pan.baidu.com/rest/2.0/xpan/file?method=list') == 'xpan/file'
+    assert api_family('https://pan.baidu.com/rest/2.0/xpan/file?method=filemanager&opera=delete') == 'filemanager'
+    assert api_family('https://pan.baidu.com/rest/2.0/xpan/nas?method=uinfo') == 'xpan/nas'
+    assert api_family('https://d.pcs.baidu.com/rest/2.0/pcs/superfile2?method=upload') is None
+
+
+def test_api_rate_limiter():
+    limiter = ApiRateLimiter({'xpan/file': 2})
+    url = 'https://pan.baidu.com/rest/2.0/xpan/file?method=list'
+    assert limiter.reserve(url) == 0.0
+    assert limiter.reserve(url) == 0.0
+    assert limiter.reserve(url) > 0
+    # Families without a rate are not limited
+    assert limiter.reserve('https://pan.baidu.com/rest/2.0/xpan/nas?method=uinfo') == 0.0
+    limiter.set_rate('xpan/file', 0)
+    assert limiter.reserve(url) == 0.0
+    assert limiter.get_rates() == {'xpan/file': 0}
@@ -0,0 +1,57 @@
+"""Bounded in-memory caches with expiry"""
+
+import time
+
+from bdnd.cache import TTLCache
+from bdnd.stats import TransferStats
+
+
+def test_get_set_and_stats():
+    stats = TransferStats()
+    cache = TTLCache(maxsize=4, ttl=60, name='meta', stats=stats)
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    assert cache.get('b', 'missing') == 'missing'
+    assert stats.get('meta_hits') == 1
+    assert stats.get('meta_misses') == 1
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    cache = TTLCache(ttl=10)
+    cache.set('a', 1)
+    now[0] += 9
+    assert cache.get('a') == 1
+    now[0] += 2
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_is_dropped():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+
+
+def test_disabled_cache_stores_nothing():
+    for cache in (TTLCache(maxsize=0), TTLCache(ttl=0)):
+        cache.set('a', 1)
+        assert cache.get('a') is None
+
+
+def test_pop_and_discard_where():
+    cache = TTLCache(ttl=60)
+    for key in ('/d/a', '/d/b', '/e/c'):
+        cache.set(key, key)
+    assert cache.pop('/d/a')
+    assert not cache.pop('/d/a')
+    assert cache.discard_where(lambda key, value: key.startswith('/d/')) == 1
+    assert len(cache) == 1
+    cache.clear()
+    assert len(cache) == 0
@@ -0,0 +1,156 @@
+"""Path cache invalidation around deletes, renames and directory creation"""
+
+import time
+
+import pytest
+
+from bdnd.client import BaiduNetdiskClient
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+class FakeServer:
+    """A remote tree of name -> fs_id per directory, served through list_files"""
+
+    def __init__(self, files):
+        self.dirs = {}
+        self.next_fsid = 1
+        for path in files:
+            self.add(path)
+        self.list_calls = 0
+        # Set by a test to run something on a later list call
+        self.on_list = None
+
+    def add(self, path):
+        parent, _, name = path.rpartition('/')
+        self.dirs.setdefault(parent or '/', {})[name] = self.next_fsid
+        self.next_fsid += 1
+
+    def remove(self, path):
+        parent, _, name = path.rpartition('/')
+        return self.dirs.get(parent or '/', {}).pop(name, None)
+
+    def list_files(self, directory="/", start=0, limit=100, **kwargs):
+        self.list_calls += 1
+        if self.on_list is not None:
+            self.on_list(self.list_calls)
+        names = sorted(self.dirs.get(directory.rstrip('/') or '/', {}).items())
+        page = names[start:start + limit]
+        return [{'server_filename': name, 'fs_id': fsid, 'path': f"{directory.rstrip('/')}/{name}"}
+                for name, fsid in page]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = BaiduNetdiskClient(access_token="token", base_path="/")
+    monkeypatch.setattr(time, 'sleep', lambda seconds: None)
+    return client
+
+
+def test_lookup_is_cached(client, monkeypatch):
+    server = FakeServer(['/d/a.txt', '/d/b.txt'])
+    monkeypatch.setattr(client, 'list_files', server.list_files)
+
+    assert client.get_fsid_by_path('/d/a.txt') == 1
+    assert client.get_fsid_by_path('/d/b.txt') == 2
+    assert server.list_calls == 1
+
+
+def test_uncached_lookup_skips_cache(client, monkeypatch):
+    server = FakeServer(['/d/a.txt'])
+    monkeypatch.setattr(client, 'list_files', server.list_files)
+
+    assert client.get_fsid_by_path('/d/a.txt', use_cache=False) == 1
+    assert client.get_fsid_by_path('/d/a.txt', use_cache=False) == 1
+    assert server.list_calls == 2
+    # Nothing was cached by the uncached lookups
+    assert client.get_fsid_by_path('/d/a.txt') == 1
+    assert server.list_calls == 3
+
+
+def test_async_delete_is_seen_by_verification(client, monkeypatch):
+    server = FakeServer(['/d/a.txt', '/d/b.txt'])
+    monkeypatch.setattr(client, 'list_files', server.list_files)
+    assert client.get_fsid_by_path('/d/a.txt') == 1
+
+    def delete_later(calls):
+        # The server finishes the deletion after the first verification poll
+        if calls >= 3:
+            server.remove('/d/a.txt')
+
+    def request(method, url, **kwargs):
+        assert 'opera=delete' in url
+        server.on_list = delete_later
+        return FakeResponse({'errno': 0, 'taskid': 7})
+
+    monkeypatch.setattr(client, '_safe_request', request)
+    assert client.delete_file_by_paths(['/d/a.txt']) is True
+    assert client.get_fsid_by_path('/d/a.txt') is None
+    assert client.get_fsid_by_path('/d/b.txt') == 2
+
+
+def test_failed_delete_keeps_cache(client, monkeypatch):
+    server = FakeServer(['/d/a.txt'])
+    monkeypatch.setattr(client, 'list_files', server.list_files)
+    assert client.get_fsid_by_path('/d/a.txt') == 1
+    monkeypatch.setattr(client, '_safe_request',
+                        lambda method, url, **kwargs: FakeResponse({'errno': 12, 'errmsg': 'failed'}))
+
+    assert client.delete_file_by_paths(['/d/a.txt']) is False
+    calls = server.list_calls
+    assert client.get_fsid_by_path('/d/a.txt') == 1
+    assert server.list_calls == calls
+
+
+def test_rename_invalidates_old_and_new_path(client, monkeypatch):
+    server = FakeServer(['/d/a.txt'])
+    monkeypatch.setattr(client, 'list_files', server.list_files)
+    assert client.get_fsid_by_path('/d/a.txt') == 1
+    assert client.get_fsid_by_path('/d/b.txt') is None
+
+    def request(method, url, **kwargs):
+        assert 'opera=rename' in url
+        # A lookup running while the server renames caches the old listing
+        assert client.get_fsid_by_path('/d/a.txt') == 1
+        fsid = server.remove('/d/a.txt')
+        server.dirs['/d']['b.txt'] = fsid
+        return FakeResponse({'errno': 0})
+
+    monkeypatch.setattr(client, '_safe_request', request)
+    assert client.rename_file('/d/a.txt', 'b.txt') is True
+    assert client.get_fsid_by_path('/d/a.txt') is None
+    assert client.get_fsid_by_path('/d/b.txt') == 1
+
+
+def test_create_directory_invalidates_after_success(client, monkeypatch):
+    server = FakeServer(['/d/a.txt'])
+    monkeypatch.setattr(client, 'list_files', server.list_files)
+    assert client.get_fsid_by_path('/d/new') is None
+
+    def request(method, url, **kwargs):
+        server.add('/d/new')
+        return FakeResponse({'errno': 0})
+
+    monkeypatch.setattr(client, '_safe_request', request)
+    assert client.create_directory('/d/new') is True
+    assert client.get_fsid_by_path('/d/new') is not None
+
+
+def test_map_metadata_pages_and_warms_lookups(client, monkeypatch):
+    server = FakeServer([f'/d/f{i}.txt' for i in range(5)])
+    monkeypatch.setattr(client, 'list_files', server.list_files)
+    monkeypatch.setattr(client, 'LIST_PAGE_SIZE', 2)
+
+    found = dict(client.map_metadata(['/d/f3.txt', '/d/missing.txt']))
+    assert found['/d/f3.txt']['fs_id'] == 4
+    assert found['/d/missing.txt'] is None
+    assert server.list_calls == 3
+    # Every listed page went into the path cache
+    assert client.get_fsid_by_path('/d/f1.txt') == 2
+    assert server.list_calls == 3
@@ -0,0 +1,26 @@
+"""Shutting down a client's worker threads"""
+
+import threading
+
+import pytest
+
+from bdnd.client import BaiduNetdiskClient
+
+
+def bdnd_threads():
+    return [t for t in threading.enumerate() if t.name.startswith('bdnd-') and t.is_alive()]
+
+
+def test_close_stops_control_workers_and_hash_pools(tmp_path):
+    path = tmp_path / 'a.bin'
+    path.write_bytes(b'x' * 100)
+    before = set(bdnd_threads())
+
+    with BaiduNetdiskClient(access_token="token", base_path="/", control_workers=2) as client:
+        assert client._control_executor.submit(lambda: 42).result() == 42
+        assert client.get_hash_engine().hash_blocks(str(path), 10).size == 100
+        assert set(bdnd_threads()) - before
+
+    assert not set(bdnd_threads()) - before
+    with pytest.raises(RuntimeError):
+        client._control_executor.submit(lambda: None)
@@ -0,0 +1,99 @@
+"""AIMD concurrency feedback from transfers"""
+
+import errno
+import os
+import threading
+
+import pytest
+import requests
+
+import bdnd.client
+from bdnd.client import BaiduNetdiskClient
+from bdnd.concurrency import AIMDController, is_local_error
+
+
+def test_local_errors_are_told_apart_from_network_errors():
+    assert is_local_error(PermissionError(errno.EACCES, 'denied'))
+    assert is_local_error(OSError(errno.ENOSPC, 'no space left'))
+    assert is_local_error(FileNotFoundError(errno.ENOENT, 'missing'))
+    assert not is_local_error(ConnectionResetError(errno.ECONNRESET, 'reset'))
+    assert not is_local_error(TimeoutError(errno.ETIMEDOUT, 'timed out'))
+    assert not is_local_error(requests.exceptions.ConnectionError('refused'))
+    assert not is_local_error(ValueError('bad'))
+
+
+def test_failure_cuts_limit_and_unsampled_release_does_not():
+    controller = AIMDController(initial=8, maximum=16)
+    controller.release(controller.acquire(), ok=False, sample=False)
+    assert controller.limit == 8
+    controller.release(controller.acquire(), ok=False)
+    assert controller.limit == 4
+
+
+@pytest.fixture
+def client():
+    return BaiduNetdiskClient(access_token="token", base_path="/", file_workers=8)
+
+
+@pytest.fixture
+def local_dir(tmp_path):
+    for name in ('a.txt', 'b.txt'):
+        (tmp_path / name).write_bytes(b'data')
+    return str(tmp_path)
+
+
+def test_local_upload_failure_keeps_file_concurrency(client, local_dir, monkeypatch):
+    def upload(file_path, save_path, **kwargs):
+        client._note_local_error()
+        return None
+
+    monkeypatch.setattr(client, 'upload_file_auto', upload)
+    client.upload_directory(local_dir, '/remote/', checkpoint=False)
+    assert client.upload_file_concurrency.limit == 8
+
+
+def test_network_upload_failure_cuts_file_concurrency(client, local_dir, monkeypatch):
+    monkeypatch.setattr(client, 'upload_file_auto', lambda file_path, save_path, **kwargs: None)
+    client.upload_directory(local_dir, '/remote/', checkpoint=False)
+    assert client.upload_file_concurrency.limit < 8
+
+
+def test_disk_full_download_keeps_file_concurrency(client, tmp_path, monkeypatch):
+    listing = [{'path': '/remote/a.bin', 'server_filename': 'a.bin', 'isdir': 0, 'size': 4, 'fs_id': 1}]
+    monkeypatch.setattr(client, 'iter_all_files_recursive', lambda path: iter(listing))
+
+    def download(fsid, save_path, **kwargs):
+        raise OSError(errno.ENOSPC, 'No space left on device')
+
+    monkeypatch.setattr(client, 'download_file_by_fsid', download)
+    assert client.download_directory('/remote', str(tmp_path / 'out'), checkpoint=False) == 0
+    assert client.download_file_concurrency.limit == 8
+
+
+def test_failed_directory_walk_leaves_no_workers_behind(client, local_dir, monkeypatch):
+    os.mkdir(os.path.join(local_dir, 'empty'))
+    monkeypatch.setattr(client, 'upload_file_auto', lambda file_path, save_path, **kwargs: {'errno': 0})
+    monkeypatch.setattr(client, 'create_directory', lambda dir_path: True)
+
+    def broken_schedule(entries, size_of, **kwargs):
+        yield from entries
+        raise RuntimeError("scan failed")
+
+    monkeypatch.setattr(bdnd.client, 'schedule_by_size', broken_schedule)
+    with pytest.raises(RuntimeError):
+        client.upload_directory(local_dir, '/remote/', checkpoint=False, hash_ahead=0)
+    assert client.upload_file_concurrency.in_flight == 0
+    assert not [t for t in threading.enumerate() if t.name.startswith(('bdnd-mkdir', 'bdnd-upload')) and t.is_alive()]
+
+
+def test_failed_remote_walk_leaves_no_workers_behind(client, tmp_path, monkeypatch):
+    def listing(path):
+        yield {'path': '/remote/a.bin', 'server_filename': 'a.bin', 'isdir': 0, 'size': 4, 'fs_id': 1}
+        raise RuntimeError("listing failed")
+
+    monkeypatch.setattr(client, 'iter_all_files_recursive', listing)
+    monkeypatch.setattr(client, 'download_file_by_fsid', lambda fsid, save_path, **kwargs: True)
+    with pytest.raises(RuntimeError):
+        client.download_directory('/remote', str(tmp_path / 'out'), checkpoint=False)
+    assert client.download_file_concurrency.in_flight == 0
+    assert not [t for t in threading.enumerate() if t.name.startswith('bdnd-download') and t.is_alive()]
@@ -0,0 +1,89 @@
+"""Segmented downloads against a local HTTP server"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from bdnd.client import BaiduNetdiskClient
+from bdnd.manifest import PART_SUFFIX, STATE_SUFFIX
+
+
+KB = 1024
+CONTENT = bytes(range(256)) * 256
+
+
+class FileServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, honor_range):
+        super().__init__(('127.0.0.1', 0), FileHandler)
+        self.honor_range = honor_range
+        self.gets = []
+        self.lock = threading.Lock()
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(CONTENT)))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+
+    def do_GET(self):
+        range_header = self.headers.get('Range')
+        with self.server.lock:
+            self.server.gets.append(range_header)
+        body = CONTENT
+        if range_header and self.server.honor_range:
+            start, end = (int(x) for x in range_header.split('=')[1].split('-'))
+            body = CONTENT[start:end + 1]
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(CONTENT)}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture(params=[True, False], ids=['ranges', 'ranges-ignored'])
+def server(request):
+    server = FileServer(honor_range=request.param)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client():
+    client = BaiduNetdiskClient(access_token="token", base_path="/")
+    client.MIN_DOWNLOAD_SEGMENT = 8 * KB
+    client.DOWNLOAD_BLOCK_SIZE = 4 * KB
+    return client
+
+
+def test_segmented_download(server, client, tmp_path):
+    save_path = str(tmp_path / 'out.bin')
+    url = f'http://127.0.0.1:{server.server_address[1]}/file'
+
+    assert client.download_file(url, save_path, show_progress=False, segments=4)
+    with open(save_path, 'rb') as f:
+        assert f.read() == CONTENT
+    assert not (tmp_path / ('out.bin' + PART_SUFFIX)).exists()
+    assert not (tmp_path / ('out.bin' + PART_SUFFIX + STATE_SUFFIX)).exists()
+    assert client.stats.get('download_segment_retries') == 0
+    if server.honor_range:
+        assert len(server.gets) == 4
+        assert None not in server.gets
+        assert client.stats.get('download_range_ignored') == 0
+    else:
+        # Ranged requests are not retried; the file is fetched once as one stream
+        assert server.gets.count(None) == 1
+        assert len(server.gets) <= 5
+        assert client.stats.get('download_range_ignored') == 1
@@ -0,0 +1,120 @@
+"""Include/exclude rules and directory pruning"""
+
+import pytest
+
+from bdnd.filters import TransferRules, parse_rule_args
+from bdnd.scanner import scan_local_tree
+
+
+def test_glob_matches_at_any_depth():
+    rules = TransferRules([('-', '*.log')])
+    assert not rules.match_file('a.log')
+    assert not rules.match_file('x/y/a.log')
+    assert rules.match_file('a.txt')
+
+
+def test_anchored_glob():
+    rules = TransferRules([('-', '/build/*.o')])
+    assert not rules.match_file('build/a.o')
+    assert rules.match_file('src/build/a.o')
+
+
+def test_bare_name_prunes_directories_and_their_files():
+    rules = TransferRules([('-', 'node_modules')])
+    assert not rules.match_dir('node_modules')
+    assert not rules.match_dir('a/node_modules')
+    assert not rules.match_file('a/node_modules/x.js')
+    assert not rules.match_file('a/node_modules')
+    assert rules.match_dir('a/node_modules_old')
+    assert rules.match_file('a/b/x.js')
+
+
+def test_trailing_slash_only_matches_directories():
+    rules = TransferRules([('-', 'build/')])
+    assert not rules.match_dir('src/build')
+    assert not rules.match_file('src/build/a.o')
+    # A file named like the directory is kept
+    assert rules.match_file('src/build')
+
+
+def test_regex_rules_prune_directories():
+    rules = TransferRules([('-', r're:^data/\d+')])
+    assert not rules.match_dir('data/12')
+    assert rules.match_dir('data')
+    assert not rules.match_file('data/12/x.csv')
+    assert rules.match_file('data/x.csv')
+
+    rules = TransferRules([('-', 're:^data/')])
+    assert not rules.match_dir('data')
+    assert rules.match_dir('database')
+
+
+def test_first_matching_rule_wins():
+    rules = TransferRules(['+ keep.log', '- *.log'])
+    assert rules.match_file('a/keep.log')
+    assert not rules.match_file('a/other.log')
+
+
+def test_includes_select_only_matching_files():
+    rules = TransferRules([('+', '*.py')])
+    assert rules.match_file('a/b.py')
+    assert not rules.match_file('a/b.txt')
+    assert rules.match_dir('a')
+
+
+def test_double_star():
+    rules = TransferRules([('-', 'docs/**/*.tmp')])
+    assert not rules.match_file('docs/a.tmp')
+    assert not rules.match_file('docs/x/y/a.tmp')
+    assert rules.match_file('src/a.tmp')
+
+
+def test_size_and_time_windows():
+    rules = TransferRules(min_size='1K', max_size='1M', newer_than=1000, older_than=2000)
+    assert rules.match_file('a', size=2048, mtime=1500)
+    assert not rules.match_file('a', size=10, mtime=1500)
+    assert not rules.match_file('a', size=2 * 1024 * 1024, mtime=1500)
+    assert not rules.match_file('a', size=2048, mtime=500)
+    assert not rules.match_file('a', size=2048, mtime=2500)
+
+
+def test_match_tree_checks_parents_and_stays_bounded():
+    rules = TransferRules([('-', 'node_modules')])
+    assert not rules.match_tree('a/node_modules/pkg/lib')
+    assert rules.match_tree('a/b/c')
+
+    rules.DIR_MEMO_SIZE = 8
+    for i in range(100):
+        assert rules.match_tree(f'dir{i}/sub')
+    assert len(rules._dir_memo) <= 8
+
+
+def test_parse_rule_args():
+    rules, remaining = parse_rule_args(['src', '--exclude', 'node_modules', '--min-size=1K', 'dst'])
+    assert remaining == ['src', 'dst']
+    assert not rules.match_file('node_modules/x.js', size=2048)
+    assert rules.match_file('x.js', size=2048)
+    assert not rules.match_file('x.js', size=10)
+
+    assert parse_rule_args(['a', 'b']) == (None, ['a', 'b'])
+    with pytest.raises(ValueError):
+        parse_rule_args(['--exclude'])
+
+
+def test_scan_prunes_excluded_directories(tmp_path):
+    for rel in ('a/node_modules/pkg/x.js', 'a/b/y.js', 'node_modules/z.js', 'top.js'):
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('x')
+    rules = TransferRules([('-', 'node_modules')])
+    seen = []
+
+    def dir_filter(rel_dir):
+        seen.append(rel_dir)
+        return rules.match_dir(rel_dir)
+
+    entries = list(scan_local_tree(str(tmp_path), dir_filter=dir_filter, file_filter=rules.match_local_entry))
+    files = sorted(entry.rel_path for entry in entries if not entry.is_dir)
+    assert files == ['a/b/y.js', 'top.js']
+    # Pruned directories are never descended into
+    assert not any(rel_dir.startswith('a/node_modules/') for rel_dir in seen)
@@ -0,0 +1,128 @@
+"""Local content cache of downloaded files"""
+
+import os
+import stat
+
+import pytest
+
+from bdnd.localcache import LocalContentCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return LocalContentCache(str(tmp_path / 'cache'), max_bytes=1024)
+
+
+@pytest.fixture
+def downloaded(tmp_path):
+    path = tmp_path / 'download' / 'a.txt'
+    path.parent.mkdir()
+    path.write_bytes(b'hello world')
+    return str(path)
+
+
+def test_add_and_materialize(cache, downloaded, tmp_path):
+    assert cache.add(1, 'abcd', 11, downloaded)
+    assert cache.lookup(1, 'abcd', 11) is not None
+    assert cache.lookup(1, 'abcd', 12) is None
+    assert cache.lookup(2, 'abcd', 11) is None
+
+    dest = str(tmp_path / 'out' / 'a.txt')
+    assert cache.materialize(1, 'abcd', 11, dest) in ('reflink', 'copy_file_range', 'copy')
+    with open(dest, 'rb') as f:
+        assert f.read() == b'hello world'
+    assert cache.total_bytes == 11
+
+
+def test_add_leaves_source_writable_and_separate(cache, downloaded):
+    assert cache.add(1, 'abcd', 11, downloaded)
+    assert os.stat(downloaded).st_mode & stat.S_IWUSR
+    assert os.stat(downloaded).st_ino != os.stat(cache.lookup(1, 'abcd', 11)).st_ino
+
+    # Changing the downloaded file does not reach the cached copy
+    with open(downloaded, 'r+b') as f:
+        f.write(b'HELLO')
+    with open(cache.lookup(1, 'abcd', 11), 'rb') as f:
+        assert f.read() == b'hello world'
+
+
+def test_add_rejects_size_mismatch(cache, downloaded):
+    assert not cache.add(1, 'abcd', 12, downloaded)
+    assert cache.lookup(1, 'abcd', 12) is None
+
+
+def test_modified_object_is_dropped(cache, downloaded):
+    assert cache.add(1, 'abcd', 11, downloaded)
+    path = cache.lookup(1, 'abcd', 11)
+    os.chmod(path, 0o644)
+    with open(path, 'r+b') as f:
+        f.write(b'HELLO')
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    assert cache.lookup(1, 'abcd', 11) is None
+    assert not os.path.exists(path)
+    assert cache.total_bytes == 0
+
+
+def test_hardlinked_target_edit_invalidates_object(tmp_path, downloaded):
+    cache = LocalContentCache(str(tmp_path / 'cache'), hardlink=True)
+    assert cache.add(1, 'abcd', 11, downloaded)
+    dest = str(tmp_path / 'out.txt')
+    if cache.materialize(1, 'abcd', 11, dest) != 'hardlink':
+        pytest.skip("hardlinks not supported here")
+    os.chmod(dest, 0o644)
+    with open(dest, 'ab') as f:
+        f.write(b'!')
+
+    assert cache.lookup(1, 'abcd', 11) is None
+
+
+def test_reopen_keeps_objects_and_drops_changed_ones(tmp_path, downloaded):
+    root = str(tmp_path / 'cache')
+    cache = LocalContentCache(root)
+    assert cache.add(1, 'abcd', 11, downloaded)
+    assert cache.add(2, 'ef01', 11, downloaded)
+    changed = cache.lookup(2, 'ef01', 11)
+    st = os.stat(changed)
+    os.utime(changed, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    reopened = LocalContentCache(root)
+    assert reopened.lookup(1, 'abcd', 11) is not None
+    assert reopened.lookup(2, 'ef01', 11) is None
+    assert not os.path.exists(changed)
+    assert reopened.total_bytes == 11
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = LocalContentCache(str(tmp_path / 'cache'), max_bytes=20)
+    for fsid in (1, 2):
+        src = tmp_path / f'{fsid}.bin'
+        src.write_bytes(b'x' * 10)
+        assert cache.add(fsid, f'md5{fsid}', 10, str(src))
+    old = cache.lookup(1, 'md51', 10)
+    st = os.stat(old)
+    os.utime(old, ns=(1, st.st_mtime_ns))
+
+    src = tmp_path / '3.bin'
+    src.write_bytes(b'x' * 10)
+    assert cache.add(3, 'md53', 10, str(src))
+    assert cache.total_bytes == 20
+    assert cache.lookup(1, 'md51', 10) is None
+    assert cache.lookup(2, 'md52', 10) is not None
+
+
+def test_reopening_with_a_smaller_budget_evicts(tmp_path):
+    root = str(tmp_path / 'cache')
+    cache = LocalContentCache(root, max_bytes=100)
+    for fsid in (1, 2, 3):
+        src = tmp_path / f'{fsid}.bin'
+        src.write_bytes(b'x' * 10)
+        assert cache.add(fsid, f'md5{fsid}', 10, str(src))
+        path = cache.lookup(fsid, f'md5{fsid}', 10)
+        os.utime(path, ns=(fsid, os.stat(path).st_mtime_ns))
+
+    reopened = LocalContentCache(root, max_bytes=20)
+    assert reopened.total_bytes == 20
+    assert reopened.lookup(1, 'md51', 10) is None
+    assert reopened.lookup(3, 'md53', 10) is not None
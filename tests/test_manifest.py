@@ -0,0 +1,160 @@
+"""Job manifests and download state used to resume transfers"""
+
+import os
+
+import pytest
+
+import bdnd.client
+from bdnd.client import BaiduNetdiskClient
+from bdnd.manifest import TransferManifest, DownloadState
+
+
+@pytest.fixture
+def manifest_path(tmp_path):
+    return str(tmp_path / 'job.jsonl')
+
+
+def test_reopened_manifest_resumes(manifest_path):
+    with TransferManifest(manifest_path) as manifest:
+        manifest.mark_done('a.txt', 10, md5='aa', mtime=1.0)
+        manifest.mark_partial('b.bin', {'uploadid': 'u1', 'missing_partseqs': [3]})
+
+    manifest = TransferManifest(manifest_path)
+    assert manifest.is_done('a.txt', 10, md5='aa', mtime=1.0)
+    assert not manifest.is_done('a.txt', 11)
+    assert not manifest.is_done('a.txt', 10, md5='bb')
+    assert not manifest.is_done('a.txt', 10, mtime=2.0)
+    assert not manifest.is_done('b.bin', 10)
+    assert manifest.partial_state('b.bin') == {'uploadid': 'u1', 'missing_partseqs': [3]}
+    assert len(manifest) == 1
+    manifest.close()
+
+
+def test_truncated_line_is_ignored(manifest_path):
+    with TransferManifest(manifest_path) as manifest:
+        manifest.mark_done('a.txt', 10)
+    with open(manifest_path, 'a', encoding='utf-8') as f:
+        f.write('{"path": "b.txt", "do')
+
+    with TransferManifest(manifest_path) as manifest:
+        manifest.mark_done('c.txt', 5)
+    manifest = TransferManifest(manifest_path)
+    assert manifest.is_done('a.txt', 10)
+    assert manifest.is_done('c.txt', 5)
+    assert manifest.get('b.txt') is None
+    manifest.close()
+
+
+def test_clear_partial(manifest_path):
+    with TransferManifest(manifest_path) as manifest:
+        manifest.mark_partial('b.bin', {'uploadid': 'u1'})
+        manifest.clear_partial('b.bin')
+    with TransferManifest(manifest_path) as manifest:
+        assert manifest.partial_state('b.bin') is None
+
+
+def test_remove(manifest_path):
+    manifest = TransferManifest(manifest_path)
+    manifest.mark_done('a.txt', 10)
+    manifest.remove()
+    assert not os.path.exists(manifest_path)
+    manifest = TransferManifest(manifest_path)
+    assert not manifest.is_done('a.txt', 10)
+    manifest.close()
+
+
+def test_download_state_round_trip(tmp_path):
+    part_path = str(tmp_path / 'f.part')
+    state = DownloadState(part_path + '.state', {'size': 10, 'md5': 'ABC'}, block_size=4)
+    assert state.missing_blocks() == [0, 1, 2]
+    state.mark_done(1)
+    state.save()
+
+    loaded = DownloadState.load(part_path + '.state')
+    assert loaded.missing_blocks() == [0, 2]
+    assert loaded.same_source({'size': 10, 'md5': 'abc'})
+    assert not loaded.same_source({'size': 10, 'md5': 'def'})
+    assert not loaded.same_source({'size': 11, 'md5': None})
+
+    open(part_path, 'wb').close()
+    DownloadState.discard(part_path)
+    assert not os.path.exists(part_path)
+    assert DownloadState.load(part_path + '.state') is None
+
+
+def test_download_state_snapshot_is_independent(tmp_path):
+    state = DownloadState(str(tmp_path / 'f.part.state'), {'size': 10, 'md5': None}, block_size=4)
+    state.mark_done(0)
+    snapshot = state.snapshot()
+    state.mark_done(2)
+    snapshot.save()
+    assert DownloadState.load(state.path).missing_blocks() == [1, 2]
+
+
+class FakeUploads:
+    """upload_file_auto stand-in failing the files listed in fail"""
+
+    def __init__(self, client):
+        self.client = client
+        self.fail = set()
+        self.uploaded = []
+        # Report left behind by a failing upload, per file name
+        self.reports = {}
+
+    def upload_file_auto(self, file_path, save_path, **kwargs):
+        name = os.path.basename(file_path)
+        if name in self.fail:
+            with self.client._upload_reports_lock:
+                self.client._upload_reports.pop(file_path, None)
+                if name in self.reports:
+                    self.client._upload_reports[file_path] = self.reports[name]
+            return None
+        self.uploaded.append(name)
+        return {'errno': 0, 'md5': 'x'}
+
+
+@pytest.fixture
+def upload_job(tmp_path, monkeypatch, manifest_path):
+    local_dir = tmp_path / 'src'
+    local_dir.mkdir()
+    for name in ('a.txt', 'b.txt'):
+        (local_dir / name).write_bytes(b'data')
+    client = BaiduNetdiskClient(access_token="token", base_path="/")
+    uploads = FakeUploads(client)
+    monkeypatch.setattr(client, 'upload_file_auto', uploads.upload_file_auto)
+    monkeypatch.setattr(bdnd.client, 'job_manifest_path', lambda kind, source, target: manifest_path)
+    return client, uploads, str(local_dir)
+
+
+def test_upload_directory_resumes_then_removes_manifest(upload_job, manifest_path):
+    client, uploads, local_dir = upload_job
+    uploads.fail = {'b.txt'}
+    assert client.upload_directory(local_dir, '/remote/', schedule_window=0) == 1
+    assert os.path.exists(manifest_path)
+
+    uploads.fail = set()
+    uploads.uploaded = []
+    assert client.upload_directory(local_dir, '/remote/', schedule_window=0) == 2
+    assert uploads.uploaded == ['b.txt']
+    assert not os.path.exists(manifest_path)
+
+    # A clean run leaves nothing behind: the next run uploads everything again
+    uploads.uploaded = []
+    assert client.upload_directory(local_dir, '/remote/', schedule_window=0) == 2
+    assert sorted(uploads.uploaded) == ['a.txt', 'b.txt']
+
+
+def test_upload_directory_drops_dead_upload_session(upload_job, manifest_path):
+    client, uploads, local_dir = upload_job
+    uploads.fail = {'b.txt'}
+    uploads.reports['b.txt'] = {'save_path': '/remote/b.txt', 'uploadid': 'dead', 'block_size': 4,
+                                'block_md5s': ['x'], 'missing_partseqs': [0]}
+    client.upload_directory(local_dir, '/remote/', schedule_window=0)
+    with TransferManifest(manifest_path) as manifest:
+        assert manifest.partial_state('b.txt')['uploadid'] == 'dead'
+
+    # The resumed attempt fails and upload_file_auto drops the report
+    del uploads.reports['b.txt']
+    client.upload_directory(local_dir, '/remote/', schedule_window=0)
+    with TransferManifest(manifest_path) as manifest:
+        assert manifest.partial_state('b.txt') is None
@@ -0,0 +1,32 @@
+"""Token-bucket bandwidth limits"""
+
+import pytest
+
+from bdnd.ratelimit import TokenBucket, BandwidthLimiter
+
+
+def test_unlimited_bucket_never_waits():
+    bucket = TokenBucket(0)
+    assert bucket.reserve(10 ** 9) == 0.0
+
+
+def test_debt_is_paid_at_the_rate():
+    bucket = TokenBucket(100)
+    assert bucket.reserve(50) == pytest.approx(0.5, abs=0.05)
+    # Requests are booked in order: the next one waits behind the first
+    assert bucket.reserve(50) == pytest.approx(1.0, abs=0.05)
+
+
+def test_full_bucket_allows_a_burst():
+    bucket = TokenBucket(10, burst=5, full=True)
+    assert bucket.reserve(5) == 0.0
+    assert bucket.reserve(1) > 0
+
+
+def test_bandwidth_limits():
+    limiter = BandwidthLimiter(up=100)
+    assert limiter.get_limits() == (100, 0)
+    limiter.set_limits(down=50)
+    assert limiter.get_limits() == (100, 50)
+    limiter.set_limits(up=0)
+    assert limiter.get_limits() == (0, 50)
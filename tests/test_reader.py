@@ -0,0 +1,100 @@
+"""Read-ahead of upload blocks"""
+
+import hashlib
+import threading
+
+import pytest
+
+import bdnd.client
+from bdnd.client import BaiduNetdiskClient
+from bdnd.reader import BlockChangedError, ReadAheadReader
+
+
+BLOCK_SIZE = 4
+CONTENT = b'0123456789abcdef'
+
+
+@pytest.fixture
+def local_file(tmp_path):
+    path = tmp_path / 'data.bin'
+    path.write_bytes(CONTENT)
+    return str(path)
+
+
+def block_md5s():
+    return [hashlib.md5(CONTENT[i:i + BLOCK_SIZE]).hexdigest() for i in range(0, len(CONTENT), BLOCK_SIZE)]
+
+
+def drain(reader, consumers):
+    """get() from several threads until the reader is exhausted; returns (blocks, errors)"""
+    blocks, errors = [], []
+
+    def consume():
+        while True:
+            try:
+                item = reader.get()
+            except Exception as e:
+                errors.append(e)
+                return
+            if item is None:
+                return
+            blocks.append(item)
+
+    threads = [threading.Thread(target=consume, daemon=True) for _ in range(consumers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+        assert not thread.is_alive(), "reader.get() hung"
+    return blocks, errors
+
+
+def test_reads_requested_blocks(local_file):
+    reader = ReadAheadReader(local_file, BLOCK_SIZE, depth=1, block_md5s=block_md5s(), partseqs=[3, 1])
+    try:
+        blocks, errors = drain(reader, consumers=3)
+    finally:
+        reader.close()
+    assert errors == []
+    assert sorted(blocks) == [(1, 4, b'4567'), (3, 12, b'cdef')]
+
+
+def test_failed_read_with_depth_one_reaches_every_consumer(local_file):
+    md5s = block_md5s()
+    md5s[1] = hashlib.md5(b'other').hexdigest()
+    reader = ReadAheadReader(local_file, BLOCK_SIZE, depth=1, block_md5s=md5s)
+    try:
+        blocks, errors = drain(reader, consumers=3)
+        # The error stays the reader's final answer
+        with pytest.raises(BlockChangedError):
+            reader.get()
+    finally:
+        reader.close()
+    assert blocks == [(0, 0, b'0123')]
+    assert len(errors) == 3
+    assert all(isinstance(e, BlockChangedError) for e in errors)
+
+
+def test_close_stops_a_blocked_reader(local_file):
+    reader = ReadAheadReader(local_file, 1, depth=1)
+    assert reader.get() == (0, 0, b'0')
+    reader.close()
+    assert reader.get() is None
+
+
+@pytest.mark.parametrize('block_size, depth', [(4, 2), (16, 1), (1, 4)])
+def test_client_caps_read_ahead_in_bytes(monkeypatch, local_file, block_size, depth):
+    depths = []
+
+    class RecordingReader(ReadAheadReader):
+        def __init__(self, *args, **kwargs):
+            depths.append(kwargs['depth'])
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(bdnd.client, 'ReadAheadReader', RecordingReader)
+    client = BaiduNetdiskClient(access_token="token", base_path="/", read_ahead=4, read_ahead_bytes=8)
+    monkeypatch.setattr(client, '_upload_request', lambda *args, **kwargs: object())
+    md5s = [hashlib.md5(CONTENT[i:i + block_size]).hexdigest() for i in range(0, len(CONTENT), block_size)]
+
+    assert client._upload_parts(local_file, '/d/data.bin', 'upload-1', block_size, md5s) == []
+    assert depths == [depth]
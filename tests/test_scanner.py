@@ -0,0 +1,53 @@
+"""Parallel local directory scanner"""
+
+import os
+
+from bdnd.scanner import scan_local_tree
+
+
+def make_tree(root, files, dirs=()):
+    for rel in files:
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'x' * len(rel))
+    for rel in dirs:
+        (root / rel).mkdir(parents=True, exist_ok=True)
+
+
+def test_scan_yields_files_with_stat(tmp_path):
+    make_tree(tmp_path, ['a.txt', 'sub/b.txt', 'sub/deep/c.txt'])
+    entries = list(scan_local_tree(str(tmp_path), workers=4))
+    files = {entry.rel_path: entry for entry in entries if not entry.is_dir}
+    assert sorted(files) == ['a.txt', 'sub/b.txt', 'sub/deep/c.txt']
+    entry = files['sub/deep/c.txt']
+    assert entry.path == os.path.join(str(tmp_path), 'sub', 'deep', 'c.txt')
+    assert entry.size == len('sub/deep/c.txt')
+    assert entry.mtime == os.stat(entry.path).st_mtime
+
+
+def test_directories_come_before_their_contents(tmp_path):
+    make_tree(tmp_path, ['sub/deep/c.txt', 'sub/b.txt'])
+    order = [entry.rel_path for entry in scan_local_tree(str(tmp_path))]
+    assert order.index('sub') < order.index('sub/b.txt')
+    assert order.index('sub/deep') < order.index('sub/deep/c.txt')
+
+
+def test_empty_directories_are_flagged(tmp_path):
+    make_tree(tmp_path, ['full/a.txt', 'filtered/skip.log'], dirs=['empty'])
+    entries = scan_local_tree(str(tmp_path), file_filter=lambda entry: not entry.rel_path.endswith('.log'))
+    dirs = {entry.rel_path: entry.is_empty for entry in entries if entry.is_dir}
+    assert dirs == {'full': False, 'filtered': True, 'empty': True}
+
+
+def test_non_recursive_scan(tmp_path):
+    make_tree(tmp_path, ['a.txt', 'sub/b.txt'])
+    files = [entry.rel_path for entry in scan_local_tree(str(tmp_path), recursive=False) if not entry.is_dir]
+    assert files == ['a.txt']
+
+
+def test_consumer_can_stop_early(tmp_path):
+    make_tree(tmp_path, [f'd{i}/f{j}.txt' for i in range(10) for j in range(10)])
+    scan = scan_local_tree(str(tmp_path), max_pending=4)
+    first = next(scan)
+    scan.close()
+    assert first.rel_path
@@ -0,0 +1,70 @@
+"""Size-aware ordering of directory transfer work"""
+
+import bdnd.client
+from bdnd.client import BaiduNetdiskClient
+from bdnd.filters import TransferRules
+from bdnd.scheduler import schedule_by_size
+
+
+MB = 1024 * 1024
+
+
+def test_first_item_is_yielded_before_more_are_read():
+    pulled = []
+
+    def items():
+        for size in (10 * MB, 1, 2, 20 * MB):
+            pulled.append(size)
+            yield size
+
+    scheduled = schedule_by_size(items(), lambda size: size, small_size=4 * MB)
+    assert next(scheduled) == 10 * MB
+    assert pulled == [10 * MB]
+
+
+def test_all_items_kept_and_large_go_first():
+    sizes = [1, 2, 5 * MB, 3, 50 * MB, 4, 20 * MB]
+    ordered = list(schedule_by_size(iter(sizes), lambda size: size, window=4, small_size=4 * MB,
+                                    small_per_large=1))
+    assert sorted(ordered) == sorted(sizes)
+    # Once the window has grown, the largest buffered item goes first
+    assert ordered.index(50 * MB) < ordered.index(20 * MB)
+
+
+def test_passthrough_items_are_not_held_back():
+    items = [('file', 1), ('dir', 0), ('file', 2)]
+    scheduled = schedule_by_size(iter(items), lambda item: item[1], passthrough=lambda item: item[0] == 'dir',
+                                 window=8)
+    assert list(scheduled) == [('file', 1), ('dir', 0), ('file', 2)]
+
+
+def test_download_directory_filters_before_scheduling(tmp_path, monkeypatch):
+    listing = [
+        {'path': '/remote/node_modules', 'server_filename': 'node_modules', 'isdir': 1},
+        {'path': '/remote/node_modules/x.js', 'server_filename': 'x.js', 'isdir': 0, 'size': 1, 'fs_id': 1},
+        {'path': '/remote/skip.log', 'server_filename': 'skip.log', 'isdir': 0, 'size': 1, 'fs_id': 2},
+        {'path': '/remote/keep.txt', 'server_filename': 'keep.txt', 'isdir': 0, 'size': 1, 'fs_id': 3},
+    ]
+    client = BaiduNetdiskClient(access_token="token", base_path="/")
+    monkeypatch.setattr(client, 'iter_all_files_recursive', lambda path: iter(listing))
+    downloaded = []
+
+    def download(fsid, save_path, **kwargs):
+        downloaded.append(fsid)
+        with open(save_path, 'wb') as f:
+            f.write(b'x')
+        return True
+
+    monkeypatch.setattr(client, 'download_file_by_fsid', download)
+    scheduled = []
+
+    def schedule(items, size_of, **kwargs):
+        for item in schedule_by_size(items, size_of, **kwargs):
+            scheduled.append(item['path'])
+            yield item
+
+    monkeypatch.setattr(bdnd.client, 'schedule_by_size', schedule)
+    rules = TransferRules([('-', 'node_modules'), ('-', '*.log')])
+    assert client.download_directory('/remote', str(tmp_path), rules=rules, checkpoint=False) == 1
+    assert scheduled == ['/remote/keep.txt']
+    assert downloaded == [3]
@@ -0,0 +1,121 @@
+"""Resuming chunked uploads from their upload report"""
+
+import pytest
+
+from bdnd.client import BaiduNetdiskClient
+
+
+BLOCK_SIZE = 4
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+class FakeUploadServer:
+    """precreate / superfile2 / create with upload sessions that can expire"""
+
+    def __init__(self):
+        self.sessions = []
+        self.expired = set()
+        # Parts the next superfile2 round fails to send
+        self.fail_parts = []
+        self.create_errno = 0
+        self.created = []
+
+    def precreate(self, save_path, size, block_list, **kwargs):
+        uploadid = f"upload-{len(self.sessions) + 1}"
+        self.sessions.append(uploadid)
+        return {'errno': 0, 'uploadid': uploadid}
+
+    def upload_parts(self, file_path, save_path, uploadid, block_size, block_md5s, pbar=None, show_chunks=True,
+                     partseqs=None):
+        wanted = range(len(block_md5s)) if partseqs is None else partseqs
+        if uploadid in self.expired:
+            return sorted(wanted)
+        missing, self.fail_parts = [seq for seq in wanted if seq in self.fail_parts], []
+        return missing
+
+    def request(self, method, url, data=None, **kwargs):
+        assert 'method=create' in url
+        if data['uploadid'] in self.expired:
+            return FakeResponse({'errno': 31363, 'errmsg': 'upload session expired'})
+        if self.create_errno:
+            return FakeResponse({'errno': self.create_errno, 'errmsg': 'failed'})
+        self.created.append((data['path'], data['uploadid']))
+        return FakeResponse({'errno': 0, 'path': data['path'], 'md5': 'x'})
+
+
+@pytest.fixture
+def server():
+    return FakeUploadServer()
+
+
+@pytest.fixture
+def client(monkeypatch, server):
+    client = BaiduNetdiskClient(access_token="token", base_path="/", small_file_threshold=0)
+    monkeypatch.setattr(client, 'precreate', server.precreate)
+    monkeypatch.setattr(client, '_upload_parts', server.upload_parts)
+    monkeypatch.setattr(client, '_safe_request', server.request)
+    return client
+
+
+@pytest.fixture
+def local_file(tmp_path):
+    path = tmp_path / 'data.bin'
+    path.write_bytes(b'0123456789abcdef')
+    return str(path)
+
+
+def upload(client, local_file):
+    return client.upload_file_auto(local_file, '/remote/data.bin', show_progress=False, block_size=BLOCK_SIZE)
+
+
+def test_incomplete_upload_resumes_missing_parts(client, server, local_file):
+    server.fail_parts = [2]
+    assert upload(client, local_file) is None
+    report = client.get_upload_report(local_file)
+    assert report['missing_partseqs'] == [2]
+    assert report['uploadid'] == 'upload-1'
+
+    assert upload(client, local_file)['errno'] == 0
+    assert server.sessions == ['upload-1']
+    assert server.created == [('/remote/data.bin', 'upload-1')]
+    assert client.get_upload_report(local_file) is None
+
+
+def test_expired_session_restarts_with_precreate(client, server, local_file):
+    server.fail_parts = [2]
+    assert upload(client, local_file) is None
+    server.expired.add('upload-1')
+
+    assert upload(client, local_file)['errno'] == 0
+    assert server.sessions == ['upload-1', 'upload-2']
+    assert server.created == [('/remote/data.bin', 'upload-2')]
+    assert client.get_upload_report(local_file) is None
+
+
+def test_rejected_create_restarts_with_precreate(client, server, local_file):
+    server.fail_parts = [2]
+    assert upload(client, local_file) is None
+    # The parts go through, but the server no longer accepts the session on create
+    server.expired.add('upload-1')
+    client._upload_parts = lambda *args, **kwargs: []
+
+    assert upload(client, local_file)['errno'] == 0
+    assert server.created == [('/remote/data.bin', 'upload-2')]
+
+
+def test_failed_create_drops_report(client, server, local_file):
+    server.fail_parts = [2]
+    assert upload(client, local_file) is None
+    server.create_errno = 2
+
+    assert upload(client, local_file) is None
+    # Resumed, failed, restarted once and failed again: nothing stale is kept
+    assert server.sessions == ['upload-1', 'upload-2']
+    assert client.get_upload_report(local_file) is None
@@ -0,0 +1,147 @@
+"""Single-request upload of small files"""
+
+import hashlib
+import time
+
+import pytest
+
+from bdnd.client import BaiduNetdiskClient
+
+
+CONTENT = b'small file'
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def json(self):
+        if isinstance(self._payload, Exception):
+            raise self._payload
+        return self._payload
+
+
+class FakeRemote:
+    def __init__(self):
+        # path -> (fs_id, size, md5)
+        self.files = {}
+        # path -> server_ctime (default: now)
+        self.ctimes = {}
+        self.upload_calls = []
+        self.precreate_calls = 0
+
+    def list_files(self, directory="/", start=0, limit=100, **kwargs):
+        if start:
+            return []
+        return [{'server_filename': path.rpartition('/')[2], 'fs_id': fsid}
+                for path, (fsid, _, _) in self.files.items() if path.rpartition('/')[0] == directory]
+
+    def get_file_info(self, fsids, **kwargs):
+        return [{'fs_id': fsid, 'path': path, 'size': size, 'md5': md5,
+                 'server_ctime': self.ctimes.get(path, int(time.time()))}
+                for path, (fsid, size, md5) in self.files.items() if fsid in fsids]
+
+    def precreate(self, *args, **kwargs):
+        self.precreate_calls += 1
+        return None
+
+
+@pytest.fixture
+def remote():
+    return FakeRemote()
+
+
+@pytest.fixture
+def client(monkeypatch, remote):
+    client = BaiduNetdiskClient(access_token="token", base_path="/", upload_block_size=4 * 1024 * 1024)
+    monkeypatch.setattr(client, 'list_files', remote.list_files)
+    monkeypatch.setattr(client, 'get_file_info', remote.get_file_info)
+    monkeypatch.setattr(client, 'precreate', remote.precreate)
+    return client
+
+
+@pytest.fixture
+def local_file(tmp_path):
+    path = tmp_path / 'a.txt'
+    path.write_bytes(CONTENT)
+    return str(path)
+
+
+# Not plain hex: Baidu's obfuscated MD5, which cannot be compared
+OBFUSCATED_MD5 = 'e5c0a3b1fj7c9d2e4f6a8b0c1d3e5f70'
+
+
+def answer_with(remote, response, lands=True, md5=None):
+    """_upload_request stand-in: the upload reaches the server (if lands), then response comes back"""
+
+    def upload_request(method, query, save_path=None, **kwargs):
+        remote.upload_calls.append(kwargs.get('failover', True))
+        if lands:
+            remote.files[save_path] = (42, len(CONTENT), md5 or hashlib.md5(CONTENT).hexdigest())
+        return response
+
+    return upload_request
+
+
+def test_single_request_upload(client, remote, local_file, monkeypatch):
+    response = FakeResponse({'fs_id': 42, 'path': '/d/a.txt', 'size': len(CONTENT)})
+    monkeypatch.setattr(client, '_upload_request', answer_with(remote, response))
+
+    result = client.upload_file_auto(local_file, '/d/a.txt', show_progress=False)
+    assert result['fs_id'] == 42
+    # Sent once, never repeated on another host
+    assert remote.upload_calls == [False]
+    assert remote.precreate_calls == 0
+
+
+@pytest.mark.parametrize('response', [None, FakeResponse(ValueError('truncated body'))])
+def test_lost_answer_finds_landed_upload(client, remote, local_file, monkeypatch, response):
+    monkeypatch.setattr(client, '_upload_request', answer_with(remote, response))
+
+    result = client.upload_file_auto(local_file, '/d/a.txt', show_progress=False)
+    assert result['fs_id'] == 42
+    assert result['errno'] == 0
+    # No chunked upload, so no second copy
+    assert remote.precreate_calls == 0
+    assert client.stats.get('upload_single_recovered') == 1
+
+
+def test_lost_upload_falls_back_to_chunked(client, remote, local_file, monkeypatch):
+    monkeypatch.setattr(client, '_upload_request', answer_with(remote, None, lands=False))
+
+    assert client.upload_file_auto(local_file, '/d/a.txt', show_progress=False) is None
+    assert remote.precreate_calls == 1
+
+
+def test_different_file_at_path_is_not_taken_for_the_upload(client, remote, local_file, monkeypatch):
+    remote.files['/d/a.txt'] = (7, len(CONTENT), hashlib.md5(b'other file').hexdigest())
+    monkeypatch.setattr(client, '_upload_request', answer_with(remote, None, lands=False))
+
+    assert client.upload_file_auto(local_file, '/d/a.txt', show_progress=False) is None
+    assert remote.precreate_calls == 1
+
+
+def test_obfuscated_md5_accepts_a_file_created_by_the_upload(client, remote, local_file, monkeypatch):
+    monkeypatch.setattr(client, '_upload_request', answer_with(remote, None, md5=OBFUSCATED_MD5))
+
+    assert client.upload_file_auto(local_file, '/d/a.txt', show_progress=False)['fs_id'] == 42
+    assert remote.precreate_calls == 0
+
+
+def test_obfuscated_md5_rejects_an_older_file_of_the_same_size(client, remote, local_file, monkeypatch):
+    remote.files['/d/a.txt'] = (7, len(CONTENT), OBFUSCATED_MD5)
+    remote.ctimes['/d/a.txt'] = int(time.time()) - 3600
+    monkeypatch.setattr(client, '_upload_request', answer_with(remote, None, lands=False))
+
+    assert client.upload_file_auto(local_file, '/d/a.txt', show_progress=False) is None
+    assert remote.precreate_calls == 1
+    assert client.stats.get('upload_single_recovered') == 0
+
+
+def test_refused_upload_falls_back_without_lookup(client, remote, local_file, monkeypatch):
+    response = FakeResponse({'error_code': 31061, 'error_msg': 'file already exists'})
+    monkeypatch.setattr(client, '_upload_request', answer_with(remote, response, lands=False))
+    monkeypatch.setattr(client, 'get_fsid_by_path', pytest.fail)
+
+    assert client.upload_file_auto(local_file, '/d/a.txt', show_progress=False) is None
+    assert remote.precreate_calls == 1